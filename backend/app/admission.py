@@ -0,0 +1,244 @@
+"""
+Admission control for the API.
+
+Each class of work (answers, ingestion) gets a concurrency limit and a bounded
+FIFO wait queue. Requests that would overflow the queue, or wait longer than
+the queue timeout, are rejected at once with a Retry-After estimate instead of
+slowing everyone down. Lower-priority work is shed first: ingestion is turned
+away while answers are queuing. Queue depth and recent latency also drive the
+readiness check used by the docker healthcheck and load balancers.
+
+Background work running in threads (bulk ingestion) takes the same slots
+through wait_for_slot(), waiting out rejections instead of failing.
+"""
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from .metrics import metrics
+
+
+ANSWER_MAX_CONCURRENCY = int(os.environ.get("ANSWER_MAX_CONCURRENCY", "8"))
+ANSWER_MAX_QUEUE = int(os.environ.get("ANSWER_MAX_QUEUE", "32"))
+ANSWER_QUEUE_TIMEOUT = float(os.environ.get("ANSWER_QUEUE_TIMEOUT", "30"))
+INGEST_MAX_CONCURRENCY = int(os.environ.get("INGEST_MAX_CONCURRENCY", "4"))
+INGEST_MAX_QUEUE = int(os.environ.get("INGEST_MAX_QUEUE", "8"))
+INGEST_QUEUE_TIMEOUT = float(os.environ.get("INGEST_QUEUE_TIMEOUT", "10"))
+
+# Not ready once a queue is this full, or recent p95 latency exceeds the limit (0 disables it)
+READY_QUEUE_FILL = float(os.environ.get("READY_QUEUE_FILL", "0.8"))
+READY_MAX_P95_SECONDS = float(os.environ.get("READY_MAX_P95_SECONDS", "0"))
+# Only latencies this recent count, so an idle instance becomes ready again
+LATENCY_WINDOW_SECONDS = 60
+# Retry-After when there is no latency history yet
+DEFAULT_RETRY_AFTER = 5
+
+
+class Overloaded(Exception):
+    """Request rejected by admission control; retry after retry_after seconds."""
+
+    def __init__(self, name: str, reason: str, retry_after: int):
+        super().__init__(f"{name} {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RecentLatencies:
+    """Request latencies of the last window_seconds."""
+
+    def __init__(self, window_seconds: float = LATENCY_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._samples = deque()
+
+    def record(self, seconds: float):
+        self._samples.append((time.monotonic(), seconds))
+        self._expire()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def percentile(self, percentile: float):
+        """Latency in seconds at the given percentile, None without recent samples."""
+        self._expire()
+        if not self._samples:
+            return None
+        ordered = sorted(seconds for _, seconds in self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+class AdmissionLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue, for use on one event loop.
+
+    Args:
+        name: Work class name, used in metrics and errors.
+        max_concurrency: Requests running at once.
+        max_queue: Requests allowed to wait for a slot; more are rejected.
+        queue_timeout: Seconds a request may wait before it is rejected.
+        priority: Lower is more important; lower-priority classes are shed first.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float, priority: int = 0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.priority = priority
+        self.active = 0
+        self.latencies = RecentLatencies()
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        typical = self.latencies.percentile(50)
+        if typical is None:
+            return DEFAULT_RETRY_AFTER
+        return max(1, math.ceil(typical * (self.queued + 1) / self.max_concurrency))
+
+    def _reject(self, reason: str):
+        metrics.incr(f"admission.{self.name}.rejected")
+        metrics.incr(f"admission.{self.name}.rejected.{reason}")
+        print(f"🚦 Rejected {self.name} request ({reason}), {self.active} running, {self.queued} queued")
+        raise Overloaded(self.name, reason, self.retry_after())
+
+    async def acquire(self):
+        """Take a slot, waiting in the queue if needed. Raises Overloaded when rejected."""
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up, pass it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        self._publish()
+
+    def release(self, latency: float = None):
+        """Free a slot, handing it straight to the next waiter."""
+        if latency is not None:
+            self.latencies.record(latency)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.active -= 1
+        self._publish()
+
+    def _publish(self):
+        metrics.set(f"admission.{self.name}.active", self.active)
+        metrics.set(f"admission.{self.name}.queued", self.queued)
+
+    def stats(self) -> dict:
+        p95 = self.latencies.percentile(95)
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class AdmissionController:
+    """Limiters for all work classes, with priority shedding and readiness."""
+
+    def __init__(self, limiters):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    def _shed(self, limiter: AdmissionLimiter) -> bool:
+        """Lower-priority work is turned away while more important work is queuing."""
+        return any(other.priority < limiter.priority and other.queued for other in self.limiters.values())
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        """Hold a slot of the named class for the duration of the block."""
+        limiter = self.limiters[name]
+        if self._shed(limiter):
+            limiter._reject("shed")
+        await limiter.acquire()
+        started = time.monotonic()
+        metrics.incr(f"admission.{name}.admitted")
+        try:
+            yield
+        finally:
+            limiter.release(time.monotonic() - started)
+
+    @contextmanager
+    def wait_for_slot(self, name: str, loop):
+        """
+        Hold a slot of the named class from a worker thread, for the duration of
+        the block. The limiter lives on loop; rejections are retried after their
+        Retry-After, so background work only ever waits.
+        """
+        limiter = self.limiters[name]
+
+        async def enter():
+            if self._shed(limiter):
+                limiter._reject("shed")
+            await limiter.acquire()
+
+        while True:
+            try:
+                asyncio.run_coroutine_threadsafe(enter(), loop).result()
+                break
+            except Overloaded as e:
+                time.sleep(e.retry_after)
+        started = time.monotonic()
+        metrics.incr(f"admission.{name}.admitted")
+        try:
+            yield
+        finally:
+            loop.call_soon_threadsafe(limiter.release, time.monotonic() - started)
+
+    def readiness(self) -> dict:
+        """
+        Whether this instance should get new traffic.
+
+        Returns:
+            dict: ready flag, the reasons it is not ready, and per-class stats.
+        """
+        reasons = []
+        for limiter in self.limiters.values():
+            if limiter.max_queue and limiter.queued >= limiter.max_queue * READY_QUEUE_FILL:
+                reasons.append(f"{limiter.name} queue {limiter.queued}/{limiter.max_queue}")
+            p95 = limiter.latencies.percentile(95)
+            if READY_MAX_P95_SECONDS and p95 is not None and p95 > READY_MAX_P95_SECONDS:
+                reasons.append(f"{limiter.name} p95 latency {p95:.1f}s")
+        return {
+            "ready": not reasons,
+            "reasons": reasons,
+            "limits": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+def create_admission_controller() -> AdmissionController:
+    """Answer and ingest limits from the environment; ingestion is shed first."""
+    return AdmissionController([
+        AdmissionLimiter("answer", ANSWER_MAX_CONCURRENCY, ANSWER_MAX_QUEUE, ANSWER_QUEUE_TIMEOUT, priority=0),
+        AdmissionLimiter("ingest", INGEST_MAX_CONCURRENCY, INGEST_MAX_QUEUE, INGEST_QUEUE_TIMEOUT, priority=1),
+    ])
@@ -0,0 +1,131 @@
+"""
+Compare vectorstore index backends on the same data.
+
+Loads the stored embeddings of the active Chroma collection (or generates a
+synthetic corpus), builds every backend in a scratch directory and reports
+recall@k against exact search together with query latency.
+
+Run with:
+    python -m app.benchmark --k 10 --queries 200
+    python -m app.benchmark --synthetic 50000 --dim 1024
+"""
+import os
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from .services import ChromaBackend, create_backend, read_active_collection, DEFAULT_PERSIST_DIRECTORY
+
+
+def load_corpus(persist_directory: str, batch_size: int = 1000):
+    """Read ids, documents and embeddings of the active collection."""
+    import chromadb
+
+    active = read_active_collection(persist_directory)
+    collection = chromadb.PersistentClient(path=persist_directory).get_collection(active["collection_name"])
+    ids, documents, embeddings = [], [], []
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, include=["documents", "embeddings"])
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(document or "" for document in page["documents"])
+        embeddings.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return ids, documents, np.concatenate(embeddings)
+
+
+def synthetic_corpus(size: int, dim: int, seed: int = 0):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, size // 100), dim)).astype(np.float32)
+    matrix = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    ids = [str(i) for i in range(size)]
+    return ids, [f"document {i}" for i in ids], matrix
+
+
+def make_queries(matrix, count: int, noise: float = 0.05, seed: int = 1):
+    """Perturbed copies of stored vectors, so every query has near neighbours."""
+    rng = np.random.default_rng(seed)
+    queries = matrix[rng.integers(0, len(matrix), count)] + noise * rng.standard_normal((count, matrix.shape[1])).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def build_backend(name: str, directory: str, ids, documents, matrix, batch_size: int = 1000, **kwargs):
+    if name == "chroma":
+        import chromadb
+
+        backend = ChromaBackend(chromadb.PersistentClient(path=directory).create_collection("benchmark"))
+    else:
+        backend = create_backend(name, directory, **kwargs)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        backend.add(ids[start:end], matrix[start:end], documents[start:end], [{"doc_id": i} for i in ids[start:end]])
+    backend.persist()
+    return backend
+
+
+def run(ids, documents, matrix, backends, k: int = 10, query_count: int = 200, ef: int = 64, M: int = 16):
+    """Benchmark each backend and return one result row per backend."""
+    queries = make_queries(matrix, query_count)
+    truth = np.argsort(-(queries @ matrix.T), axis=1)[:, :k]
+    truth_ids = [{ids[row] for row in rows} for rows in truth]
+
+    results = []
+    for name in backends:
+        with tempfile.TemporaryDirectory() as directory:
+            kwargs = {"ef": ef, "M": M} if name == "hnsw" else {}
+            started = time.perf_counter()
+            backend = build_backend(name, directory, ids, documents, matrix, **kwargs)
+            build_seconds = time.perf_counter() - started
+
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth_ids):
+                started = time.perf_counter()
+                hits = backend.search(query, k=k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                found = {doc.metadata["doc_id"] for doc, _ in hits}
+                recalls.append(len(found & expected) / len(expected))
+
+            results.append({
+                "backend": name,
+                "build_s": build_seconds,
+                "recall": float(np.mean(recalls)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recall@k and latency of vectorstore backends.")
+    parser.add_argument("--backends", default="chroma,numpy,hnsw")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--synthetic", type=int, default=0, help="Use a synthetic corpus of this size")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--ef", type=int, default=64)
+    parser.add_argument("--M", type=int, default=16)
+    parser.add_argument("--persist-directory", default=DEFAULT_PERSIST_DIRECTORY)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        ids, documents, matrix = synthetic_corpus(args.synthetic, args.dim)
+    else:
+        ids, documents, matrix = load_corpus(args.persist_directory)
+    print(f"📊 Benchmarking on {len(ids)} documents of dimension {matrix.shape[1]}, k={args.k}")
+
+    results = run(ids, documents, matrix, args.backends.split(","), k=args.k,
+                  query_count=args.queries, ef=args.ef, M=args.M)
+
+    print(f"{'backend':<10}{'build s':>10}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in results:
+        print(f"{row['backend']:<10}{row['build_s']:>10.2f}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Bulk offline ingestion from local HTML files and WARC/JSONL archives.
+
+Pages are read from disk instead of being fetched, extracted in parallel and
+pushed through the same summarize -> grade -> add_to_chroma graph as live
+ingestion. Extracted documents and finished records are checkpointed, so a
+crashed run resumes without redoing either.
+
+Run with:
+    python -m app.bulk_ingest ./archives/crawl.warc.gz --workers 4
+"""
+import os
+import re
+import gzip
+import json
+import time
+import uuid
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.documents import Document
+
+from .singleflight import normalize_url
+
+
+HTML_EXTENSIONS = (".html", ".htm")
+# Upper bound on concurrently processed records, whatever the caller asks for
+BULK_INGEST_MAX_WORKERS = int(os.environ.get("BULK_INGEST_MAX_WORKERS", "16"))
+
+
+def article_id(url: str) -> str:
+    """
+    Stable document id for an article URL. A record that was stored but not yet
+    marked done when a run crashed is overwritten on resume instead of duplicated.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, normalize_url(url)))
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _canonical_url(html: str, fallback: str) -> str:
+    """Page URL from <link rel=canonical> or og:url, else the fallback."""
+    for pattern in (
+        r'<link[^>]+rel=["\']canonical["\'][^>]+href=["\']([^"\']+)',
+        r'<meta[^>]+property=["\']og:url["\'][^>]+content=["\']([^"\']+)',
+    ):
+        match = re.search(pattern, html[:20000], re.IGNORECASE)
+        if match:
+            return match.group(1)
+    return fallback
+
+
+def iter_html_directory(path: str):
+    """Yield (record_id, url, html) for every HTML file under a directory."""
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if not name.lower().endswith(HTML_EXTENSIONS):
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, encoding="utf-8", errors="replace") as f:
+                html = f.read()
+            record_id = os.path.relpath(file_path, path)
+            yield record_id, _canonical_url(html, f"file://{os.path.abspath(file_path)}"), html
+
+
+def iter_jsonl(path: str):
+    """Yield records from a JSONL archive with url and html (or content/body) fields."""
+    with _open_text(path) as f:
+        for line_number, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            html = record.get("html") or record.get("content") or record.get("body") or ""
+            url = record.get("url") or _canonical_url(html, f"{path}#{line_number}")
+            yield str(record.get("id") or f"{os.path.basename(path)}:{line_number}"), url, html
+
+
+def iter_warc(path: str):
+    """Yield HTML responses from a WARC archive. Requires the optional warcio package."""
+    from warcio.archiveiterator import ArchiveIterator
+
+    with open(path, "rb") as f:
+        for record in ArchiveIterator(f):
+            if record.rec_type != "response":
+                continue
+            content_type = record.http_headers.get_header("Content-Type") if record.http_headers else ""
+            if not content_type or "html" not in content_type:
+                continue
+            html = record.content_stream().read().decode("utf-8", errors="replace")
+            yield (
+                record.rec_headers.get_header("WARC-Record-ID"),
+                record.rec_headers.get_header("WARC-Target-URI"),
+                html,
+            )
+
+
+def iter_records(path: str):
+    """Pick the reader for a directory, WARC or JSONL archive."""
+    if os.path.isdir(path):
+        return iter_html_directory(path)
+    if path.endswith((".warc", ".warc.gz")):
+        return iter_warc(path)
+    if path.endswith((".jsonl", ".jsonl.gz")):
+        return iter_jsonl(path)
+    raise ValueError(f"Unsupported archive: {path}")
+
+
+class IngestCheckpoint:
+    """Append-only logs of extracted documents and finished records."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.extracted_path = os.path.join(directory, "extracted.jsonl")
+        self.done_path = os.path.join(directory, "done.txt")
+        self._lock = threading.Lock()
+
+        self.extracted = {}
+        if os.path.exists(self.extracted_path):
+            with open(self.extracted_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash can leave a truncated last line
+                        continue
+                    self.extracted[record["id"]] = Document(page_content=record["text"], metadata=record["metadata"])
+
+        self.done = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+
+    def save_extracted(self, record_id: str, doc: Document):
+        with self._lock, open(self.extracted_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": record_id, "text": doc.page_content, "metadata": doc.metadata}) + "\n")
+            self.extracted[record_id] = doc
+
+    def mark_done(self, record_id: str):
+        with self._lock, open(self.done_path, "a", encoding="utf-8") as f:
+            f.write(record_id + "\n")
+            self.done.add(record_id)
+            # The extracted text is no longer needed once stored
+            self.extracted.pop(record_id, None)
+
+
+class BulkIngestor:
+    """
+    Runs archived pages through extraction and the summarization graph in parallel.
+
+    Args:
+        summarizer_graph: Compiled article summarization graph.
+        extraction_engine: ExtractionEngine used to parse the HTML.
+        checkpoint_directory: Where extraction and progress checkpoints live.
+        workers: Number of records processed concurrently, clamped to
+            1..BULK_INGEST_MAX_WORKERS.
+        admit: Optional function returning a context manager held around each
+            graph run, e.g. an API admission slot.
+    """
+
+    def __init__(self, summarizer_graph, extraction_engine, checkpoint_directory: str, workers: int = 4,
+                 admit=None):
+        self.summarizer_graph = summarizer_graph
+        self.admit = admit
+        self.extraction_engine = extraction_engine
+        self.checkpoint = IngestCheckpoint(checkpoint_directory)
+        self.workers = max(1, min(workers, BULK_INGEST_MAX_WORKERS))
+        self.stats = {"processed": 0, "skipped": 0, "failed": 0, "extracted": 0,
+                      "extract_seconds": 0.0, "elapsed_seconds": 0.0, "docs_per_second": 0.0}
+        self._lock = threading.Lock()
+
+    def _process(self, record_id: str, url: str, html: str):
+        doc = self.checkpoint.extracted.get(record_id)
+        if doc is None:
+            started = time.perf_counter()
+            doc = self.extraction_engine.extract(url, html=html)
+            doc.metadata.pop("timings", None)
+            self.checkpoint.save_extracted(record_id, doc)
+            with self._lock:
+                self.stats["extracted"] += 1
+                self.stats["extract_seconds"] += time.perf_counter() - started
+        doc.id = article_id(url)
+
+        if self.admit is None:
+            self.summarizer_graph.invoke({"website_address": url, "selected_document": [doc]})
+        else:
+            with self.admit():
+                self.summarizer_graph.invoke({"website_address": url, "selected_document": [doc]})
+        self.checkpoint.mark_done(record_id)
+
+    def run(self, path: str, progress_every: int = 25) -> dict:
+        """Ingest every record of the archive at path and return throughput stats."""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for record_id, url, html in iter_records(path):
+                if record_id in self.checkpoint.done:
+                    self.stats["skipped"] += 1
+                    continue
+                pending.add(pool.submit(self._process, record_id, url, html))
+                # Bound the number of pages held in memory
+                if len(pending) >= self.workers * 4:
+                    finished = next(as_completed(pending))
+                    pending.remove(finished)
+                    self._collect(finished, started, progress_every)
+            for finished in as_completed(pending):
+                self._collect(finished, started, progress_every)
+
+        self._update_rate(started)
+        print(f"✅ Bulk ingest finished: {self.stats}")
+        return dict(self.stats)
+
+    def _update_rate(self, started: float):
+        self.stats["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+        self.stats["docs_per_second"] = round(self.stats["processed"] / max(self.stats["elapsed_seconds"], 1e-6), 3)
+
+    def _collect(self, future, started: float, progress_every: int):
+        try:
+            future.result()
+            self.stats["processed"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"❌ Bulk ingest record failed: {e}")
+        self._update_rate(started)
+        if self.stats["processed"] and self.stats["processed"] % progress_every == 0:
+            print(f"📈 {self.stats['processed']} ingested ({self.stats['docs_per_second']} docs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest local HTML files or WARC/JSONL archives into NewsIQ.")
+    parser.add_argument("path", help="Directory of HTML files, .warc(.gz) or .jsonl(.gz) archive")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint-directory", default=None,
+                        help="Defaults to <path>.checkpoint next to the archive")
+    parser.add_argument("--persist-directory", default=None,
+                        help="Defaults to CHROMA_PERSIST_DIRECTORY, like the API")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from app.services import VectorStoreService, DEFAULT_PERSIST_DIRECTORY
+    from app.documents import configure_document_store
+    from app.workflows.stories.tools import get_extraction_engine
+    from app.workflows.stories.workflows import article_summarization_graph
+
+    service = VectorStoreService(
+        persist_directory=args.persist_directory or DEFAULT_PERSIST_DIRECTORY,
+        server_address=os.environ.get("VECTORSTORE_SOCKET"),
+        backend=os.environ.get("VECTORSTORE_BACKEND", "chroma"),
+        partition=os.environ.get("VECTORSTORE_PARTITION"),
+    )
+    configure_document_store(service.get_vectorstore())
+    duplicate_index = None
+    if os.environ.get("DUPLICATE_DETECTION", "true").lower() == "true":
+        duplicate_index = service.get_duplicate_index(float(os.environ.get("DUPLICATE_THRESHOLD", "0.8")))
+    # Workers' articles are embedded and committed in shared batches
+    writer = None
+    if os.environ.get("VECTORSTORE_WRITE_BEHIND", "true").lower() == "true":
+        writer = service.get_batched_writer(
+            max_batch_size=int(os.environ.get("VECTORSTORE_WRITE_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.environ.get("VECTORSTORE_WRITE_WINDOW_MS", "50")),
+        )
+    ingestor = BulkIngestor(
+        article_summarization_graph(
+            writer or service.get_vectorstore(),
+            topic_index=service.get_topic_index(),
+            duplicate_index=duplicate_index,
+        ),
+        get_extraction_engine(),
+        args.checkpoint_directory or f"{args.path.rstrip(os.sep)}.checkpoint",
+        workers=args.workers,
+    )
+    ingestor.run(args.path)
+    if writer is not None:
+        writer.close()
+    if hasattr(service.vectorstore, "persist"):
+        service.vectorstore.persist()
+
+
+if __name__ == "__main__":
+    main()
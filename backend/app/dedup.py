@@ -0,0 +1,213 @@
+"""
+Near-duplicate article detection with MinHash-LSH.
+
+Syndicated wire stories reach us under many URLs. Each stored article keeps a
+MinHash signature of its word shingles; LSH banding finds candidate copies in
+sub-linear time and the estimated Jaccard similarity confirms them. The index
+is an append-only JSONL log next to the vectorstore (about 1 KB per article),
+replayed on load like the topic index.
+"""
+import os
+import re
+import json
+import zlib
+import base64
+import threading
+import numpy as np
+
+from .metrics import metrics
+
+
+DEDUP_FILE_TEMPLATE = "dedup_{collection}.jsonl"
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+# LLM calls a duplicate would have cost: summary, topics and the hallucination check
+LLM_CALLS_PER_ARTICLE = 3
+
+
+class DuplicateIndex:
+    """
+    Persisted MinHash-LSH index of stored articles.
+
+    Args:
+        path: Log file, normally next to the collection it indexes.
+        threshold: Estimated Jaccard similarity above which an article is a duplicate.
+        num_perm: Signature length. bands * rows must equal num_perm.
+        bands: LSH bands; more bands find lower similarities at more candidate checks.
+        shingle_size: Words per shingle.
+        min_words: Shorter texts are never treated as duplicates.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.8, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 5, min_words: int = 50):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+
+        # Fixed seed: signatures must stay comparable across restarts
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._reset()
+        self._catch_up()
+
+    def _reset(self):
+        self.records = []        # row -> {"id", "link", "title"}
+        self.rows_by_id = {}
+        self._signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+        self._pending = []       # signatures not yet stacked into _signatures
+        self._buckets = [{} for _ in range(self.bands)]
+        self._removed = set()
+        self._offset = 0
+        self._inode = None
+
+    def signature(self, text: str):
+        """MinHash signature of the text's word shingles, None for texts too short to judge."""
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < self.min_words:
+            return None
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = ((hashes[:, None] * self._a + self._b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _matrix(self):
+        if self._pending:
+            self._signatures = np.vstack([self._signatures] + self._pending)
+            self._pending = []
+        return self._signatures
+
+    def _apply(self, record: dict):
+        if record["op"] == "remove":
+            row = self.rows_by_id.pop(record["id"], None)
+            if row is not None:
+                self._removed.add(row)
+            return
+        if record["op"] == "duplicate":
+            row = self.rows_by_id.get(record["id"])
+            if row is not None:
+                self.records[row].setdefault("duplicates", []).append(record["link"])
+            return
+
+        signature = np.frombuffer(base64.b64decode(record["signature"]), dtype=np.uint32)
+        row = len(self.records)
+        self.records.append({"id": record["id"], "link": record.get("link", ""), "title": record.get("title", "")})
+        self.rows_by_id[record["id"]] = row
+        self._pending.append(signature[None, :])
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(row)
+
+    def _catch_up(self):
+        """Replay log lines written since the last read, including other workers' appends."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self._offset):
+            self._reset()
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self._offset += len(line)
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+        self._inode = stat.st_ino
+
+    def _append(self, record: dict):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._catch_up()
+
+    def find(self, text: str):
+        """
+        Look up the closest stored copy of text.
+
+        Returns:
+            dict or None: The canonical article's record with its estimated
+            "similarity", or None when nothing reaches the threshold.
+        """
+        metrics.incr("dedup.checks")
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            self._catch_up()
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            candidates -= self._removed
+            if not candidates:
+                return None
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self._matrix()[rows] == signature).mean(axis=1)
+            best = int(similarity.argmax())
+            if similarity[best] < self.threshold:
+                return None
+            return {**self.records[rows[best]], "similarity": round(float(similarity[best]), 3)}
+
+    def add(self, doc_id: str, text: str, metadata: dict = None):
+        """Register a stored article as the canonical copy of its content."""
+        signature = self.signature(text)
+        if signature is None:
+            return
+        metadata = metadata or {}
+        record = {
+            "op": "add",
+            "id": doc_id,
+            "link": metadata.get("link", ""),
+            "title": metadata.get("title", ""),
+            "signature": base64.b64encode(signature.tobytes()).decode("ascii"),
+        }
+        with self._lock:
+            self._append(record)
+
+    def link_duplicate(self, canonical_id: str, link: str):
+        """Record another URL the canonical article was seen under."""
+        metrics.incr("dedup.duplicates")
+        metrics.incr("dedup.llm_calls_saved", LLM_CALLS_PER_ARTICLE)
+        metrics.set("dedup.duplicate_rate", round(metrics.ratio("dedup.duplicates", "dedup.checks"), 4))
+        with self._lock:
+            self._append({"op": "duplicate", "id": canonical_id, "link": link})
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._catch_up()
+            if doc_id in self.rows_by_id:
+                self._append({"op": "remove", "id": doc_id})
+
+    def rebuild(self, vectorstore, batch_size: int = 500) -> int:
+        """Index every article already in the store. Returns the count."""
+        count, offset = 0, 0
+        while True:
+            page = vectorstore.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            ids = page.get("ids", [])
+            if not ids:
+                break
+            for doc_id, text, metadata in zip(ids, page.get("documents") or [], page.get("metadatas") or []):
+                if text:
+                    self.add(doc_id, text, metadata)
+                    count += 1
+            offset += len(ids)
+        return count
@@ -0,0 +1,163 @@
+"""
+Compact document handles for graph state.
+
+Graph states carry DocumentHandles (an id plus metadata) instead of full
+Documents. The text lives once in the DocumentStore: articles that are not
+stored yet are kept there until add_to_chroma writes them, stored articles are
+loaded from the vectorstore when a node actually reads page_content. Handles
+print like Documents, so prompts render the same, but serialize without text.
+
+Within document_texts_cached() (one graph run and the response built from
+it) a stored text is loaded at most once, however often it is read.
+"""
+import uuid
+import weakref
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from langchain_core.documents import Document
+
+
+# Texts loaded in the current run, shared with its worker threads (they copy the context)
+_run_texts = contextvars.ContextVar("run_texts", default=None)
+
+
+@contextmanager
+def document_texts_cached():
+    """Keep texts loaded from the vectorstore until the block exits."""
+    token = _run_texts.set({})
+    try:
+        yield
+    finally:
+        _run_texts.reset(token)
+
+
+class DocumentStore:
+    """
+    Text behind document handles.
+
+    Args:
+        vectorstore: Store that stored documents are loaded from by id.
+    """
+
+    def __init__(self, vectorstore=None):
+        self.vectorstore = vectorstore
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def put(self, text: str, metadata: dict = None, doc_id: str = None) -> "DocumentHandle":
+        """Hold the text of a document that is not in the vectorstore yet."""
+        doc_id = doc_id or str(uuid.uuid4())
+        with self._lock:
+            self._pending[doc_id] = text
+        handle = DocumentHandle(doc_id, metadata)
+        # Documents that never get stored (duplicates, failed runs) are dropped with their handle
+        weakref.finalize(handle, self._pending.pop, doc_id, None)
+        return handle
+
+    def wrap(self, document: Document) -> "DocumentHandle":
+        """Handle for a Document, keeping its already loaded text until released."""
+        if isinstance(document, DocumentHandle):
+            return document
+        if not document.id:
+            return self.put(document.page_content, document.metadata)
+        return DocumentHandle(document.id, document.metadata, document.page_content)
+
+    def stored(self, doc_id: str):
+        """The document is in the vectorstore now; stop holding its text here."""
+        with self._lock:
+            self._pending.pop(doc_id, None)
+
+    def is_pending(self, doc_id: str) -> bool:
+        return doc_id in self._pending
+
+    def text(self, doc_id: str) -> str:
+        with self._lock:
+            text = self._pending.get(doc_id)
+        if text is not None:
+            return text
+        cache = _run_texts.get()
+        if cache is not None and doc_id in cache:
+            return cache[doc_id]
+        if self.vectorstore is None:
+            raise KeyError(f"Document {doc_id} is not available")
+        found = self.vectorstore.get_by_ids([doc_id])
+        if not found:
+            raise KeyError(f"Document {doc_id} is not available")
+        if cache is not None:
+            cache[doc_id] = found[0].page_content
+        return found[0].page_content
+
+    def text_size(self, doc_id: str) -> int:
+        """Characters held in memory for doc_id (0 when it is only in the vectorstore)."""
+        return len(self._pending.get(doc_id) or "")
+
+
+class DocumentHandle:
+    """
+    Document id and metadata, with the text resolved on demand.
+
+    Args:
+        text: Text already in memory (e.g. from a retriever), kept until release_text().
+    """
+
+    __slots__ = ("id", "metadata", "_text", "__weakref__")
+
+    def __init__(self, doc_id: str, metadata: dict = None, text: str = None):
+        self.id = doc_id
+        self.metadata = metadata if metadata is not None else {}
+        self._text = text
+
+    @property
+    def page_content(self) -> str:
+        if self._text is not None:
+            return self._text
+        return get_document_store().text(self.id)
+
+    @property
+    def type(self) -> str:
+        return "Document"
+
+    def release_text(self) -> "DocumentHandle":
+        """Drop the cached text; later reads load it again from the store."""
+        self._text = None
+        return self
+
+    def text_size(self) -> int:
+        if self._text is not None:
+            return len(self._text)
+        return get_document_store().text_size(self.id)
+
+    def to_document(self) -> Document:
+        return Document(id=self.id, page_content=self.page_content, metadata=dict(self.metadata))
+
+    def model_dump(self, **kwargs) -> dict:
+        # Responses echo the reference, not the text
+        return {"id": self.id, "metadata": self.metadata}
+
+    def __repr__(self):
+        # Prompts format document lists with repr, keep them identical to Documents
+        return repr(self.to_document())
+
+    def __getstate__(self):
+        return {"id": self.id, "metadata": self.metadata, "_text": self._text}
+
+    def __setstate__(self, state):
+        self.id = state["id"]
+        self.metadata = state["metadata"]
+        self._text = state["_text"]
+
+
+_document_store = DocumentStore()
+
+
+def get_document_store() -> DocumentStore:
+    """Process-wide store shared by the workflows."""
+    return _document_store
+
+
+def configure_document_store(vectorstore):
+    """Load stored documents from this vectorstore."""
+    _document_store.vectorstore = vectorstore
+    return _document_store
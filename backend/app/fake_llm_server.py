@@ -0,0 +1,170 @@
+"""
+Local stand-in for the Groq chat completions endpoint with a configurable
+latency tail, for exercising the LLM gateway (rate limiting, hedging)
+without spending quota.
+
+Run with:
+    python -m app.fake_llm_server --port 8765 --slow-rate 0.1 --slow-ms 5000
+
+and point the backend at it:
+    GROQ_API_BASE=http://127.0.0.1:8765 GROQ_API_KEY=fake uvicorn main:app
+"""
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """
+    Chat completions server that answers after latency_ms, or after slow_ms
+    for a slow_rate share of requests.
+
+    Args:
+        reply: Message content returned when no reply rule matches.
+        status_rate: Share of requests answered with 429 instead.
+        reply_rules: (substring, reply) pairs; the first substring found in the
+            prompt picks the reply, so graders and summarizers can get sensible answers.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, latency_ms: float = 200,
+                 slow_ms: float = 5000, slow_rate: float = 0.1, reply: str = "yes", status_rate: float = 0.0,
+                 reply_rules: list = None):
+        self.latency_ms = latency_ms
+        self.slow_ms = slow_ms
+        self.slow_rate = slow_rate
+        self.reply = reply
+        self.reply_rules = reply_rules or []
+        self.status_rate = status_rate
+        self.requests = 0
+        self.models = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _reply_for(self, messages: list) -> str:
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        for needle, reply in self.reply_rules:
+            if needle in prompt:
+                return reply
+        return self.reply
+
+    def _completion(self, model: str, prompt_tokens: int, reply: str) -> dict:
+        completion_tokens = max(1, len(reply) // 4)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _chunks(self, model: str, reply: str):
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": model}
+        yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": reply},
+                                    "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                model = request.get("model", "fake")
+                with server._lock:
+                    server.requests += 1
+                    server.models[model] = server.models.get(model, 0) + 1
+
+                if random.random() < server.status_rate:
+                    self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                    {"retry-after": "1"})
+                    return
+
+                slow = random.random() < server.slow_rate
+                time.sleep((server.slow_ms if slow else server.latency_ms) / 1000)
+
+                messages = request.get("messages", [])
+                reply = server._reply_for(messages)
+                prompt_tokens = len(json.dumps(messages)) // 4
+                if not request.get("stream"):
+                    self._send_json(200, server._completion(model, prompt_tokens, reply))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for chunk in server._chunks(model, reply):
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
+
+    def start(self):
+        """Serve from a daemon thread, e.g. inside a test script."""
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq endpoint with a slow tail.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--slow-ms", type=float, default=5000)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--status-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--reply", default="yes")
+    parser.add_argument("--reply-rule", action="append", default=[], metavar="SUBSTRING=REPLY",
+                        help="Reply with REPLY when the prompt contains SUBSTRING (repeatable)")
+    args = parser.parse_args()
+
+    reply_rules = [tuple(rule.split("=", 1)) for rule in args.reply_rule]
+    server = FakeLLMServer(args.host, args.port, args.latency_ms, args.slow_ms, args.slow_rate,
+                           args.reply, args.status_rate, reply_rules)
+    print(f"🐢 Fake LLM endpoint on {server.base_url} ({args.slow_rate:.0%} of calls take {args.slow_ms:.0f} ms)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
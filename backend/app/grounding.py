@@ -0,0 +1,136 @@
+import re
+import numpy as np
+from .metrics import metrics
+
+
+NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+ENTITY_PATTERN = re.compile(r"\b[A-Z][\w'’-]*(?:\s+[A-Z][\w'’-]*)*")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def _numbers(text: str) -> set:
+    return {number.replace(",", "").rstrip(".") for number in NUMBER_PATTERN.findall(text)}
+
+
+def _entities(text: str) -> set:
+    """Capitalized spans that do not start a sentence, a cheap stand-in for NER."""
+    entities = set()
+    for sentence in SENTENCE_PATTERN.split(text):
+        for match in ENTITY_PATTERN.finditer(sentence):
+            if match.start() == 0 and " " not in match.group():
+                continue
+            entities.add(match.group().lower())
+    return entities
+
+
+def _windows(text: str, size: int, limit: int) -> list:
+    """Split text into at most limit windows of roughly size characters on sentence boundaries."""
+    windows, current = [], ""
+    for sentence in SENTENCE_PATTERN.split(text):
+        if current and len(current) + len(sentence) > size:
+            windows.append(current)
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        windows.append(current)
+    if len(windows) > limit:
+        # Keep windows spread evenly over the source
+        step = len(windows) / limit
+        windows = [windows[int(i * step)] for i in range(limit)]
+    return windows
+
+
+class GroundingScorer:
+    """
+    Local grounding check run before the LLM hallucination grader.
+
+    Combines lexical support (numbers and named entities of the output found in
+    the source) with embedding similarity of each output sentence to its best
+    matching source window. Clear passes and clear failures are decided locally,
+    everything in between is escalated to the LLM.
+
+    Args:
+        embeddings: Embeddings model, normally the one loaded by VectorStoreService.
+        pass_similarity: Every output sentence must reach this similarity to pass.
+        fail_similarity: Any output sentence below this similarity fails.
+        min_entity_support: Share of output entities that must appear in the source to pass.
+    """
+
+    def __init__(self, embeddings, pass_similarity: float = 0.88, fail_similarity: float = 0.72,
+                 min_entity_support: float = 0.9, window_chars: int = 1200, max_windows: int = 16):
+        self.embeddings = embeddings
+        self.pass_similarity = pass_similarity
+        self.fail_similarity = fail_similarity
+        self.min_entity_support = min_entity_support
+        self.window_chars = window_chars
+        self.max_windows = max_windows
+
+    def score(self, output: str, source: str) -> dict:
+        """Lexical support ratios and per-sentence embedding similarity of output against source."""
+        source_lower = source.lower()
+        source_numbers = _numbers(source)
+
+        numbers = _numbers(output)
+        entities = _entities(output)
+        number_support = sum(1 for n in numbers if n in source_numbers) / len(numbers) if numbers else 1.0
+        entity_support = sum(1 for e in entities if e in source_lower) / len(entities) if entities else 1.0
+
+        sentences = [s for s in SENTENCE_PATTERN.split(output.strip()) if len(s) > 3]
+        windows = _windows(source, self.window_chars, self.max_windows)
+        min_similarity = 1.0
+        if sentences and windows:
+            vectors = np.asarray(self.embeddings.embed_documents(sentences + windows), dtype=np.float32)
+            similarity = vectors[:len(sentences)] @ vectors[len(sentences):].T
+            min_similarity = float(similarity.max(axis=1).min())
+
+        return {
+            "number_support": number_support,
+            "entity_support": entity_support,
+            "min_similarity": min_similarity,
+        }
+
+    def verdict(self, output: str, source: str) -> str:
+        """
+        Returns:
+            str: "pass" or "fail" when the local scores are decisive,
+            "uncertain" when the LLM grader should decide.
+        """
+        scores = self.score(output, source)
+        if scores["number_support"] < 1.0 or scores["min_similarity"] < self.fail_similarity:
+            verdict = "fail" if scores["number_support"] < 0.5 or scores["min_similarity"] < self.fail_similarity else "uncertain"
+        elif scores["entity_support"] >= self.min_entity_support and scores["min_similarity"] >= self.pass_similarity:
+            verdict = "pass"
+        else:
+            verdict = "uncertain"
+        print(f"Local grounding {verdict}: {scores}")
+        return verdict
+
+
+def precheck_grounding(grounding_scorer, output: str, source, steps: list):
+    """
+    Run the local pre-check.
+
+    A local failure is trusted once per run; a repeated failure escalates to
+    the LLM so regeneration cannot loop on a deterministic verdict. Callers
+    record a trusted failure as a "local_grounding_fail" step.
+
+    Args:
+        source: Source text, or a function building it. A function is only
+            called when a scorer is configured, so callers need not load
+            document texts for nothing.
+        steps: Steps taken so far in the run (read only).
+
+    Returns:
+        str or None: "pass" or "fail" when decided locally, None to escalate.
+    """
+    if grounding_scorer is None:
+        return None
+    if callable(source):
+        source = source()
+    metrics.incr("grounding.checks")
+    verdict = grounding_scorer.verdict(output, source)
+    if verdict == "fail" and "local_grounding_fail" in steps:
+        verdict = "uncertain"
+    metrics.incr(f"grounding.local_{verdict}" if verdict != "uncertain" else "grounding.escalated")
+    metrics.set("grounding.escalation_rate", metrics.ratio("grounding.escalated", "grounding.checks"))
+    return verdict if verdict != "uncertain" else None
@@ -0,0 +1,509 @@
+"""
+Shared LLM gateway for all workflows.
+
+Every chat model is created through one gateway, so all LLM traffic shares
+pooled HTTP connections and a single rate limiter. The limiter is a token
+bucket on both requests and tokens per minute, serves waiting callers in
+priority order (interactive answers before background ingest), and backs off
+for everyone when the provider answers 429 with Retry-After.
+
+The limiter lives in each process. With several API worker processes the
+account limits are split evenly between them (LLM_WORKER_PROCESSES, by
+default uvicorn's WEB_CONCURRENCY), so together they stay under the limits.
+
+Optionally, calls are hedged: when a call has not returned after the recent
+latency percentile, a duplicate request (to a fallback model if configured)
+is fired and whichever answers first wins.
+"""
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_groq import ChatGroq
+
+from .metrics import metrics, estimate_tokens
+
+
+# Account-wide limits, shared by all worker processes
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", "30000"))
+LLM_WORKER_PROCESSES = max(1, int(os.environ.get("LLM_WORKER_PROCESSES") or os.environ.get("WEB_CONCURRENCY") or "1"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "5"))
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+
+LLM_HEDGE = os.environ.get("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_MS = float(os.environ.get("LLM_HEDGE_MIN_DELAY_MS", "300"))
+LLM_HEDGE_MAX_RATE = float(os.environ.get("LLM_HEDGE_MAX_RATE", "0.1"))
+LLM_HEDGE_FALLBACK_MODEL = os.environ.get("LLM_HEDGE_FALLBACK_MODEL") or None
+
+# Lower rank is served first
+PRIORITIES = {"interactive": 0, "background": 1}
+# Completion tokens reserved up front, corrected once the real usage is known
+EXPECTED_OUTPUT_TOKENS = 512
+# Latencies needed before a hedge delay is trusted
+MIN_LATENCY_SAMPLES = 20
+
+
+class TokenBucketLimiter:
+    """Request and token buckets refilled continuously, with a priority wait queue."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.request_capacity, self.requests + elapsed * self.request_capacity / 60)
+        self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_capacity / 60)
+
+    def _publish_depth(self):
+        for priority, rank in PRIORITIES.items():
+            metrics.set(f"llm.queue_depth.{priority}", sum(1 for waiter in self._waiters if waiter[0] == rank))
+
+    def _seconds_until_ready(self, tokens: float) -> float:
+        wait = max(0.0, self.paused_until - time.monotonic())
+        if self.requests < 1:
+            wait = max(wait, (1 - self.requests) * 60 / self.request_capacity)
+        if self.tokens < tokens:
+            wait = max(wait, (tokens - self.tokens) * 60 / self.token_capacity)
+        return wait
+
+    def acquire(self, tokens: int, priority: str = "interactive") -> float:
+        """Block until this caller is first in line and capacity is available. Returns the wait in seconds."""
+        tokens = min(tokens, self.token_capacity)
+        entry = (PRIORITIES[priority], next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            self._publish_depth()
+            try:
+                while True:
+                    self._refill()
+                    wait = self._seconds_until_ready(tokens)
+                    if self._waiters[0] == entry and wait == 0:
+                        self.requests -= 1
+                        self.tokens -= tokens
+                        break
+                    self._cond.wait(timeout=min(max(wait, 0.01), 1.0))
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._publish_depth()
+                self._cond.notify_all()
+        return time.monotonic() - started
+
+    def adjust(self, tokens: float):
+        """Charge (or refund, if negative) tokens after the real usage is known. Refunds never exceed capacity."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.token_capacity, self.tokens - tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Stop admitting anyone for the given time, e.g. after a 429."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for one model."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percentile: float):
+        """Latency in seconds at the given percentile, None until enough samples were seen."""
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _retry_after(error):
+    """Retry-After seconds from a provider error, or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _is_rate_limited(error) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def _is_transient(error) -> bool:
+    status = getattr(error, "status_code", None)
+    return (status is not None and status >= 500) or isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+def _usage_tokens(result) -> int:
+    usage = getattr(result, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class _StreamUsage:
+    """Tokens used by a stream: the reported usage, else estimated from what was streamed."""
+
+    def __init__(self, input_tokens: int):
+        self.input_tokens = input_tokens
+        self.chunks = 0
+        self.reported = 0
+        self.text = []
+
+    def add(self, chunk):
+        self.chunks += 1
+        self.reported += _usage_tokens(chunk)
+        self.text.append(str(getattr(chunk, "content", chunk)))
+
+    def tokens(self) -> int:
+        if not self.chunks:
+            # Failed before the first chunk: nothing was generated
+            return 0
+        return self.reported or self.input_tokens + estimate_tokens("".join(self.text))
+
+
+class LLMGateway:
+    """Creates chat models that share connections, rate limits and retries."""
+
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = LLM_MAX_RETRIES, max_connections: int = LLM_MAX_CONNECTIONS,
+                 hedge: bool = LLM_HEDGE, hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+                 hedge_min_delay_ms: float = LLM_HEDGE_MIN_DELAY_MS, hedge_max_rate: float = LLM_HEDGE_MAX_RATE,
+                 hedge_fallback_model: str = LLM_HEDGE_FALLBACK_MODEL, processes: int = LLM_WORKER_PROCESSES):
+        # This process's share of the account limits
+        self.limiter = TokenBucketLimiter(
+            max(1, requests_per_minute // processes),
+            max(1, tokens_per_minute // processes),
+        )
+        self.max_retries = max_retries
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http_client = httpx.Client(limits=limits)
+        self.http_async_client = httpx.AsyncClient(limits=limits)
+
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.hedge_max_rate = hedge_max_rate
+        self.hedge_fallback_model = hedge_fallback_model
+        self.latencies = {}
+        self._hedge_lock = threading.Lock()
+        # Sync hedging runs both requests off the caller's thread
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_connections * 2, thread_name_prefix="llm-hedge")
+
+    def chat_model(self, priority: str = "interactive", **kwargs):
+        """A ChatGroq model routed through the gateway. kwargs go to ChatGroq."""
+        llm = ChatGroq(
+            max_retries=0,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            **kwargs,
+        )
+        fallback = None
+        if self.hedge_fallback_model and self.hedge_fallback_model != kwargs.get("model"):
+            fallback = ChatGroq(
+                max_retries=0,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+                **{**kwargs, "model": self.hedge_fallback_model},
+            )
+        return GatewayChatModel(self, llm, priority, model=kwargs.get("model"), fallback=fallback)
+
+    def latency(self, model: str) -> LatencyTracker:
+        with self._hedge_lock:
+            return self.latencies.setdefault(model, LatencyTracker())
+
+    def _hedge_delay(self, model: str):
+        """Seconds to wait before hedging a call to model, None when the call should not be hedged."""
+        if not self.hedge or model is None:
+            return None
+        percentile = self.latency(model).percentile(self.hedge_percentile)
+        if percentile is None:
+            return None
+        delay = max(self.hedge_min_delay, percentile)
+        metrics.set(f"llm.hedge_delay_ms.{model}", round(delay * 1000, 1))
+        return delay
+
+    def _take_hedge_budget(self) -> bool:
+        """Allow a hedge only while hedges stay under the configured share of calls."""
+        with self._hedge_lock:
+            hedges = metrics.get("llm.hedges")
+            if hedges + 1 > self.hedge_max_rate * max(metrics.get("llm.hedge_eligible"), 1):
+                metrics.incr("llm.hedges_capped")
+                return False
+            metrics.incr("llm.hedges")
+            return True
+
+    def _record_hedge_outcome(self, hedge_won: bool):
+        if hedge_won:
+            metrics.incr("llm.hedge_wins")
+        metrics.set("llm.hedge_rate", round(metrics.ratio("llm.hedges", "llm.hedge_eligible"), 4))
+        metrics.set("llm.hedge_win_rate", round(metrics.ratio("llm.hedge_wins", "llm.hedges"), 4))
+
+    def _before_call(self, reserved: int, priority: str):
+        waited = self.limiter.acquire(reserved, priority)
+        metrics.incr("llm.requests")
+        metrics.incr(f"llm.requests.{priority}")
+        metrics.incr("llm.wait_seconds_total", waited)
+        metrics.set(f"llm.last_wait_ms.{priority}", round(waited * 1000, 1))
+        metrics.set("llm.avg_wait_ms", round(metrics.ratio("llm.wait_seconds_total", "llm.requests") * 1000, 1))
+
+    def _after_error(self, error, attempt: int) -> bool:
+        """Decide whether to retry, pausing the limiter if the provider asked for it."""
+        if attempt >= self.max_retries:
+            return False
+        if _is_rate_limited(error):
+            metrics.incr("llm.rate_limited")
+            delay = _retry_after(error) or min(60.0, 2 ** attempt + random.random())
+            self.limiter.pause(delay)
+        elif _is_transient(error):
+            time.sleep(min(30.0, 2 ** attempt * 0.5 + random.random()))
+        else:
+            return False
+        metrics.incr("llm.retries")
+        return True
+
+    def call(self, fn, input_tokens: int, priority: str, model: str = None, admitted=None):
+        """
+        Run fn() under the limiter with retries.
+
+        Args:
+            model: Records the call latency for hedging under this model name.
+            admitted: Optional event set once the limiter let the call through.
+        """
+        reserved = input_tokens + EXPECTED_OUTPUT_TOKENS
+        try:
+            for attempt in itertools.count():
+                self._before_call(reserved, priority)
+                if admitted is not None:
+                    admitted.set()
+                started = time.perf_counter()
+                try:
+                    result = fn()
+                except Exception as e:
+                    # The failed attempt's token reservation goes back to the bucket
+                    self.limiter.adjust(-reserved)
+                    if not self._after_error(e, attempt):
+                        raise
+                    continue
+                if model is not None:
+                    self.latency(model).record(time.perf_counter() - started)
+                used = _usage_tokens(result)
+                if used:
+                    self.limiter.adjust(used - reserved)
+                return result
+        finally:
+            if admitted is not None:
+                admitted.set()
+
+    async def acall(self, fn, input_tokens: int, priority: str, model: str = None, admitted=None):
+        """Async variant of call; fn returns an awaitable and admitted is an asyncio.Event."""
+        reserved = input_tokens + EXPECTED_OUTPUT_TOKENS
+        try:
+            for attempt in itertools.count():
+                await asyncio.to_thread(self._before_call, reserved, priority)
+                if admitted is not None:
+                    admitted.set()
+                started = time.perf_counter()
+                try:
+                    result = await fn()
+                except Exception as e:
+                    self.limiter.adjust(-reserved)
+                    if not await asyncio.to_thread(self._after_error, e, attempt):
+                        raise
+                    continue
+                if model is not None:
+                    self.latency(model).record(time.perf_counter() - started)
+                used = _usage_tokens(result)
+                if used:
+                    self.limiter.adjust(used - reserved)
+                return result
+        finally:
+            if admitted is not None:
+                admitted.set()
+
+    def hedged_call(self, primary, hedge, input_tokens: int, priority: str, model: str = None):
+        """
+        Run primary(); if it is still running after the hedge delay, also run
+        hedge() and return whichever result arrives first.
+
+        Time spent queued in the limiter does not count towards the delay. The
+        losing sync request cannot be aborted and finishes in the background.
+        """
+        delay = self._hedge_delay(model)
+        if delay is None:
+            return self.call(primary, input_tokens, priority, model)
+
+        metrics.incr("llm.hedge_eligible")
+        admitted = threading.Event()
+        first = self._hedge_pool.submit(self.call, primary, input_tokens, priority, model, admitted)
+        admitted.wait()
+        done, _ = wait([first], timeout=delay)
+        if done or not self._take_hedge_budget():
+            return first.result()
+
+        second = self._hedge_pool.submit(self.call, hedge, input_tokens, priority)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        # On a tie the primary wins
+        winner = first if first in done else second
+        other = second if winner is first else first
+        try:
+            result = winner.result()
+        except Exception:
+            winner = other
+            result = other.result()
+        self._record_hedge_outcome(winner is second)
+        return result
+
+    async def ahedged_call(self, primary, hedge, input_tokens: int, priority: str, model: str = None):
+        """Async variant of hedged_call; the losing request is cancelled."""
+        delay = self._hedge_delay(model)
+        if delay is None:
+            return await self.acall(primary, input_tokens, priority, model)
+
+        metrics.incr("llm.hedge_eligible")
+        admitted = asyncio.Event()
+        first = asyncio.ensure_future(self.acall(primary, input_tokens, priority, model, admitted))
+        second = None
+        try:
+            await admitted.wait()
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not self._take_hedge_budget():
+                return await first
+
+            second = asyncio.ensure_future(self.acall(hedge, input_tokens, priority))
+            done, _ = await asyncio.wait({first, second}, return_when=asyncio.FIRST_COMPLETED)
+            winner = first if first in done else second
+            other = second if winner is first else first
+            if winner.exception() is not None:
+                winner = other
+                result = await other
+            else:
+                result = winner.result()
+            self._record_hedge_outcome(winner is second)
+            return result
+        finally:
+            # The loser, or both requests when the caller itself is cancelled
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+
+def _input_tokens(input) -> int:
+    text = input.to_string() if hasattr(input, "to_string") else str(input)
+    return estimate_tokens(text)
+
+
+class GatewayChatModel(Runnable):
+    """Runnable wrapper so `prompt | llm | parser` chains go through the gateway."""
+
+    def __init__(self, gateway: LLMGateway, llm, priority: str = "interactive", model: str = None, fallback=None):
+        self.gateway = gateway
+        self.llm = llm
+        self.priority = priority
+        self.model = model
+        # Hedged duplicates go here when set, otherwise to the same model
+        self.fallback = fallback
+
+    def with_priority(self, priority: str):
+        """Same model and connections, different priority class."""
+        return GatewayChatModel(self.gateway, self.llm, priority, self.model, self.fallback)
+
+    def invoke(self, input, config=None, **kwargs):
+        hedge_llm = self.fallback or self.llm
+        return self.gateway.hedged_call(
+            lambda: self.llm.invoke(input, config, **kwargs),
+            lambda: hedge_llm.invoke(input, config, **kwargs),
+            _input_tokens(input), self.priority, self.model,
+        )
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        hedge_llm = self.fallback or self.llm
+        return await self.gateway.ahedged_call(
+            lambda: self.llm.ainvoke(input, config, **kwargs),
+            lambda: hedge_llm.ainvoke(input, config, **kwargs),
+            _input_tokens(input), self.priority, self.model,
+        )
+
+    def stream(self, input, config=None, **kwargs):
+        # Streams are admitted once; retries are not possible after the first chunk
+        input_tokens = _input_tokens(input)
+        reserved = input_tokens + EXPECTED_OUTPUT_TOKENS
+        self.gateway._before_call(reserved, self.priority)
+        usage = _StreamUsage(input_tokens)
+        try:
+            for chunk in self.llm.stream(input, config, **kwargs):
+                usage.add(chunk)
+                yield chunk
+        finally:
+            # Finished, failed or abandoned: correct the reservation like call() does
+            self.gateway.limiter.adjust(usage.tokens() - reserved)
+
+    async def astream(self, input, config=None, **kwargs):
+        input_tokens = _input_tokens(input)
+        reserved = input_tokens + EXPECTED_OUTPUT_TOKENS
+        await asyncio.to_thread(self.gateway._before_call, reserved, self.priority)
+        usage = _StreamUsage(input_tokens)
+        try:
+            async for chunk in self.llm.astream(input, config, **kwargs):
+                usage.add(chunk)
+                yield chunk
+        finally:
+            self.gateway.limiter.adjust(usage.tokens() - reserved)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway shared by every workflow."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+_loop = None
+
+
+def run_coroutine(coro):
+    """
+    Run a coroutine from synchronous graph code on the gateway's long-lived
+    event loop, so the shared async HTTP client always stays on one loop.
+    """
+    global _loop
+    with _gateway_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-gateway-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
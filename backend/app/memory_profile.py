@@ -0,0 +1,152 @@
+"""
+Per-request memory profile of the ingest and answer workflows.
+
+Runs the summarization graph on synthetic articles (and then the answer graph
+on the resulting store) against the local fake LLM endpoint, with concurrent
+requests, and reports traced Python allocations: the peak while requests are
+in flight, what the finished results keep alive, and the size of the
+serialized API response.
+
+Run with:
+    python -m app.memory_profile --requests 16 --concurrency 8 --article-kb 60
+    python -m app.memory_profile --fake-embeddings   # leave the embedding model out
+"""
+import os
+import gc
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+
+from .fake_llm_server import FakeLLMServer
+
+
+# Replies that make every grader pass, so each request runs the happy path once
+REPLY_RULES = [
+    ("fact checker", "no"),
+    ("related to the question", "yes"),
+    ("Identify and list the main topics", "Artificial intelligence, Robotics, Climate policy"),
+    ("professional content summarizer", "The article describes how robots are changing climate research."),
+    ("question re-writer", "How are robots changing climate research?"),
+]
+WORDS = ("robot", "climate", "policy", "research", "energy", "market", "model", "city", "data", "law",
+         "science", "report", "people", "government", "company", "future", "system", "water", "health")
+
+
+def synthetic_html(index: int, size_kb: int, seed: int = 0) -> str:
+    """A news-like page with roughly size_kb of article text plus page chrome."""
+    rng = random.Random(seed * 100003 + index)
+    paragraphs, size = [], 0
+    while size < size_kb * 1024:
+        paragraph = " ".join(rng.choice(WORDS) for _ in range(80)).capitalize() + "."
+        paragraphs.append(f"<p>{paragraph}</p>")
+        size += len(paragraph)
+    chrome = "<nav>" + "".join(f"<a href='/s{i}'>Section {i}</a>" for i in range(200)) + "</nav>"
+    return (
+        f"<html><head><title>Article {index}</title></head><body>{chrome}"
+        f"<article><h1>Article {index}</h1>{''.join(paragraphs)}</article>{chrome}</body></html>"
+    )
+
+
+def measure(label: str, jobs, concurrency: int) -> dict:
+    """Run jobs concurrently under tracemalloc and report traced memory in MB."""
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda job: job(), jobs))
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    row = {
+        "workflow": label,
+        "requests": len(jobs),
+        "peak_mb": (peak - baseline) / 2 ** 20,
+        "per_request_peak_mb": (peak - baseline) / 2 ** 20 / min(concurrency, len(jobs)),
+        "retained_mb_per_request": (current - baseline) / 2 ** 20 / len(jobs),
+        "response_kb": sum(size for _, size in results) / len(jobs) / 1024,
+        "seconds": elapsed,
+    }
+    return row
+
+
+def run(requests: int = 16, concurrency: int = 8, article_kb: int = 60, fake_embeddings: bool = False) -> list:
+    server = FakeLLMServer(port=0, latency_ms=20, slow_rate=0.0, reply="Robots are changing climate research.",
+                           reply_rules=REPLY_RULES).start()
+    os.environ["GROQ_API_BASE"] = server.base_url
+    os.environ.setdefault("GROQ_API_KEY", "fake")
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+
+    from .services import BackendVectorStore, create_backend, create_embeddings, DEFAULT_EMBEDDING_MODEL
+    from .services import ScoredRetriever, InstructRetriever
+    from .responses import to_jsonable
+    from .documents import configure_document_store
+    from .workflows.stories.workflows import article_summarization_graph
+    from .workflows.answer.workflows import question_answering_graph
+
+    if fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        embeddings = DeterministicFakeEmbedding(size=1024)
+    else:
+        embeddings = create_embeddings(DEFAULT_EMBEDDING_MODEL)
+
+    directory = tempfile.mkdtemp(prefix="newsiq-memprofile-")
+    vectorstore = BackendVectorStore(embeddings, create_backend("numpy", os.path.join(directory, "index")))
+    configure_document_store(vectorstore)
+    summarizer_graph = article_summarization_graph(vectorstore)
+    retriever = InstructRetriever(base_retriever=ScoredRetriever(vectorstore=vectorstore, k=3),
+                                  task_description="Retrieve most relevant documents to the query")
+    qa_graph = question_answering_graph(retriever, score_thresholds={}, speculative=False)
+
+    def ingest(i):
+        def job():
+            # Built per request, like a fetched page
+            html = synthetic_html(i, article_kb)
+            result = summarizer_graph.invoke({"website_address": f"https://example.com/{i}", "html": html})
+            del html
+            # What /api/scrape-summarize sends back
+            return result, len(orjson.dumps(to_jsonable(result)))
+        return job
+
+    def answer(i):
+        def job():
+            result = qa_graph.invoke({"question": f"How are robots changing climate research? ({i})"})
+            return result, len(orjson.dumps(to_jsonable(result)))
+        return job
+
+    tracemalloc.start()
+    # Warm up imports, models and connection pools outside the measurement
+    summarizer_graph.invoke({"website_address": "https://example.com/warmup", "html": synthetic_html(-1, article_kb)})
+    rows = [
+        measure("ingest", [ingest(i) for i in range(requests)], concurrency),
+        measure("answer", [answer(i) for i in range(requests)], concurrency),
+    ]
+    tracemalloc.stop()
+    server.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-request memory of the NewsIQ workflows.")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--article-kb", type=int, default=60)
+    parser.add_argument("--fake-embeddings", action="store_true",
+                        help="Use deterministic fake embeddings instead of loading the model")
+    args = parser.parse_args()
+
+    rows = run(args.requests, args.concurrency, args.article_kb, args.fake_embeddings)
+    print(f"{'workflow':<10}{'peak MB':>10}{'MB/req':>10}{'kept MB/req':>13}{'resp KB':>10}{'s':>8}")
+    for row in rows:
+        print(f"{row['workflow']:<10}{row['peak_mb']:>10.1f}{row['per_request_peak_mb']:>10.2f}"
+              f"{row['retained_mb_per_request']:>13.2f}{row['response_kb']:>10.1f}{row['seconds']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
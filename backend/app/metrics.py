@@ -0,0 +1,43 @@
+import threading
+
+
+class Metrics:
+    """Thread-safe counters and gauges shared by the workflows and the API."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1):
+        """Add value to a counter."""
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    def set(self, name: str, value: float):
+        """Set a gauge."""
+        with self._lock:
+            self._values[name] = value
+
+    def get(self, name: str, default: float = 0):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def ratio(self, numerator: str, denominator: str) -> float:
+        """numerator / denominator, 0 when nothing was counted yet."""
+        with self._lock:
+            total = self._values.get(denominator, 0)
+            return self._values.get(numerator, 0) / total if total else 0.0
+
+    def snapshot(self, prefix: str = "") -> dict:
+        """Current values, optionally only those whose name starts with prefix."""
+        with self._lock:
+            return {name: value for name, value in sorted(self._values.items()) if name.startswith(prefix)}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for cost accounting."""
+    return len(text) // 4
+
+
+# Process-wide registry
+metrics = Metrics()
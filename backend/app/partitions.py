@@ -0,0 +1,381 @@
+"""
+Time-partitioned vectorstore.
+
+Articles are stored in one collection per week or month of ingestion
+(news_2025_06, news_2025w23, ...), listed in a manifest next to the
+vectorstore. Searches bounded by an ingested_at lower bound (recency-scoped
+questions) only touch the partitions that overlap it, and the results are
+merged by score. Partitions are opened on first use and the least recently
+used ones are closed beyond max_loaded, so the working set stays small while
+the whole history stays queryable. Unscoped reads open the partitions that
+are not loaded into a separate cache of the same size, so they do not evict
+the recent ones, and a write to a cached partition moves it over to the
+loaded ones rather than opening it twice.
+
+Writes hold the store lock from partition lookup to the end of the write, so
+a partition is never evicted (and reopened) while it is being written. The
+partition of every id is logged next to the manifest, so lookups and deletes
+by id go straight to it.
+
+The collection that existed before partitioning was enabled stays on as the
+partition covering everything ingested before then.
+"""
+import os
+import json
+import math
+import time
+import uuid
+import threading
+import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.vectorstores import VectorStore
+
+
+PARTITIONS_FILE_TEMPLATE = "partitions_{collection}.json"
+PARTITION_IDS_FILE_TEMPLATE = "partition_ids_{collection}.jsonl"
+PERIODS = ("week", "month")
+
+
+def partition_bounds(timestamp: float, period: str) -> tuple:
+    """
+    Partition suffix and [start, end) Unix timestamps of the week (ISO, from
+    Monday) or month that contains timestamp, in UTC.
+    """
+    moment = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+    if period == "week":
+        start = datetime.datetime(moment.year, moment.month, moment.day, tzinfo=datetime.timezone.utc)
+        start -= datetime.timedelta(days=moment.weekday())
+        end = start + datetime.timedelta(days=7)
+        year, week, _ = start.isocalendar()
+        suffix = f"{year}w{week:02d}"
+    elif period == "month":
+        start = datetime.datetime(moment.year, moment.month, 1, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+        suffix = f"{moment.year}_{moment.month:02d}"
+    else:
+        raise ValueError(f"Unknown partition period: {period} (expected one of {PERIODS})")
+    return suffix, start.timestamp(), end.timestamp()
+
+
+def time_bounds(where: dict) -> tuple:
+    """(since, until) bounds on ingested_at in a Chroma-style where clause, None when open."""
+    since = until = None
+    if not where:
+        return since, until
+    clauses = where.get("$and", []) + [{key: value} for key, value in where.items() if key != "$and"]
+    for clause in clauses:
+        condition = clause.get("ingested_at")
+        if not isinstance(condition, dict):
+            continue
+        for operator in ("$gt", "$gte"):
+            if operator in condition:
+                since = condition[operator] if since is None else max(since, condition[operator])
+        for operator in ("$lt", "$lte"):
+            if operator in condition:
+                until = condition[operator] if until is None else min(until, condition[operator])
+    return since, until
+
+
+class PartitionedVectorStore(VectorStore):
+    """
+    Vectorstore spread over per-period collections.
+
+    Args:
+        embeddings: Embedding model shared by all partitions.
+        create_store: Function name -> vectorstore opening (or creating) one collection.
+        upsert: Function (store, ids, embeddings, metadatas, documents) writing precomputed embeddings.
+        search: Function (store, vector, k, filter) -> [(Document, relevance)].
+        manifest_path: JSON file listing the partitions and their time ranges.
+        ids_path: JSON lines log of the partition holding each id.
+        base_name: The unpartitioned collection; partitions are named <base_name>_<period suffix>.
+        period: "week" or "month".
+        max_loaded: Partitions kept open at once.
+    """
+
+    def __init__(self, embeddings, create_store, upsert, search, manifest_path: str, ids_path: str, base_name: str,
+                 period: str = "month", max_loaded: int = 6):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown partition period: {period} (expected one of {PERIODS})")
+        self._embeddings = embeddings
+        self.create_store = create_store
+        self._upsert = upsert
+        self._search = search
+        self.manifest_path = manifest_path
+        self.ids_path = ids_path
+        self.base_name = base_name
+        self.period = period
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        # Opened for reads only, kept apart so they do not evict the loaded ones
+        self._cached = OrderedDict()
+        # (where, offset) -> (partition, offset in it) where a get() page ended
+        self._cursors = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_manifest()
+        self._load_ids()
+
+    @property
+    def embeddings(self):
+        return self._embeddings
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest["period"] != self.period:
+                raise ValueError(f"{self.manifest_path} partitions by {manifest['period']}, not {self.period}")
+        else:
+            # Everything stored so far stays in the base collection
+            manifest = {"period": self.period, "partitions": {self.base_name: [0, time.time()]}}
+        self.partitions = {name: tuple(bounds) for name, bounds in manifest["partitions"].items()}
+        self._save_manifest()
+
+    def _save_manifest(self):
+        manifest = {"period": self.period, "partitions": {name: list(bounds) for name, bounds in self.partitions.items()}}
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _load_ids(self):
+        """Read the id -> partition log, rebuilding it from the partitions when missing."""
+        self.id_partitions = {}
+        if not os.path.exists(self.ids_path):
+            # Partitions written before ids were logged; the base collection needs no entries
+            for name in self.partitions:
+                if name != self.base_name:
+                    self.id_partitions.update(dict.fromkeys(self.create_store(name).get(include=[])["ids"], name))
+            self._write_ids()
+            return
+        lines = 0
+        with open(self.ids_path) as f:
+            for line in f:
+                try:
+                    record_id, name = json.loads(line)
+                except ValueError:
+                    # Torn last line of a crashed write
+                    continue
+                lines += 1
+                if name is None:
+                    self.id_partitions.pop(record_id, None)
+                else:
+                    self.id_partitions[record_id] = name
+        if lines > 2 * len(self.id_partitions) + 1000:
+            self._write_ids()
+
+    def _write_ids(self):
+        """Rewrite the id log with one line per live id."""
+        tmp_path = f"{self.ids_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for record_id, name in self.id_partitions.items():
+                f.write(json.dumps([record_id, name]) + "\n")
+        os.replace(tmp_path, self.ids_path)
+
+    def _log_ids(self, entries: dict):
+        """Record id -> partition changes (None for deleted ids)."""
+        with open(self.ids_path, "a") as f:
+            f.writelines(json.dumps([record_id, name]) + "\n" for record_id, name in entries.items())
+        for record_id, name in entries.items():
+            if name is None:
+                self.id_partitions.pop(record_id, None)
+            else:
+                self.id_partitions[record_id] = name
+
+    def _by_partition(self, ids) -> dict:
+        """Ids grouped by the partition holding them; unlogged ids belong to the base collection."""
+        groups = {}
+        for record_id in ids:
+            groups.setdefault(self.id_partitions.get(record_id, self.base_name), []).append(record_id)
+        return groups
+
+    def _partition_for(self, timestamp: float) -> str:
+        """Name of the partition for an ingestion time, registering it if new."""
+        suffix, start, end = partition_bounds(timestamp, self.period)
+        name = f"{self.base_name}_{suffix}"
+        with self._lock:
+            if name not in self.partitions:
+                self.partitions[name] = (start, end)
+                self._save_manifest()
+                print(f"🗂️ New vectorstore partition {name}")
+        return name
+
+    def _store(self, name: str, keep: bool = True):
+        """
+        Open partition. With keep, a partition that is not loaded joins the
+        loaded ones, closing the least recently used one if needed; otherwise
+        it goes to the read cache, which is bounded the same way.
+        """
+        with self._lock:
+            store = self._loaded.get(name)
+            if store is not None:
+                self._loaded.move_to_end(name)
+                return store
+            store = self._cached.pop(name, None)
+            if not keep:
+                if store is None:
+                    store = self.create_store(name)
+                self._cached[name] = store
+                while len(self._cached) > self.max_loaded:
+                    self._cached.popitem(last=False)
+                return store
+            if store is None:
+                store = self.create_store(name)
+            self._loaded[name] = store
+            while len(self._loaded) > self.max_loaded:
+                _, evicted = self._loaded.popitem(last=False)
+                persist = getattr(evicted, "persist", None)
+                if persist is not None:
+                    persist()
+            return store
+
+    def select(self, since: float = None, until: float = None) -> List[str]:
+        """Partitions overlapping [since, until), newest first."""
+        names = [
+            name for name, (start, end) in self.partitions.items()
+            if (since is None or end > since) and (until is None or start <= until)
+        ]
+        return sorted(names, key=lambda name: self.partitions[name][1], reverse=True)
+
+    def stats(self) -> dict:
+        return {"period": self.period, "partitions": len(self.partitions), "loaded": list(self._loaded),
+                "cached": list(self._cached)}
+
+    # --- Writes ---
+
+    def _group(self, ids, metadatas):
+        """Row indices per partition, by ingested_at (now when missing)."""
+        groups = {}
+        now = time.time()
+        for i, metadata in enumerate(metadatas):
+            timestamp = (metadata or {}).get("ingested_at") or now
+            groups.setdefault(self._partition_for(float(timestamp)), []).append(i)
+        return groups
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        vectors = self._embeddings.embed_documents(texts)
+        return self.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+
+    def upsert(self, ids=None, embeddings=None, metadatas=None, documents=None):
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in documents]
+        metadatas = list(metadatas) if metadatas else [{} for _ in ids]
+        with self._lock:
+            groups = self._group(ids, metadatas)
+            for name, rows in groups.items():
+                self._upsert(
+                    self._store(name),
+                    [ids[i] for i in rows],
+                    [embeddings[i] for i in rows],
+                    [metadatas[i] for i in rows],
+                    [documents[i] for i in rows],
+                )
+            placed = {ids[i]: name for name, rows in groups.items() for i in rows}
+            # Ids re-ingested into a newer partition leave their old one
+            moved = [record_id for record_id, name in placed.items()
+                     if self.id_partitions.get(record_id, name) != name]
+            for name, stale in self._by_partition(moved).items():
+                if name in self.partitions:
+                    self._store(name).delete(stale)
+            self._log_ids({record_id: name for record_id, name in placed.items() if name != self.base_name})
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        with self._lock:
+            for name, group in self._by_partition(ids or []).items():
+                if name in self.partitions:
+                    self._store(name).delete(group)
+            self._log_ids({record_id: None for record_id in ids or [] if record_id in self.id_partitions})
+
+    def persist(self):
+        with self._lock:
+            for store in self._loaded.values():
+                persist = getattr(store, "persist", None)
+                if persist is not None:
+                    persist()
+
+    # --- Reads ---
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None, **kwargs):
+        """Search the partitions overlapping the filter's ingested_at bounds concurrently and merge by score."""
+        since, until = time_bounds(filter)
+        names = self.select(since, until)
+        if not names:
+            return []
+        # Only recency-scoped searches load partitions for good
+        stores = [self._store(name, keep=since is not None) for name in names]
+        with ThreadPoolExecutor(max_workers=len(stores)) as pool:
+            result_lists = list(pool.map(lambda store: self._search(store, embedding, k, filter), stores))
+        merged = [pair for results in result_lists for pair in results]
+        return sorted(merged, key=lambda pair: pair[1], reverse=True)[:k]
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_relevance_scores(self._embeddings.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        # Distances, like Chroma: invert the relevance 1 - d / sqrt(2)
+        return [(doc, (1.0 - relevance) * math.sqrt(2)) for doc, relevance in
+                self.similarity_search_with_relevance_scores(query, k=k, filter=filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_relevance_scores(query, k=k, filter=filter)]
+
+    def get(self, where=None, limit=None, offset=0, include=None, **kwargs):
+        """
+        Page through the partitions overlapping the where clause, newest first, in Chroma's get() shape.
+
+        Where each page ends is remembered, so the next page resumes in the
+        partition the last one stopped in; only other offsets count the
+        records of the partitions they skip.
+        """
+        include = include if include is not None else ["documents", "metadatas"]
+        merged = {"ids": [], **{field: [] for field in include}}
+        skip = offset or 0
+        since, until = time_bounds(where)
+        names = self.select(since, until)
+        where_key = json.dumps(where, sort_keys=True, default=str)
+        with self._lock:
+            cursor = self._cursors.pop((where_key, skip), None) if skip else None
+        if cursor is not None and cursor[0] in names:
+            names, skip = names[names.index(cursor[0]):], cursor[1]
+        else:
+            cursor = None
+        position = None
+        for name in names:
+            if limit is not None and len(merged["ids"]) >= limit:
+                break
+            store = self._store(name, keep=since is not None)
+            if skip and cursor is None:
+                size = len(store.get(where=where, include=[])["ids"])
+                if skip >= size:
+                    skip -= size
+                    continue
+            remaining = None if limit is None else limit - len(merged["ids"])
+            page = store.get(where=where, limit=remaining, offset=skip, include=include)
+            position = (name, skip + len(page["ids"]))
+            skip = 0
+            merged["ids"].extend(page["ids"])
+            for field in include:
+                values = page.get(field)
+                merged[field].extend(list(values) if values is not None else [None] * len(page["ids"]))
+        if limit is not None and position is not None and merged["ids"]:
+            with self._lock:
+                self._cursors[(where_key, (offset or 0) + len(merged["ids"]))] = position
+                while len(self._cursors) > 64:
+                    self._cursors.popitem(last=False)
+        return merged
+
+    def get_by_ids(self, ids):
+        """Documents for the ids that exist, each read from the partition holding it."""
+        found = {}
+        for name, group in self._by_partition(ids).items():
+            if name in self.partitions:
+                found.update({doc.id: doc for doc in self._store(name, keep=False).get_by_ids(group)})
+        return [found[record_id] for record_id in ids if record_id in found]
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Create PartitionedVectorStore through VectorStoreService")
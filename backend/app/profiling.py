@@ -0,0 +1,248 @@
+"""
+On-demand profiling of a live worker.
+
+Two tools, both idle (no thread, no hooks) until an admin asks for them:
+
+- StackSampler: samples the stacks of all threads every few milliseconds for
+  a bounded time and returns them in collapsed-stack format
+  ("thread;outer;inner count" lines), ready for flamegraph.pl or speedscope.
+- RequestTrace: traces one tagged request. The graph run is profiled with
+  cProfile in its worker thread, allocations are tracked with tracemalloc,
+  and all threads are sampled while the request is handled, so time spent in
+  e5 inference, Chroma, prompt building and JSON serialization all shows up.
+
+A request is traced when it carries the X-Profile-Trace header with the
+admin token; its trace id comes back in X-Profile-Trace-Id.
+"""
+import os
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import secrets
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter, deque
+
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "60"))
+# Finished request traces kept for download
+PROFILE_KEEP_TRACES = int(os.environ.get("PROFILE_KEEP_TRACES", "10"))
+
+TRACE_HEADER = b"x-profile-trace"
+TRACE_ID_HEADER = b"x-profile-trace-id"
+TRACEMALLOC_FRAMES = 25
+
+
+def check_admin_token(token: str) -> bool:
+    """True for the configured admin token; profiling is disabled without ADMIN_TOKEN."""
+    return bool(ADMIN_TOKEN) and bool(token) and secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples every thread's stack at a fixed interval from a background thread.
+
+    Args:
+        interval_ms: Time between samples.
+    """
+
+    def __init__(self, interval_ms: float = 5):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def run(self, seconds: float):
+        """Sample for seconds (capped at PROFILE_MAX_SECONDS), blocking."""
+        self.start()
+        time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        return self.stop()
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text, one "frame;frame;... count" line per distinct stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class _TracemallocSession:
+    """Shares tracemalloc between overlapping traces, leaving it as it was found."""
+
+    _lock = threading.Lock()
+    _users = 0
+    _started_here = False
+
+    @classmethod
+    def acquire(cls):
+        with cls._lock:
+            if cls._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                cls._started_here = True
+            cls._users += 1
+
+    @classmethod
+    def release(cls):
+        with cls._lock:
+            cls._users -= 1
+            if cls._users == 0 and cls._started_here:
+                tracemalloc.stop()
+                cls._started_here = False
+
+
+class RequestTrace:
+    """cProfile, tracemalloc and stack samples of one request."""
+
+    def __init__(self, method: str, path: str, interval_ms: float = 2):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval_ms)
+        self.started = None
+        self.duration = None
+        self.allocations = []
+        self.peak_bytes = None
+        self._baseline = None
+
+    def start(self):
+        _TracemallocSession.acquire()
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+        self.sampler.start()
+        self.started = time.perf_counter()
+        return self
+
+    def stop(self, top: int = 25):
+        self.duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        _TracemallocSession.release()
+        # Allocations made (and still alive) during the request, by allocating line
+        own_file = tracemalloc.Filter(False, __file__)
+        self.allocations = [
+            {"site": str(stat.traceback[0]), "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+            for stat in snapshot.filter_traces([own_file]).compare_to(self._baseline.filter_traces([own_file]), "lineno")[:top]
+        ]
+        self._baseline = None
+        return self
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn under this trace's cProfile (in the calling thread)."""
+        return self.profile.runcall(fn, *args, **kwargs)
+
+    def functions(self, top: int = 30) -> list:
+        """Functions by cumulative time in the profiled graph run."""
+        try:
+            stats = pstats.Stats(self.profile)
+        except TypeError:
+            # Nothing was profiled (e.g. the request did not run a graph)
+            return []
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:top]
+        return [
+            {
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "total_s": round(total, 4),
+                "cumulative_s": round(cumulative, 4),
+            }
+            for (filename, line, name), (_, calls, total, cumulative, _) in rows
+        ]
+
+    def report(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "duration_s": round(self.duration, 4) if self.duration is not None else None,
+            "samples": self.sampler.samples,
+            "peak_traced_mb": round(self.peak_bytes / 2 ** 20, 2) if self.peak_bytes is not None else None,
+            "functions": self.functions(),
+            "allocations": self.allocations,
+        }
+
+
+# Trace of the request being handled, inherited by its worker threads through asyncio.to_thread
+current_trace = contextvars.ContextVar("current_trace", default=None)
+traces = deque(maxlen=PROFILE_KEEP_TRACES)
+
+
+def get_trace(trace_id: str):
+    return next((trace for trace in traces if trace.id == trace_id), None)
+
+
+def profiled(fn, *args, **kwargs):
+    """Call fn, under cProfile when the current request is traced."""
+    trace = current_trace.get()
+    if trace is None:
+        return fn(*args, **kwargs)
+    return trace.call(fn, *args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware tracing requests tagged with the X-Profile-Trace header.
+    Untagged requests are passed straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = next((value for name, value in scope["headers"] if name == TRACE_HEADER), None)
+        if token is None or not check_admin_token(token.decode("latin-1")):
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace(scope["method"], scope["path"]).start()
+        reset = current_trace.set(trace)
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(TRACE_ID_HEADER, trace.id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            current_trace.reset(reset)
+            trace.stop()
+            traces.append(trace)
+            print(f"🔬 Traced {trace.method} {trace.path} in {trace.duration:.2f}s (trace {trace.id})")
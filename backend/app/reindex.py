@@ -0,0 +1,333 @@
+"""
+Offline bulk re-embedding of the vectorstore.
+
+Reads the stored page_content and metadata from the active collection (and
+each of its partitions, when partitioned) of the configured backend,
+re-embeds it in large batches across several processes, writes the result
+into a new collection and switches the service over once it is complete.
+Progress is checkpointed, so an interrupted run resumes where it stopped.
+
+Run with:
+    python -m app.reindex --target-collection news_v2 --workers 4
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from .services import create_embeddings, open_backend, read_active_collection, write_active_collection, DEFAULT_PERSIST_DIRECTORY
+from .partitions import PARTITIONS_FILE_TEMPLATE, PARTITION_IDS_FILE_TEMPLATE
+
+
+# Id-based catch-up passes after the offset pass, each copying what the previous one missed
+CATCH_UP_ROUNDS = 5
+
+# Embeddings model loaded once in every worker process
+_worker_embeddings = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_embeddings
+    import torch
+    torch.set_num_threads(threads)
+    _worker_embeddings = create_embeddings(model_name)
+
+
+def _embed_batch(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+
+def chunk_record(record_id: str, text: str, metadata: dict, chunk_size: int, chunk_overlap: int):
+    """
+    Split one stored document into overlapping character chunks.
+
+    Returns:
+        list: (id, text, metadata) tuples. The document is returned unchanged
+        when chunking is disabled or the text fits into one chunk.
+    """
+    if not chunk_size or len(text) <= chunk_size:
+        return [(record_id, text, metadata)]
+
+    chunks = []
+    step = max(1, chunk_size - chunk_overlap)
+    for index, start in enumerate(range(0, len(text), step)):
+        chunk_metadata = dict(metadata or {})
+        chunk_metadata["parent_id"] = record_id
+        chunk_metadata["chunk_index"] = index
+        chunks.append((f"{record_id}#{index}", text[start:start + chunk_size], chunk_metadata))
+        if start + chunk_size >= len(text):
+            break
+    return chunks
+
+
+class Checkpoint:
+    """
+    Reindex progress persisted next to the store.
+
+    Args:
+        settings: What the run copies and how (source, target, model, chunking).
+            A checkpoint written for other settings is refused rather than resumed.
+    """
+
+    def __init__(self, persist_directory: str, target_collection: str, settings: dict):
+        self.path = os.path.join(persist_directory, f"reindex_{target_collection}.json")
+        self.state = {"offset": 0, "records": 0, "done": False, **settings}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            mismatched = {key: state.get(key) for key, value in settings.items() if state.get(key) != value}
+            if mismatched:
+                raise ValueError(f"{self.path} belongs to another reindex ({mismatched}, now {settings}); "
+                                 f"delete it or choose another target collection")
+            self.state = state
+
+    def save(self, **updates):
+        self.state.update(updates)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+def _copy_page(pool, page: dict, target, batch_size: int, chunk_size: int, chunk_overlap: int) -> int:
+    """Re-embed one page of source records into target. Returns the number of records written."""
+    records = []
+    for record_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+        records.extend(chunk_record(record_id, text or "", metadata, chunk_size, chunk_overlap))
+
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    embeddings = pool.map(_embed_batch, [[text for _, text, _ in batch] for batch in batches])
+
+    for batch, batch_embeddings in zip(batches, embeddings):
+        target.add(
+            [record_id for record_id, _, _ in batch],
+            batch_embeddings,
+            [text for _, text, _ in batch],
+            [metadata for _, _, metadata in batch],
+        )
+    return len(records)
+
+
+def _reindex_collection(pool, source, target, checkpoint: Checkpoint, batch_size: int, workers: int,
+                        chunk_size: int, chunk_overlap: int):
+    """Re-embed one source collection into target, resuming from checkpoint."""
+    source_name, target_name = checkpoint.state["source"], checkpoint.state["target"]
+    if checkpoint.state["done"]:
+        print(f"✅ Reindex into {target_name} already completed")
+        return
+    print(f"🔁 Reindexing {source_name} -> {target_name}, resuming at offset {checkpoint.state['offset']}")
+    started = time.time()
+    while True:
+        # Read one window of source pages, one page per worker
+        offset = checkpoint.state["offset"]
+        page = source.get(limit=batch_size * workers, offset=offset,
+                          include=["documents", "metadatas"])
+        if not page["ids"]:
+            break
+
+        records = _copy_page(pool, page, target, batch_size, chunk_size, chunk_overlap)
+        checkpoint.save(offset=offset + len(page["ids"]),
+                        records=checkpoint.state["records"] + records)
+        rate = checkpoint.state["offset"] / max(time.time() - started, 1e-6)
+        print(f"📈 {checkpoint.state['offset']} documents of {source_name} re-embedded ({rate:.1f} docs/s)")
+
+    checkpoint.save(done=True)
+
+
+def _ids(collection, include=None, page_size: int = 5000):
+    """(id, metadata) of every record, paged."""
+    offset = 0
+    while True:
+        page = collection.get(limit=page_size, offset=offset, include=include or [])
+        if not page["ids"]:
+            return
+        metadatas = page.get("metadatas") or [None] * len(page["ids"])
+        yield from zip(page["ids"], metadatas)
+        offset += len(page["ids"])
+
+
+def _catch_up(pool, source, target, target_name: str, batch_size: int, workers: int,
+              chunk_size: int, chunk_overlap: int) -> int:
+    """
+    Make target hold exactly the source's documents, by id. The offset pass
+    reads a live collection: documents ingested (or deleted) while it ran can
+    fall between pages.
+
+    Returns:
+        int: Source documents copied or removed.
+    """
+    source_ids = {record_id for record_id, _ in _ids(source)}
+    copied = {}
+    for record_id, metadata in _ids(target, include=["metadatas"]):
+        # Chunks point to their source record
+        source_id = record_id if record_id in source_ids else (metadata or {}).get("parent_id", record_id)
+        copied.setdefault(source_id, []).append(record_id)
+
+    stale = [record_id for source_id, record_ids in copied.items() if source_id not in source_ids
+             for record_id in record_ids]
+    if stale:
+        target.delete(stale)
+    missing = sorted(source_ids - set(copied))
+    window = batch_size * workers
+    for start in range(0, len(missing), window):
+        documents = source.get_by_ids(missing[start:start + window])
+        page = {"ids": [doc.id for doc in documents], "documents": [doc.page_content for doc in documents],
+                "metadatas": [doc.metadata for doc in documents]}
+        _copy_page(pool, page, target, batch_size, chunk_size, chunk_overlap)
+    if missing or stale:
+        print(f"🧵 Caught up {target_name}: {len(missing)} documents added, {len(stale)} records removed")
+    return len(missing) + len(stale)
+
+
+def _renames(persist_directory: str, base_name: str, target_collection: str):
+    """
+    Source -> target collection names and the source partition manifest (None
+    when the store is not partitioned). Partition names are <base>_<period
+    suffix>; the base collection maps to the target itself.
+    """
+    manifest_path = os.path.join(persist_directory, PARTITIONS_FILE_TEMPLATE.format(collection=base_name))
+    if not os.path.exists(manifest_path):
+        return {base_name: target_collection}, None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return {name: target_collection + name[len(base_name):] for name in manifest["partitions"]}, manifest
+
+
+def reindex(persist_directory: str, target_collection: str, model_name: str = None,
+            workers: int = 2, batch_size: int = 256, chunk_size: int = 0,
+            chunk_overlap: int = 200, switch: bool = True, backend: str = None):
+    """
+    Re-embed the active collection into target_collection.
+
+    When the active collection is partitioned (see app.partitions), every
+    partition in its manifest is re-embedded into the matching partition of
+    target_collection and the manifest is carried over.
+
+    Documents are copied by offset first, then target is caught up by id with
+    what was ingested or deleted meanwhile, until a pass finds nothing new.
+    The API keeps writing to the old collection until it is restarted, so
+    rerun the same command after the restart to copy those stragglers.
+
+    Collections are read and written through the configured backend. The
+    numpy and hnsw files have a single writer: the source is only read here,
+    but the rerun after the restart writes the live collection, so stop the
+    API for it.
+
+    Args:
+        persist_directory: Vectorstore persist directory.
+        target_collection: Name of the collection to build.
+        model_name: Embedding model to use. Defaults to the active one.
+        workers: Number of embedding processes.
+        batch_size: Documents per embedding batch.
+        chunk_size: Split documents into chunks of this many characters (0 disables chunking).
+        chunk_overlap: Characters shared by consecutive chunks.
+        switch: Point the service at the new collection when done.
+        backend: Vectorstore backend ("chroma", "numpy" or "hnsw"). Defaults to VECTORSTORE_BACKEND.
+
+    Returns:
+        int: Number of records written to the target collection by the offset pass.
+    """
+    backend = backend or os.environ.get("VECTORSTORE_BACKEND", "chroma")
+    active = read_active_collection(persist_directory)
+    model_name = model_name or active["embedding_model"]
+    base_name = active["collection_name"]
+    if target_collection == base_name:
+        # Already switched: only catch up with the collection it was built from
+        previous = os.path.join(persist_directory, f"reindex_{target_collection}.json")
+        if not os.path.exists(previous):
+            raise ValueError("Target collection must differ from the active collection")
+        with open(previous) as f:
+            base_name = json.load(f)["source"]
+        print(f"🔁 {target_collection} is active, catching up with {base_name}")
+
+    def settings(source_name: str, target_name: str) -> dict:
+        return {"source": source_name, "target": target_name, "backend": backend, "model": model_name,
+                "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+    renames, manifest = _renames(persist_directory, base_name, target_collection)
+    # Refuse mismatched checkpoints before any work starts
+    checkpoints = {source_name: Checkpoint(persist_directory, target_name, settings(source_name, target_name))
+                   for source_name, target_name in renames.items()}
+
+    targets = {}
+
+    def target(name: str):
+        # One writer per target for the whole run
+        if name not in targets:
+            targets[name] = open_backend(persist_directory, backend, name)
+        return targets[name]
+
+    def source(name: str):
+        # Reopened on every pass: read-only local backends do not see later writes
+        return open_backend(persist_directory, backend, name, read_only=True)
+
+    print(f"🔁 Reindexing {len(renames)} {backend} collection(s) with {model_name}")
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_name, threads)) as pool:
+        for source_name, target_name in renames.items():
+            _reindex_collection(pool, source(source_name), target(target_name), checkpoints[source_name],
+                                batch_size, workers, chunk_size, chunk_overlap)
+
+        for _ in range(CATCH_UP_ROUNDS):
+            # Partitions may have been added meanwhile
+            renames, manifest = _renames(persist_directory, base_name, target_collection)
+            changed = sum(
+                _catch_up(pool, source(source_name), target(target_name), target_name,
+                          batch_size, workers, chunk_size, chunk_overlap)
+                for source_name, target_name in renames.items()
+            )
+            if not changed:
+                break
+
+    for store in targets.values():
+        store.persist()
+
+    if manifest is not None:
+        target_manifest = {"period": manifest["period"],
+                           "partitions": {renames[name]: bounds for name, bounds in manifest["partitions"].items()}}
+        target_manifest_path = os.path.join(persist_directory, PARTITIONS_FILE_TEMPLATE.format(collection=target_collection))
+        with open(f"{target_manifest_path}.tmp", "w") as f:
+            json.dump(target_manifest, f, indent=1)
+        os.replace(f"{target_manifest_path}.tmp", target_manifest_path)
+        # Rebuilt from the new partitions (chunk ids included) when the service opens them
+        ids_path = os.path.join(persist_directory, PARTITION_IDS_FILE_TEMPLATE.format(collection=target_collection))
+        if os.path.exists(ids_path):
+            os.remove(ids_path)
+
+    if switch and active["collection_name"] != target_collection:
+        write_active_collection(persist_directory, target_collection, model_name)
+        print(f"🔀 Active collection switched to {target_collection}. Restart the API to pick it up, "
+              f"then rerun this command to copy what was ingested before the restart.")
+    return sum(checkpoint.state["records"] for checkpoint in checkpoints.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed the NewsIQ vectorstore into a new collection.")
+    parser.add_argument("--target-collection", required=True)
+    parser.add_argument("--model", default=None, help="Embedding model (defaults to the active one)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--no-switch", action="store_true", help="Do not switch the active collection when done")
+    parser.add_argument("--persist-directory", default=DEFAULT_PERSIST_DIRECTORY)
+    parser.add_argument("--backend", default=None, help="Vectorstore backend (defaults to VECTORSTORE_BACKEND)")
+    args = parser.parse_args()
+
+    reindex(
+        persist_directory=args.persist_directory,
+        target_collection=args.target_collection,
+        model_name=args.model,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        switch=not args.no_switch,
+        backend=args.backend,
+    )
+
+
+if __name__ == "__main__":
+    main()
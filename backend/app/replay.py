@@ -0,0 +1,633 @@
+"""
+Record-and-replay harness for the ingest and answer workflows.
+
+Record mode runs a workload (JSONL lines like {"graph": "answer", "input":
+{"question": "..."}} or {"graph": "ingest", "input": {"website_address":
+"..."}}) against the live services and captures every fetched page,
+retriever result, vectorstore write and LLM response, with its latency, into
+a fixture file. Replay mode runs the compiled graphs of the current checkout
+against that fixture, with the recorded latencies or none at all, and without
+any network access. Both report node timings, LLM call counts and outputs per
+run, and replay compares them with the recording (or an earlier report), so
+prompt, node order and retrieval changes can be checked between commits.
+
+Calls that no longer match a recording exactly (e.g. after a prompt change)
+fail the run with a replay miss. With --allow-fallback they are answered with
+the most similar recorded call of the same run instead, counted as fallbacks,
+and the run is reported as changed. LLM calls that bypass the tapped chat
+model methods abort the replay rather than reaching the network.
+
+Run with:
+    python -m app.replay record workload.jsonl --fixture fixtures/news.json
+    python -m app.replay replay fixtures/news.json --latency zero --report after.json
+    python -m app.replay replay fixtures/news.json --allow-fallback
+    python -m app.replay replay fixtures/news.json --baseline before.json
+"""
+import os
+import gzip
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import datetime
+import statistics
+import threading
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from .responses import to_jsonable
+
+
+FIXTURE_VERSION = 1
+GRAPHS = ("answer", "ingest")
+LATENCY_MODES = ("recorded", "zero")
+# Chat model methods answered by the tap, and gateway entry points that must not be reached in replay
+CHAT_MODEL_METHODS = ("invoke", "ainvoke", "stream", "astream")
+GATEWAY_METHODS = ("call", "acall", "hedged_call", "ahedged_call", "_before_call")
+# Result fields compared between runs
+OUTPUT_FIELDS = ("answer", "summary", "topics", "steps", "generation_count", "error")
+
+
+class ReplayMiss(Exception):
+    """The fixture has no recording for a call made during replay."""
+
+
+class UntappedCall(Exception):
+    """An LLM gateway call bypassed the tap; the harness must be extended to cover it."""
+
+
+def _key(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the word sets of two texts."""
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _prompt_text(input) -> str:
+    return input.to_string() if hasattr(input, "to_string") else str(input)
+
+
+def _dump_document(document) -> dict:
+    return {"id": document.id, "page_content": document.page_content, "metadata": to_jsonable(document.metadata)}
+
+
+def _load_document(data: dict) -> Document:
+    return Document(id=data["id"], page_content=data["page_content"], metadata=data["metadata"])
+
+
+def load_json(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path: str, data):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, default=str)
+
+
+class Tap:
+    """
+    Records external calls into, or answers them from, a list of fixture events.
+
+    Args:
+        mode: "record" or "replay".
+        events: Recorded events to replay from.
+        latency: "recorded" sleeps for each call's recorded latency during replay, "zero" does not.
+        allow_fallback: Answer calls without an exact recording with the most similar one.
+    """
+
+    def __init__(self, mode: str, events: list = None, latency: str = "recorded", allow_fallback: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown tap mode: {mode}")
+        if latency not in LATENCY_MODES:
+            raise ValueError(f"Unknown latency mode: {latency} (expected one of {LATENCY_MODES})")
+        self.mode = mode
+        self.latency = latency
+        self.allow_fallback = allow_fallback
+        self.events = list(events or [])
+        # Runs are executed one at a time, so calls belong to the current run
+        self.run = 0
+        self.counts = {}
+        self._used = {}
+        self._lock = threading.Lock()
+        self._by_key = {}
+        for event in self.events:
+            self._by_key.setdefault((event["kind"], event["key"]), []).append(event)
+
+    def _count(self, kind: str, name: str = None):
+        with self._lock:
+            counts = self.counts.setdefault(self.run, {})
+            counts[kind] = counts.get(kind, 0) + 1
+            if name:
+                counts[name] = counts.get(name, 0) + 1
+
+    def record(self, kind: str, key: str, request: str, response, latency_ms: float):
+        with self._lock:
+            self.events.append({
+                "run": self.run, "kind": kind, "key": key, "request": request,
+                "response": response, "latency_ms": round(latency_ms, 2),
+            })
+        self._count(kind)
+
+    def lookup(self, kind: str, key: str, request: str) -> dict:
+        """
+        Recorded event for a call: the next unused exact match (preferring the
+        current run), else, when fallbacks are allowed, the most similar
+        recorded call of the current run.
+        """
+        with self._lock:
+            matches = self._by_key.get((kind, key), [])
+            if matches:
+                matches = [event for event in matches if event["run"] == self.run] or matches
+                used = self._used.get((self.run, kind, key), 0)
+                self._used[(self.run, kind, key)] = used + 1
+                event = matches[min(used, len(matches) - 1)]
+                fallback = False
+            else:
+                if not self.allow_fallback:
+                    raise ReplayMiss(f"No exact recording of this {kind} call for run {self.run} "
+                                     f"(--allow-fallback answers it with the closest one): {request[:200]}")
+                candidates = [event for event in self.events if event["kind"] == kind and event["run"] == self.run]
+                if not candidates:
+                    raise ReplayMiss(f"No recorded {kind} call for run {self.run}: {request[:200]}")
+                event = max(candidates, key=lambda candidate: _similarity(candidate["request"], request))
+                fallback = True
+        self._count(kind, f"{kind}_fallbacks" if fallback else None)
+        return event
+
+    def delay(self, event: dict) -> float:
+        return event["latency_ms"] / 1000 if self.latency == "recorded" else 0.0
+
+    def call(self, kind: str, key: str, request: str, fn):
+        """Record fn() (record mode) or return the recorded response, after its latency (replay mode)."""
+        if self.mode == "record":
+            started = time.perf_counter()
+            response = fn()
+            self.record(kind, key, request, response, (time.perf_counter() - started) * 1000)
+            return response
+        event = self.lookup(kind, key, request)
+        time.sleep(self.delay(event))
+        return event["response"]
+
+    # --- LLM calls and page fetches are intercepted where every workflow makes them ---
+
+    def install(self):
+        """
+        Route gateway chat model calls (invoke, ainvoke, stream, astream) and
+        page fetches through the tap. During replay any other use of the LLM
+        gateway raises UntappedCall.
+        """
+        from .llm_gateway import GatewayChatModel, LLMGateway
+        from .workflows.stories import tools
+
+        tap = self
+        self._originals = (
+            {name: getattr(GatewayChatModel, name) for name in CHAT_MODEL_METHODS},
+            {name: getattr(LLMGateway, name) for name in GATEWAY_METHODS},
+            tools.fetch_html,
+        )
+        chat_model_methods, _, original_fetch = self._originals
+        original_invoke, original_ainvoke = chat_model_methods["invoke"], chat_model_methods["ainvoke"]
+        original_stream, original_astream = chat_model_methods["stream"], chat_model_methods["astream"]
+
+        def llm_request(model, input):
+            text = _prompt_text(input)
+            return _key("llm", model.model, text), text
+
+        def llm_response(message) -> dict:
+            return {"content": message.content, "usage_metadata": getattr(message, "usage_metadata", None)}
+
+        def recorded_message(event, message_class=AIMessage):
+            return message_class(**{k: v for k, v in event["response"].items() if v is not None})
+
+        def invoke(model, input, config=None, **kwargs):
+            key, text = llm_request(model, input)
+            if tap.mode == "record":
+                started = time.perf_counter()
+                message = original_invoke(model, input, config, **kwargs)
+                tap.record("llm", key, text, llm_response(message), (time.perf_counter() - started) * 1000)
+                return message
+            event = tap.lookup("llm", key, text)
+            time.sleep(tap.delay(event))
+            return recorded_message(event)
+
+        async def ainvoke(model, input, config=None, **kwargs):
+            key, text = llm_request(model, input)
+            if tap.mode == "record":
+                started = time.perf_counter()
+                message = await original_ainvoke(model, input, config, **kwargs)
+                tap.record("llm", key, text, llm_response(message), (time.perf_counter() - started) * 1000)
+                return message
+            event = tap.lookup("llm", key, text)
+            await asyncio.sleep(tap.delay(event))
+            return recorded_message(event)
+
+        # Streams are recorded as the concatenated message (what was streamed
+        # before the consumer stopped) and replayed as one chunk
+        def stream(model, input, config=None, **kwargs):
+            key, text = llm_request(model, input)
+            if tap.mode == "record":
+                started = time.perf_counter()
+                message = None
+                try:
+                    for chunk in original_stream(model, input, config, **kwargs):
+                        message = chunk if message is None else message + chunk
+                        yield chunk
+                finally:
+                    if message is not None:
+                        tap.record("llm", key, text, llm_response(message), (time.perf_counter() - started) * 1000)
+                return
+            event = tap.lookup("llm", key, text)
+            time.sleep(tap.delay(event))
+            yield recorded_message(event, AIMessageChunk)
+
+        async def astream(model, input, config=None, **kwargs):
+            key, text = llm_request(model, input)
+            if tap.mode == "record":
+                started = time.perf_counter()
+                message = None
+                try:
+                    async for chunk in original_astream(model, input, config, **kwargs):
+                        message = chunk if message is None else message + chunk
+                        yield chunk
+                finally:
+                    if message is not None:
+                        tap.record("llm", key, text, llm_response(message), (time.perf_counter() - started) * 1000)
+                return
+            event = tap.lookup("llm", key, text)
+            await asyncio.sleep(tap.delay(event))
+            yield recorded_message(event, AIMessageChunk)
+
+        def untapped(name):
+            def fail(*args, **kwargs):
+                raise UntappedCall(f"LLMGateway.{name} was called during replay without going through the tap")
+            return fail
+
+        def fetch_html(url, timeout=tools.FETCH_TIMEOUT):
+            return tap.call("fetch", _key("fetch", url), url, lambda: original_fetch(url, timeout=timeout))
+
+        for name, method in zip(CHAT_MODEL_METHODS, (invoke, ainvoke, stream, astream)):
+            setattr(GatewayChatModel, name, method)
+        if tap.mode == "replay":
+            for name in GATEWAY_METHODS:
+                setattr(LLMGateway, name, untapped(name))
+        tools.fetch_html = fetch_html
+        return self
+
+    def uninstall(self):
+        from .llm_gateway import GatewayChatModel, LLMGateway
+        from .workflows.stories import tools
+
+        chat_model_methods, gateway_methods, tools.fetch_html = self._originals
+        for name, method in chat_model_methods.items():
+            setattr(GatewayChatModel, name, method)
+        for name, method in gateway_methods.items():
+            setattr(LLMGateway, name, method)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+
+class TappedRetriever:
+    """
+    Retriever recorded through a tap, or served from it when retriever is None.
+
+    Args:
+        tap: The tap calls go through.
+        retriever: Live retriever (record mode).
+    """
+
+    def __init__(self, tap: Tap, retriever=None):
+        self.tap = tap
+        self.retriever = retriever
+
+    def invoke(self, query: str, **kwargs):
+        def search():
+            return [_dump_document(doc) for doc in self.retriever.invoke(query, **kwargs)]
+
+        found = self.tap.call("retrieve", _key("invoke", query, kwargs), query, search)
+        return [_load_document(doc) for doc in found]
+
+    def retrieve_many(self, queries, **kwargs):
+        def search():
+            if hasattr(self.retriever, "retrieve_many"):
+                result_lists = self.retriever.retrieve_many(queries, **kwargs)
+            else:
+                result_lists = self.retriever.batch(queries, **kwargs)
+            return [[_dump_document(doc) for doc in documents] for documents in result_lists]
+
+        found = self.tap.call("retrieve", _key("retrieve_many", queries, kwargs), "\n".join(queries), search)
+        return [[_load_document(doc) for doc in documents] for documents in found]
+
+
+class TappedVectorStore:
+    """
+    Vectorstore whose writes are recorded through a tap. Without a live
+    vectorstore (replay) writes are kept in memory, and documents can be read
+    back by id, including those returned by recorded retrievals.
+
+    Args:
+        tap: The tap calls go through.
+        vectorstore: Live vectorstore (record mode).
+    """
+
+    def __init__(self, tap: Tap, vectorstore=None):
+        self.tap = tap
+        self.vectorstore = vectorstore
+        self._documents = {}
+        if vectorstore is None:
+            for event in tap.events:
+                if event["kind"] != "retrieve":
+                    continue
+                found = event["response"]
+                # retrieve_many recorded a list per query
+                if found and isinstance(found[0], list):
+                    found = [doc for documents in found for doc in documents]
+                for doc in found:
+                    if doc["id"]:
+                        self._documents[doc["id"]] = _load_document(doc)
+
+    def add_documents(self, documents, ids=None, **kwargs):
+        ids = list(ids) if ids else [doc.id for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        self.tap.call(
+            "store", _key("add_documents", texts), "\n".join(texts),
+            lambda: self.vectorstore.add_documents(documents=documents, ids=ids, **kwargs),
+        )
+        if self.vectorstore is None:
+            for doc_id, doc in zip(ids, documents):
+                self._documents[doc_id] = Document(id=doc_id, page_content=doc.page_content, metadata=dict(doc.metadata))
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        documents = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        return self.add_documents(documents, ids=ids, **kwargs)
+
+    def get_by_ids(self, ids):
+        if self.vectorstore is not None:
+            return self.vectorstore.get_by_ids(ids)
+        return [self._documents[doc_id] for doc_id in ids if doc_id in self._documents]
+
+    def __getattr__(self, name):
+        if self.vectorstore is None:
+            raise AttributeError(f"{name} is not available during replay")
+        return getattr(self.vectorstore, name)
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Wall time of each top-level graph node, in execution order."""
+
+    def __init__(self):
+        self.nodes = []
+        self._root = None
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: UUID = None, **kwargs):
+        with self._lock:
+            if self._root is None and parent_run_id is None:
+                self._root = run_id
+            elif parent_run_id is not None and parent_run_id == self._root:
+                self._started[run_id] = (kwargs.get("name"), time.perf_counter())
+
+    def _finish(self, run_id: UUID):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started is not None:
+                name, start = started
+                self.nodes.append((name, (time.perf_counter() - start) * 1000))
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs):
+        self._finish(run_id)
+
+
+def summarize_output(result: dict) -> dict:
+    """Comparable fields of a graph result; document handles are reduced to their titles."""
+    output = {field: to_jsonable(result[field]) for field in OUTPUT_FIELDS if field in result}
+    for field in ("selected_documents", "selected_document"):
+        documents = result.get(field)
+        if isinstance(documents, list):
+            output["sources"] = [doc.metadata.get("title") or doc.metadata.get("link") for doc in documents]
+    return output
+
+
+def run_workload(graphs: dict, workload: list, tap: Tap, repeat: int = 1) -> list:
+    """
+    Run each workload entry through its graph, one at a time.
+
+    Returns:
+        list: Per entry: graph, input, node order, median node and total
+        milliseconds over the repeats, LLM and other external call counts, and
+        the output of the last repeat.
+    """
+    reports = []
+    for run, entry in enumerate(workload):
+        tap.run = run
+        attempts = []
+        for _ in range(repeat):
+            tap.counts.pop(run, None)
+            timer = NodeTimer()
+            started = time.perf_counter()
+            try:
+                result = graphs[entry["graph"]].invoke(dict(entry["input"]), config={"callbacks": [timer]})
+                output = summarize_output(result)
+            except UntappedCall:
+                raise
+            except ReplayMiss as e:
+                output = {"error": f"replay miss: {e}"}
+            except Exception as e:
+                output = {"error": f"{type(e).__name__}: {e}"}
+            attempts.append((timer.nodes, (time.perf_counter() - started) * 1000, output))
+
+        node_ms = {}
+        for nodes, _, _ in attempts:
+            per_attempt = {}
+            for name, ms in nodes:
+                per_attempt[name] = per_attempt.get(name, 0.0) + ms
+            for name, ms in per_attempt.items():
+                node_ms.setdefault(name, []).append(ms)
+        nodes, _, output = attempts[-1]
+        reports.append({
+            "graph": entry["graph"],
+            "input": entry["input"],
+            "nodes": [name for name, _ in nodes],
+            "node_ms": {name: round(statistics.median(values), 2) for name, values in node_ms.items()},
+            "total_ms": round(statistics.median(total for _, total, _ in attempts), 2),
+            "calls": dict(tap.counts.get(run, {})),
+            "output": output,
+        })
+        print(f"▶️ {entry['graph']} run {run}: {reports[-1]['total_ms']:.0f} ms, {reports[-1]['calls'].get('llm', 0)} LLM calls")
+    return reports
+
+
+def compare(baseline: list, current: list) -> dict:
+    """
+    Differences between two lists of run reports.
+
+    Returns:
+        dict: Per-run changes (outputs, node path, calls answered by fallback,
+        LLM calls, total time) and per-node total milliseconds of both sides.
+    """
+    runs = []
+    node_totals = {}
+    for run, (before, after) in enumerate(zip(baseline, current)):
+        changed = sorted(
+            field for field in set(before["output"]) | set(after["output"])
+            if before["output"].get(field) != after["output"].get(field)
+        )
+        runs.append({
+            "run": run,
+            "graph": after["graph"],
+            "changed_outputs": changed,
+            "path_changed": before["nodes"] != after["nodes"],
+            # Answered with a different recording than the call made, so the output is not trustworthy
+            "fallbacks": sum(count for name, count in after["calls"].items() if name.endswith("_fallbacks")),
+            "llm_calls": [before["calls"].get("llm", 0), after["calls"].get("llm", 0)],
+            "total_ms": [before["total_ms"], after["total_ms"]],
+        })
+        for side, report in ((0, before), (1, after)):
+            for name, ms in report["node_ms"].items():
+                totals = node_totals.setdefault(f"{report['graph']}.{name}", [0.0, 0.0])
+                totals[side] += ms
+    return {
+        "runs": runs,
+        "node_ms": {name: [round(a, 2), round(b, 2)] for name, (a, b) in sorted(node_totals.items())},
+        "llm_calls": [sum(run["llm_calls"][0] for run in runs), sum(run["llm_calls"][1] for run in runs)],
+        "changed_runs": sum(1 for run in runs if run["changed_outputs"] or run["path_changed"] or run["fallbacks"]),
+    }
+
+
+def print_comparison(comparison: dict):
+    print(f"{'node':40s} {'before ms':>11s} {'after ms':>11s} {'change':>8s}")
+    for name, (before, after) in comparison["node_ms"].items():
+        change = f"{(after - before) / before * 100:+.0f}%" if before else "new"
+        print(f"{name:40s} {before:11.1f} {after:11.1f} {change:>8s}")
+    before_calls, after_calls = comparison["llm_calls"]
+    print(f"LLM calls: {before_calls} -> {after_calls}")
+    for run in comparison["runs"]:
+        if run["changed_outputs"] or run["path_changed"] or run["fallbacks"]:
+            changes = run["changed_outputs"] + (["node path"] if run["path_changed"] else [])
+            changes += [f"{run['fallbacks']} calls answered by fallback"] if run["fallbacks"] else []
+            print(f"⚠️ {run['graph']} run {run['run']} changed: {', '.join(changes)}")
+    print(f"{comparison['changed_runs']} of {len(comparison['runs'])} runs changed")
+
+
+def build_graphs(tap: Tap, persist_directory: str = None) -> dict:
+    """
+    Answer and ingest graphs wired to the tap: live services when recording,
+    the fixture alone when replaying.
+    """
+    from .documents import configure_document_store
+    from .workflows.stories.workflows import article_summarization_graph
+    from .workflows.answer.workflows import question_answering_graph
+
+    if tap.mode == "record":
+        from .services import VectorStoreService, DEFAULT_PERSIST_DIRECTORY
+
+        service = VectorStoreService(
+            persist_directory=persist_directory or DEFAULT_PERSIST_DIRECTORY,
+            backend=os.environ.get("VECTORSTORE_BACKEND", "chroma"),
+            partition=os.environ.get("VECTORSTORE_PARTITION"),
+        )
+        vectorstore = TappedVectorStore(tap, service.get_vectorstore())
+        retriever = TappedRetriever(tap, service.get_instruct_retriever(k=3, with_scores=True))
+    else:
+        # Chat models are still constructed, they just never connect
+        os.environ.setdefault("GROQ_API_KEY", "replay")
+        vectorstore = TappedVectorStore(tap)
+        retriever = TappedRetriever(tap)
+    configure_document_store(vectorstore)
+    return {
+        "answer": question_answering_graph(retriever),
+        "ingest": article_summarization_graph(vectorstore),
+    }
+
+
+def record(workload_path: str, fixture_path: str, persist_directory: str) -> dict:
+    with open(workload_path) as f:
+        workload = [json.loads(line) for line in f if line.strip()]
+    for entry in workload:
+        if entry.get("graph") not in GRAPHS:
+            raise ValueError(f"Unknown graph {entry.get('graph')!r} in {workload_path} (expected one of {GRAPHS})")
+
+    tap = Tap("record")
+    with tap:
+        reports = run_workload(build_graphs(tap, persist_directory), workload, tap)
+    fixture = {
+        "version": FIXTURE_VERSION,
+        "recorded_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "runs": reports,
+        "events": tap.events,
+    }
+    save_json(fixture_path, fixture)
+    print(f"💾 Recorded {len(reports)} runs and {len(tap.events)} calls to {fixture_path}")
+    return fixture
+
+
+def replay(fixture_path: str, latency: str = "recorded", repeat: int = 1, allow_fallback: bool = False) -> list:
+    fixture = load_json(fixture_path)
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"{fixture_path} is fixture version {fixture.get('version')}, expected {FIXTURE_VERSION}")
+    workload = [{"graph": run["graph"], "input": run["input"]} for run in fixture["runs"]]
+
+    tap = Tap("replay", fixture["events"], latency=latency, allow_fallback=allow_fallback)
+    with tap:
+        return run_workload(build_graphs(tap), workload, tap, repeat=repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record NewsIQ workflow runs and replay them offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Run a workload against live services and save a fixture")
+    record_parser.add_argument("workload", help="JSONL file of {\"graph\": \"answer\"|\"ingest\", \"input\": {...}}")
+    record_parser.add_argument("--fixture", required=True, help="Fixture file to write (.json or .json.gz)")
+    record_parser.add_argument("--persist-directory", default=None,
+                               help="Defaults to CHROMA_PERSIST_DIRECTORY, like the API")
+
+    replay_parser = commands.add_parser("replay", help="Run the graphs against a fixture, without network access")
+    replay_parser.add_argument("fixture")
+    replay_parser.add_argument("--latency", choices=LATENCY_MODES, default="recorded",
+                               help="Sleep for the recorded latency of each call, or not at all")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="Runs per workload entry; timings are medians")
+    replay_parser.add_argument("--allow-fallback", action="store_true",
+                               help="Answer calls without an exact recording with the most similar one (runs are marked changed)")
+    replay_parser.add_argument("--report", help="Write the run reports here, to compare later runs against")
+    replay_parser.add_argument("--baseline", help="Report to compare with instead of the recording")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.workload, args.fixture, args.persist_directory)
+        return
+
+    reports = replay(args.fixture, latency=args.latency, repeat=args.repeat, allow_fallback=args.allow_fallback)
+    if args.report:
+        save_json(args.report, reports)
+    baseline = load_json(args.baseline) if args.baseline else load_json(args.fixture)["runs"]
+    print_comparison(compare(baseline, reports))
+
+
+if __name__ == "__main__":
+    main()
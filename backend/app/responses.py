@@ -0,0 +1,64 @@
+from typing import Optional
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, several times faster than the stdlib encoder."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[dict]:
+    """
+    Parse a field selection such as "answer,sources.title,sources.url" into a tree.
+
+    Returns:
+        dict or None: Nested dict of selected keys, an empty dict meaning
+        "the whole value". None when no selection was requested.
+    """
+    if not fields:
+        return None
+    tree = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        parts = path.split(".")
+        for part in parts[:-1]:
+            # A parent selected whole stays whole
+            if part in node and not node[part]:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = {}
+    return tree
+
+
+def select_fields(data, tree: Optional[dict]):
+    """Keep only the selected fields. Lists apply the selection to every item."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: select_fields(data[key], subtree) for key, subtree in tree.items() if key in data}
+    return data
+
+
+def to_jsonable(value):
+    """Convert graph results (Documents, nested containers) to plain JSON types."""
+    if hasattr(value, "model_dump"):
+        return to_jsonable(value.model_dump())
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(item) for item in value]
+    return value
+
+
+def lean_response(data: dict, fields: Optional[str] = None) -> ORJSONResponse:
+    """Serialize with orjson after applying the optional field selection."""
+    return ORJSONResponse(select_fields(data, parse_fields(fields)))
@@ -1,11 +1,25 @@
 import os
-from typing import List
+import json
+import math
+import time
+import uuid
+import queue
+import shutil
+import zipfile
+import tempfile
+import threading
+import numpy as np
+from typing import Any, List
+from concurrent.futures import ThreadPoolExecutor, Future
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 from pydantic import Field, BaseModel
 
+from .metrics import metrics
+
 
 # Helper function to add instructions to the query
 def get_detailed_instruct(task_description: str, query: str) -> str:
@@ -13,6 +27,60 @@ def get_detailed_instruct(task_description: str, query: str) -> str:
     return f'Instruct: {task_description}\nQuery: {query}'
 
 
+# Helpers to store variable-length strings column-wise in a snapshot
+def _pack_strings(values: List[str]):
+    """Pack strings into one UTF-8 byte buffer plus end offsets."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(buffer, offsets) -> List[str]:
+    """Inverse of _pack_strings."""
+    data = buffer.tobytes()
+    starts = np.concatenate(([0], offsets[:-1]))
+    return [data[start:end].decode("utf-8") for start, end in zip(starts, offsets)]
+
+
+# Vectorstore directory shared by the API, the vectorstore server and the CLIs
+DEFAULT_PERSIST_DIRECTORY = os.environ.get("CHROMA_PERSIST_DIRECTORY", "./app/chroma")
+
+# Active collection pointer, switched atomically by the reindex command
+DEFAULT_COLLECTION_NAME = "langchain"
+DEFAULT_EMBEDDING_MODEL = "intfloat/multilingual-e5-large-instruct"
+ACTIVE_COLLECTION_FILE = "active_collection.json"
+
+
+def read_active_collection(persist_directory: str) -> dict:
+    """Return the collection name and embedding model currently served."""
+    path = os.path.join(persist_directory, ACTIVE_COLLECTION_FILE)
+    if not os.path.exists(path):
+        return {"collection_name": DEFAULT_COLLECTION_NAME, "embedding_model": DEFAULT_EMBEDDING_MODEL}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_active_collection(persist_directory: str, collection_name: str, embedding_model: str):
+    """Point the service at another collection. The file is replaced atomically."""
+    path = os.path.join(persist_directory, ACTIVE_COLLECTION_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"collection_name": collection_name, "embedding_model": embedding_model}, f)
+    os.replace(tmp_path, path)
+
+
+def create_embeddings(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """Initialize HuggingFace embeddings for the given model."""
+    model_kwargs = {'device': 'cpu', "trust_remote_code": False}
+    encode_kwargs = {'normalize_embeddings': True}
+    
+    return HuggingFaceEmbeddings(
+        model_name=model_name,
+        model_kwargs=model_kwargs,
+        encode_kwargs=encode_kwargs
+    )
+
+
 # Custom Retriever class with instruction-augmented queries
 class InstructRetriever(BaseRetriever, BaseModel):
     """Retriever that adds instruction to queries before retrieval."""
@@ -20,40 +88,851 @@ class InstructRetriever(BaseRetriever, BaseModel):
     base_retriever: BaseRetriever = Field(...)
     task_description: str = Field(...)
 
-    def _get_relevant_documents(self, query: str) -> List[Document]:
+    def _get_relevant_documents(self, query: str, **kwargs) -> List[Document]:
         """Add instruction to the query before passing to the base retriever."""
         formatted_query = get_detailed_instruct(self.task_description, query)
-        return self.base_retriever.invoke(formatted_query)
+        return self.base_retriever.invoke(formatted_query, **kwargs)
+
+    def retrieve_many(self, queries: List[str], **kwargs) -> List[List[Document]]:
+        """Retrieve for several queries at once, one result list per query."""
+        formatted_queries = [get_detailed_instruct(self.task_description, query) for query in queries]
+        if hasattr(self.base_retriever, "retrieve_many"):
+            return self.base_retriever.retrieve_many(formatted_queries, **kwargs)
+        return self.base_retriever.batch(formatted_queries, **kwargs)
+
+
+def search_by_vector(vectorstore, vector, k: int = 4, filter: dict = None):
+    """Scored search with a precomputed query embedding, scores as relevance (higher is better)."""
+    if isinstance(vectorstore, Chroma):
+        # Chroma returns raw distances for vector searches
+        relevance = vectorstore._select_relevance_score_fn()
+        results = vectorstore.similarity_search_by_vector_with_relevance_scores(list(vector), k=k, filter=filter)
+        return [(doc, relevance(distance)) for doc, distance in results]
+    return vectorstore.similarity_search_by_vector_with_relevance_scores(vector, k=k, filter=filter)
+
+
+def recency_filter(max_age_days: float = None) -> dict:
+    """Where clause keeping documents ingested in the last max_age_days, None for no limit."""
+    if not max_age_days:
+        return None
+    return {"ingested_at": {"$gte": time.time() - max_age_days * 86400}}
+
+
+def distance_from_cosine(cosine: float) -> float:
+    """Squared L2 distance between unit vectors, Chroma's default distance."""
+    return 2.0 - 2.0 * cosine
+
+
+def relevance_from_cosine(cosine: float) -> float:
+    """
+    Chroma's relevance score (1 - d / sqrt(2) over the squared L2 distance d)
+    for a cosine similarity. Retrieval scores, and so the GRADE_* thresholds,
+    use this scale with every backend.
+    """
+    return 1.0 - distance_from_cosine(cosine) / math.sqrt(2)
+
+
+# Retriever that keeps Chroma's relevance scores
+class ScoredRetriever(BaseRetriever, BaseModel):
+    """Retriever that stores the similarity score of each hit in its metadata."""
+
+    vectorstore: Any = Field(...)
+    k: int = Field(default=3)
+
+    def _get_relevant_documents(self, query: str, *, max_age_days: float = None) -> List[Document]:
+        """
+        Run a scored similarity search and attach the score as metadata["score"].
+        With max_age_days only documents ingested in that many days are searched.
+        """
+        results = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.k, filter=recency_filter(max_age_days))
+        documents = []
+        for doc, score in results:
+            doc.metadata["score"] = float(score)
+            documents.append(doc)
+        return documents
+
+    def retrieve_many(self, queries: List[str], max_age_days: float = None) -> List[List[Document]]:
+        """
+        Embed all queries in one batch and run the searches concurrently.
+
+        Returns:
+            List[List[Document]]: Scored hits for each query, in query order.
+        """
+        vectors = self.vectorstore.embeddings.embed_documents(list(queries))
+        where = recency_filter(max_age_days)
+
+        def search(vector):
+            results = search_by_vector(self.vectorstore, vector, k=self.k, filter=where)
+            for doc, score in results:
+                doc.metadata["score"] = float(score)
+            return [doc for doc, _ in results]
+
+        with ThreadPoolExecutor(max_workers=len(vectors) or 1) as pool:
+            return list(pool.map(search, vectors))
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 60) -> List[Document]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion (sum of 1 / (k + rank)).
+
+    Documents found by several queries are merged; each keeps its best
+    similarity score in metadata["score"] and the fused score in metadata["rrf_score"].
+
+    Returns:
+        List[Document]: Unique documents, best fused score first.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.id or doc.metadata.get("link") or doc.page_content[:200]
+            entry = fused.setdefault(key, [doc, 0.0])
+            entry[1] += 1.0 / (k + rank)
+            score = doc.metadata.get("score")
+            if score is not None and score > entry[0].metadata.get("score", float("-inf")):
+                entry[0].metadata["score"] = score
+    ranked = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)
+    for doc, rrf_score in ranked:
+        doc.metadata["rrf_score"] = round(rrf_score, 6)
+    return [doc for doc, _ in ranked]
+
+
+# Metadata of an article's entry in the summary store
+SUMMARY_METADATA_FIELDS = ("title", "link", "language", "authors", "topics", "publish_date", "ingested_at")
+
+
+def summary_metadata(doc_id: str, metadata: dict) -> dict:
+    """Summary store metadata pointing back to the full article through doc_id."""
+    return {"doc_id": doc_id, **{field: metadata[field] for field in SUMMARY_METADATA_FIELDS if field in metadata}}
+
+
+# Metadata filters shared by the in-process backends (Chroma "where" syntax subset)
+def _matches_filter(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma-style where clause ($and/$or, $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin)."""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches_filter(metadata, clause) for clause in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches_filter(metadata, clause) for clause in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte") and value is None:
+                return False
+            if operator == "$gt" and not value > operand:
+                return False
+            if operator == "$gte" and not value >= operand:
+                return False
+            if operator == "$lt" and not value < operand:
+                return False
+            if operator == "$lte" and not value <= operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+    return True
+
+
+class IndexBackend:
+    """
+    Interface for vector index backends behind VectorStoreService.
+    
+    Embeddings are L2-normalized, and search scores are cosine similarities
+    (higher is more similar) so they are comparable across backends.
+    """
+    
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+        """Add or replace records."""
+        raise NotImplementedError
+    
+    def search(self, embedding, k: int = 4, where: dict = None) -> List[tuple]:
+        """Return up to k (Document, score) pairs, best first."""
+        raise NotImplementedError
+    
+    def delete(self, ids: List[str]):
+        """Remove records by id."""
+        raise NotImplementedError
+    
+    def persist(self):
+        """Flush pending state to disk."""
+        raise NotImplementedError
+    
+    def get(self, where: dict = None, limit: int = None, offset: int = 0, include=None) -> dict:
+        """Page through stored records, in the same shape as Chroma's get()."""
+        raise NotImplementedError
+    
+    def get_by_ids(self, ids: List[str]) -> List[Document]:
+        """Documents for the ids that exist, in the given order."""
+        raise NotImplementedError
+
+
+class ChromaBackend(IndexBackend):
+    """Backend over a raw Chroma collection."""
+    
+    def __init__(self, collection):
+        self.collection = collection
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(
+            ids=list(ids),
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            documents=list(documents),
+            metadatas=[metadata or None for metadata in metadatas],
+        )
+    
+    def search(self, embedding, k=4, where=None):
+        result = self.collection.query(
+            query_embeddings=[np.asarray(embedding, dtype=np.float32).tolist()],
+            n_results=k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"],
+        )
+        # Chroma returns squared L2 distances, which are 2 - 2 * cosine for unit vectors
+        return [
+            (Document(id=record_id, page_content=document or "", metadata=metadata or {}), 1.0 - distance / 2.0)
+            for record_id, document, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+    
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+    
+    def persist(self):
+        # PersistentClient writes through on every call
+        pass
+    
+    def get(self, where=None, limit=None, offset=0, include=None):
+        return self.collection.get(where=where or None, limit=limit, offset=offset,
+                                   include=include if include is not None else ["documents", "metadatas"])
+    
+    def get_by_ids(self, ids):
+        result = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        found = {
+            record_id: Document(id=record_id, page_content=document or "", metadata=metadata or {})
+            for record_id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [found[record_id] for record_id in ids if record_id in found]
+
+
+class LocalIndexBackend(IndexBackend):
+    """
+    Shared storage for the in-process backends.
+    
+    Embeddings live in an append-only float32 file that is memory-mapped for
+    search, and records in an append-only JSONL log with tombstones for
+    deletes, which suits the append-mostly news corpus. Row i of the matrix
+    belongs to the i-th record; after a crash mid-write both files are cut
+    back to their common prefix on load.
+    
+    Writes and reads are serialized with a lock, so searches never see the
+    matrix and the deleted mask from different writes.
+    
+    read_only opens the files without writing to them (no crash repair, no
+    append handle), for reading a collection another process is writing: a
+    torn last line is skipped instead of cut.
+    """
+    
+    def __init__(self, directory: str, read_only: bool = False):
+        self.directory = directory
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        self.embeddings_path = os.path.join(directory, "embeddings.f32")
+        self.records_path = os.path.join(directory, "records.jsonl")
+        self.meta_path = os.path.join(directory, "meta.json")
+        
+        self.dim = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+        readable = self._reconcile_files() if self.dim is not None else None
+        
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.row_by_id = {}
+        deleted_rows = set()
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "rb") as f:
+                position = 0
+                for line in f:
+                    if readable is not None and position >= readable:
+                        break
+                    position += len(line)
+                    record = json.loads(line)
+                    if record.get("deleted"):
+                        row = self.row_by_id.pop(record["id"], None)
+                        if row is not None:
+                            deleted_rows.add(row)
+                        continue
+                    if record["id"] in self.row_by_id:
+                        deleted_rows.add(self.row_by_id[record["id"]])
+                    self.row_by_id[record["id"]] = len(self.ids)
+                    self.ids.append(record["id"])
+                    self.documents.append(record["document"])
+                    self.metadatas.append(record["metadata"])
+        
+        self.deleted = np.zeros(len(self.ids), dtype=bool)
+        self.deleted[list(deleted_rows)] = True
+        self._records_file = None if read_only else open(self.records_path, "a", encoding="utf-8")
+        self._map_embeddings()
+    
+    def _reconcile_files(self) -> int:
+        """
+        Cut the records and embeddings files back to the rows present in both,
+        dropping a torn last line and rows whose other half was never written.
+        
+        Returns:
+            int: Bytes of the records file that are complete. Read-only
+            backends leave the files as they are and stop reading there.
+        """
+        row_bytes = self.dim * 4
+        embedded_rows = os.path.getsize(self.embeddings_path) // row_bytes if os.path.exists(self.embeddings_path) else 0
+        rows, position, cut = 0, 0, None
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        record = json.loads(line)
+                    except ValueError:
+                        cut = position
+                        break
+                    if not record.get("deleted"):
+                        if rows == embedded_rows:
+                            cut = position
+                            break
+                        rows += 1
+                    position += len(line)
+        if self.read_only:
+            return position
+        if cut is not None:
+            print(f"⚠️ Dropping records after byte {cut} of {self.records_path} without embeddings")
+            with open(self.records_path, "r+b") as f:
+                f.truncate(cut)
+        if os.path.exists(self.embeddings_path) and os.path.getsize(self.embeddings_path) > rows * row_bytes:
+            print(f"⚠️ Dropping embeddings after row {rows} of {self.embeddings_path} without records")
+            with open(self.embeddings_path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+        return position
+    
+    def _map_embeddings(self):
+        rows = len(self.ids)
+        if self.dim is None or rows == 0:
+            self.matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+        else:
+            self.matrix = np.memmap(self.embeddings_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+    
+    def _on_add(self, rows, embeddings):
+        """Hook for subclasses that keep an auxiliary index."""
+        pass
+    
+    def _on_delete(self, rows):
+        """Hook for subclasses that keep an auxiliary index."""
+        pass
+    
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.directory} is opened read-only")
+    
+    def add(self, ids, embeddings, documents, metadatas):
+        self._check_writable()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(embeddings.shape[1])
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            
+            replaced = [self.row_by_id[record_id] for record_id in ids if record_id in self.row_by_id]
+            first_row = len(self.ids)
+            # Embeddings first: rows without a record are trimmed on load
+            with open(self.embeddings_path, "ab") as f:
+                f.write(embeddings.tobytes())
+            for record_id, document, metadata in zip(ids, documents, metadatas):
+                self._records_file.write(json.dumps({"id": record_id, "document": document, "metadata": metadata or {}}) + "\n")
+                self.row_by_id[record_id] = len(self.ids)
+                self.ids.append(record_id)
+                self.documents.append(document)
+                self.metadatas.append(metadata or {})
+            self._records_file.flush()
+            
+            deleted = np.concatenate([self.deleted, np.zeros(len(ids), dtype=bool)])
+            deleted[replaced] = True
+            self.deleted = deleted
+            self._map_embeddings()
+            self._on_delete(replaced)
+            self._on_add(np.arange(first_row, len(self.ids)), embeddings)
+    
+    def delete(self, ids):
+        self._check_writable()
+        with self._lock:
+            rows = []
+            for record_id in ids:
+                row = self.row_by_id.pop(record_id, None)
+                if row is None:
+                    continue
+                rows.append(row)
+                self._records_file.write(json.dumps({"id": record_id, "deleted": True}) + "\n")
+            self._records_file.flush()
+            # Replaced, not modified in place, so searches holding the old mask are unaffected
+            deleted = self.deleted.copy()
+            deleted[rows] = True
+            self.deleted = deleted
+            self._on_delete(rows)
+    
+    def persist(self):
+        if self.read_only:
+            return
+        with self._lock:
+            if os.path.exists(self.embeddings_path):
+                with open(self.embeddings_path, "ab") as f:
+                    os.fsync(f.fileno())
+            self._records_file.flush()
+            os.fsync(self._records_file.fileno())
+    
+    def _allowed_rows(self, where):
+        """Boolean mask of live rows matching the filter."""
+        allowed = ~self.deleted
+        if where:
+            allowed = allowed & np.array([_matches_filter(m, where) for m in self.metadatas], dtype=bool)
+        return allowed
+    
+    def _result(self, row, score):
+        return Document(id=self.ids[row], page_content=self.documents[row], metadata=dict(self.metadatas[row])), float(score)
+    
+    def get(self, where=None, limit=None, offset=0, include=None):
+        include = include if include is not None else ["documents", "metadatas"]
+        with self._lock:
+            rows = np.flatnonzero(self._allowed_rows(where))
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            result = {"ids": [self.ids[row] for row in rows]}
+            if "documents" in include:
+                result["documents"] = [self.documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self.metadatas[row] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = np.asarray(self.matrix[rows])
+        return result
+    
+    def get_by_ids(self, ids):
+        with self._lock:
+            rows = [(record_id, self.row_by_id[record_id]) for record_id in ids if record_id in self.row_by_id]
+            return [
+                Document(id=record_id, page_content=self.documents[row], metadata=dict(self.metadatas[row]))
+                for record_id, row in rows
+            ]
+
+
+class NumpyBackend(LocalIndexBackend):
+    """Exact brute-force search over the memory-mapped embedding matrix."""
+    
+    def search(self, embedding, k=4, where=None):
+        # Matrix and mask of the same write; rows are append-only, so results stay valid after the lock
+        with self._lock:
+            if len(self.ids) == 0:
+                return []
+            matrix, allowed = self.matrix, self._allowed_rows(where)
+        scores = matrix @ np.asarray(embedding, dtype=np.float32)
+        scores = np.where(allowed, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._result(row, scores[row]) for row in top if np.isfinite(scores[row])]
+
+
+class HnswBackend(LocalIndexBackend):
+    """
+    Approximate search with an hnswlib graph built over the same storage.
+    
+    Requires the optional hnswlib package. M and ef_construction shape the
+    graph, ef trades query latency for recall.
+    """
+    
+    def __init__(self, directory: str, M: int = 16, ef_construction: int = 200, ef: int = 64,
+                 read_only: bool = False):
+        import hnswlib
+        
+        self._hnswlib = hnswlib
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.index = None
+        super().__init__(directory, read_only=read_only)
+        self.index_path = os.path.join(directory, "hnsw.bin")
+        if self.dim is not None:
+            self._load_or_build()
+    
+    def _new_index(self, capacity):
+        index = self._hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=max(capacity, 1024), M=self.M,
+                         ef_construction=self.ef_construction, allow_replace_deleted=False)
+        index.set_ef(self.ef)
+        return index
+    
+    def _load_or_build(self):
+        rows = len(self.ids)
+        if os.path.exists(self.index_path):
+            self.index = self._hnswlib.Index(space="ip", dim=self.dim)
+            self.index.load_index(self.index_path, max_elements=max(rows, 1024))
+            self.index.set_ef(self.ef)
+            if self.index.get_current_count() == rows:
+                return
+        # Index missing or stale: rebuild from the stored matrix
+        self.index = self._new_index(rows)
+        if rows:
+            self.index.add_items(np.asarray(self.matrix), np.arange(rows))
+            for row in np.flatnonzero(self.deleted):
+                self.index.mark_deleted(int(row))
+    
+    def _on_add(self, rows, embeddings):
+        if self.index is None:
+            self.index = self._new_index(len(self.ids))
+        if len(self.ids) > self.index.get_max_elements():
+            self.index.resize_index(len(self.ids) * 2)
+        self.index.add_items(embeddings, rows)
+    
+    def _on_delete(self, rows):
+        for row in rows:
+            self.index.mark_deleted(int(row))
+    
+    def persist(self):
+        super().persist()
+        if self.index is not None and not self.read_only:
+            self.index.save_index(self.index_path)
+    
+    def search(self, embedding, k=4, where=None):
+        query = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        # The graph is resized and extended in place on add, so queries hold the lock throughout
+        with self._lock:
+            live = len(self.ids) - int(self.deleted.sum())
+            if self.index is None or live == 0:
+                return []
+            row_filter = None
+            if where:
+                allowed = self._allowed_rows(where)
+                live = int(allowed.sum())
+                if live == 0:
+                    return []
+                row_filter = lambda row: bool(allowed[row])
+            labels, distances = self.index.knn_query(query, k=min(k, live), filter=row_filter)
+        # Inner-product distance is 1 - cosine for unit vectors
+        return [self._result(int(row), 1.0 - distance) for row, distance in zip(labels[0], distances[0])]
+
+
+def create_backend(name: str, directory: str, read_only: bool = False, **kwargs) -> IndexBackend:
+    """Build an in-process index backend by name ("numpy" or "hnsw")."""
+    if name == "numpy":
+        return NumpyBackend(directory, read_only=read_only)
+    if name == "hnsw":
+        return HnswBackend(directory, read_only=read_only, **kwargs)
+    raise ValueError(f"Unknown vectorstore backend: {name}")
+
+
+def open_backend(persist_directory: str, backend: str, name: str, read_only: bool = False) -> IndexBackend:
+    """
+    Open one collection of the given backend as a raw IndexBackend, without
+    an embedding model. This is where VectorStoreService keeps it: the Chroma
+    collection name, or <persist_directory>/<backend>_<name> for the
+    in-process backends.
+    
+    Args:
+        read_only: Open an in-process backend without writing to its files
+            (Chroma collections are always opened for writing).
+    """
+    if backend == "chroma":
+        import chromadb
+        return ChromaBackend(chromadb.PersistentClient(path=persist_directory).get_or_create_collection(name))
+    return create_backend(backend, os.path.join(persist_directory, f"{backend}_{name}"), read_only=read_only)
+
+
+class BackendVectorStore(VectorStore):
+    """
+    LangChain vectorstore adapter over an IndexBackend.
+    
+    Scores follow Chroma's conventions, so thresholds carry over between
+    backends: similarity_search_with_score returns squared L2 distances (lower
+    is better) and the relevance methods 1 - d / sqrt(2) (higher is better).
+    """
+    
+    def __init__(self, embedding_function, backend: IndexBackend):
+        self.embedding_function = embedding_function
+        self.backend = backend
+    
+    @property
+    def embeddings(self):
+        return self.embedding_function
+    
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        self.backend.add(ids, self.embedding_function.embed_documents(texts), texts, metadatas)
+        return ids
+    
+    def upsert(self, ids, embeddings, metadatas, documents):
+        """Write precomputed embeddings without re-embedding."""
+        self.backend.add(ids, embeddings, documents, [metadata or {} for metadata in metadatas])
+    
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding_function.embed_query(query), k=k, filter=filter)
+    
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        results = self.backend.search(self.embedding_function.embed_query(query), k=k, where=filter)
+        return [(doc, distance_from_cosine(cosine)) for doc, cosine in results]
+    
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.backend.search(self.embedding_function.embed_query(query), k=k, where=filter)]
+    
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None, **kwargs):
+        return [(doc, relevance_from_cosine(cosine)) for doc, cosine in self.backend.search(embedding, k=k, where=filter)]
+    
+    def delete(self, ids=None, **kwargs):
+        self.backend.delete(ids or [])
+    
+    def persist(self):
+        self.backend.persist()
+    
+    def get(self, where=None, limit=None, offset=0, include=None, **kwargs):
+        return self.backend.get(where=where, limit=limit, offset=offset, include=include)
+    
+    def get_by_ids(self, ids):
+        return self.backend.get_by_ids(ids)
+    
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Create BackendVectorStore with an existing backend")
+
+
+class BatchedWriter:
+    """
+    Single-writer, write-behind front for a vectorstore.
+
+    add_texts/add_documents calls from concurrent ingest threads are queued and
+    a writer thread gathers them for up to max_wait_ms or max_batch_size texts,
+    embeds the batch in one forward pass and commits it with one upsert. Each
+    caller blocks until its batch is committed, so a returned call means the
+    document is stored. Everything else is read straight from the vectorstore.
+    
+    A failed upsert fails the batch's callers. A failed persist() after a
+    committed upsert does not: the documents are stored and readable, the
+    failure is logged and counted, and persisting is retried after the next
+    batch and on close(). Writes submitted after close() are rejected.
+
+    Args:
+        vectorstore: Store the batches are written to and reads are served from.
+        upsert: Function (ids, embeddings, metadatas, documents) committing precomputed embeddings.
+    """
+    
+    def __init__(self, vectorstore, upsert, max_batch_size: int = 32, max_wait_ms: float = 50):
+        self.vectorstore = vectorstore
+        self.upsert = upsert
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="vectorstore-writer", daemon=True)
+        self._thread.start()
+    
+    def __getattr__(self, name):
+        # Reads (get, search, embeddings, ...) bypass the writer
+        return getattr(self.vectorstore, name)
+    
+    def submit(self, texts, metadatas=None, ids=None) -> Future:
+        """Queue texts for the next batch; the future resolves to their ids once committed."""
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        future = Future()
+        with self._close_lock:
+            # Nothing may follow the stop sentinel, it would never be written
+            if self._closed:
+                raise RuntimeError("BatchedWriter is closed")
+            self._queue.put((texts, metadatas, ids, future))
+        return future
+    
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        return self.submit(texts, metadatas, ids).result()
+    
+    def add_documents(self, documents, ids=None, **kwargs):
+        documents = list(documents)
+        return self.add_texts([doc.page_content for doc in documents], [doc.metadata for doc in documents], ids)
+    
+    def _gather(self, first):
+        """
+        The first request plus everything queued behind it. Under load requests
+        pile up while the previous batch commits; a lone request waits up to
+        max_wait_ms for company.
+        """
+        batch = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while size < self.max_batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if len(batch) > 1 or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+    
+    def _persist(self) -> bool:
+        """Persist the committed batches; False (logged and counted) when it fails."""
+        persist = getattr(self.vectorstore, "persist", None)
+        if persist is None:
+            return True
+        try:
+            persist()
+        except Exception as e:
+            print(f"⚠️ Vectorstore persist failed, committed documents are not durable yet: {e}")
+            metrics.incr("vectorstore_writer.persist_errors")
+            return False
+        return True
+    
+    def _run(self):
+        unpersisted = False
+        while True:
+            first = self._queue.get()
+            if first is None:
+                if unpersisted:
+                    self._persist()
+                return
+            batch = self._gather(first)
+            texts = [text for item in batch for text in item[0]]
+            metadatas = [metadata for item in batch for metadata in item[1]]
+            ids = [record_id for item in batch for record_id in item[2]]
+            started = time.perf_counter()
+            try:
+                embeddings = self.vectorstore.embeddings.embed_documents(texts)
+                self.upsert(ids, embeddings, metadatas, texts)
+            except Exception as e:
+                print(f"❌ Vectorstore batch write of {len(texts)} documents failed: {e}")
+                for item in batch:
+                    item[3].set_exception(e)
+                continue
+            # The batch is committed whatever happens to persisting it
+            unpersisted = not self._persist()
+            metrics.incr("vectorstore_writer.batches")
+            metrics.incr("vectorstore_writer.documents", len(texts))
+            metrics.incr("vectorstore_writer.write_seconds", time.perf_counter() - started)
+            metrics.set("vectorstore_writer.avg_batch_size",
+                        round(metrics.ratio("vectorstore_writer.documents", "vectorstore_writer.batches"), 2))
+            for item in batch:
+                item[3].set_result(item[2])
+    
+    def close(self):
+        """Commit what is queued and stop the writer thread; later writes are rejected."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
 
 
 class VectorStoreService:
-    """Service for managing the Chroma vectorstore."""
+    """
+    Service for managing the Chroma vectorstore.
+    
+    When server_address is given, the model and index live in a shared
+    vectorstore server process (see app.vectorstore_server) and this service
+    is a thin client to it.
+    
+    The collection and embedding model come from the active collection
+    pointer in persist_directory, which the reindex command switches.
     
-    def __init__(self, persist_directory: str = "./app/chroma"):
+    backend selects the index: "chroma" (default), "numpy" for exact search
+    over a memory-mapped matrix, or "hnsw" (requires hnswlib).
+    
+    partition ("week" or "month") spreads new articles over one collection per
+    period of ingestion, see app.partitions; at most max_loaded_partitions are
+    kept open.
+    """
+    
+    def __init__(self, persist_directory: str = DEFAULT_PERSIST_DIRECTORY, server_address: str = None,
+                 backend: str = "chroma", partition: str = None, max_loaded_partitions: int = 6):
         self.persist_directory = persist_directory
+        self.server_address = server_address
+        self.backend = backend
+        self.partition = partition or None
+        self.max_loaded_partitions = max_loaded_partitions
+        active = read_active_collection(persist_directory)
+        self.collection_name = active["collection_name"]
+        self.model_name = active["embedding_model"]
+        self.connection = None
+        if server_address:
+            from .vectorstore_server import RemoteConnection
+            self.connection = RemoteConnection(server_address)
         self.embeddings = self._initialize_embeddings()
         self.vectorstore = self._initialize_vectorstore()
         self.retriever = None
         self.instruct_retriever = None
+        self.summary_vectorstore = None
     
     def _initialize_embeddings(self):
         """Initialize HuggingFace embeddings with multilingual model."""
-        model_name = "intfloat/multilingual-e5-large-instruct"
-        model_kwargs = {'device': 'cpu', "trust_remote_code": False}
-        encode_kwargs = {'normalize_embeddings': True}
-        
-        return HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
+        if self.connection is not None:
+            from .vectorstore_server import RemoteEmbeddings
+            return RemoteEmbeddings(self.connection)
+        
+        return create_embeddings(self.model_name)
     
     def _initialize_vectorstore(self):
         """Initialize or load Chroma vectorstore."""
+        if self.connection is not None:
+            from .vectorstore_server import RemoteVectorStore
+            return RemoteVectorStore(self.connection)
+        
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
         
+        if self.partition:
+            from .partitions import PartitionedVectorStore, PARTITIONS_FILE_TEMPLATE, PARTITION_IDS_FILE_TEMPLATE
+            
+            return PartitionedVectorStore(
+                self.embeddings,
+                self._create_collection,
+                upsert=lambda store, ids, embeddings, metadatas, documents: self._upsert(ids, embeddings, metadatas, documents, store=store),
+                search=search_by_vector,
+                manifest_path=os.path.join(self.persist_directory, PARTITIONS_FILE_TEMPLATE.format(collection=self.collection_name)),
+                ids_path=os.path.join(self.persist_directory, PARTITION_IDS_FILE_TEMPLATE.format(collection=self.collection_name)),
+                base_name=self.collection_name,
+                period=self.partition,
+                max_loaded=self.max_loaded_partitions,
+            )
+        
+        return self._create_collection(self.collection_name)
+    
+    def _create_collection(self, name: str):
+        """Open (or create) a collection of the configured backend."""
+        if self.backend != "chroma":
+            return BackendVectorStore(self.embeddings, open_backend(self.persist_directory, self.backend, name))
+        
         return Chroma(
+            collection_name=name,
             persist_directory=self.persist_directory,
             embedding_function=self.embeddings
         )
@@ -62,9 +941,88 @@ class VectorStoreService:
         """Get the vectorstore instance."""
         return self.vectorstore
     
-    def get_retriever(self, search_type: str = "similarity", k: int = 3):
-        """Get a standard retriever."""
-        if self.retriever is None or self.retriever._search_kwargs.get("k") != k:
+    def get_topic_index(self):
+        """
+        Topic index of the active collection, persisted next to it.
+        Built from the stored topics metadata the first time it is requested.
+        """
+        from .topics import TopicIndex, TOPICS_FILE_TEMPLATE
+        
+        path = os.path.join(self.persist_directory, TOPICS_FILE_TEMPLATE.format(collection=self.collection_name))
+        exists = os.path.exists(path)
+        topic_index = TopicIndex(path)
+        if not exists:
+            count = topic_index.rebuild(self.vectorstore)
+            print(f"🏷️ Built topic index from {count} stored articles")
+        return topic_index
+    
+    def get_summary_vectorstore(self):
+        """
+        Store of article summary embeddings for two-stage retrieval, keyed by the
+        article ids of the main collection. Summaries of articles it is missing
+        are added on first use. None in shared-server mode, which serves one store.
+        """
+        if self.connection is not None:
+            return None
+        if self.summary_vectorstore is not None:
+            return self.summary_vectorstore
+        
+        store = self._create_collection(f"{self.collection_name}_summaries")
+        
+        # Backfill articles stored before the summary store existed
+        indexed = set(store.get(include=[])["ids"])
+        ids, summaries, metadatas = [], [], []
+        offset = 0
+        while True:
+            page = self.vectorstore.get(include=["metadatas"], limit=1000, offset=offset)
+            if not page["ids"]:
+                break
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                if doc_id not in indexed and metadata.get("summary"):
+                    ids.append(doc_id)
+                    summaries.append(metadata["summary"])
+                    metadatas.append(summary_metadata(doc_id, metadata))
+            offset += len(page["ids"])
+        for start in range(0, len(ids), 256):
+            store.add_texts(summaries[start:start + 256], metadatas=metadatas[start:start + 256], ids=ids[start:start + 256])
+        if ids:
+            print(f"🧾 Added {len(ids)} article summaries to the summary store")
+        
+        self.summary_vectorstore = store
+        return store
+    
+    def get_summary_retriever(self, k: int = 20,
+                              task_description: str = "Retrieve most relevant documents to the query"):
+        """Instruct retriever over article summaries, or None when no summary store is available."""
+        store = self.get_summary_vectorstore()
+        if store is None:
+            return None
+        return InstructRetriever(
+            base_retriever=ScoredRetriever(vectorstore=store, k=k),
+            task_description=task_description,
+        )
+    
+    def get_duplicate_index(self, threshold: float = 0.8):
+        """
+        Near-duplicate (MinHash-LSH) index of the active collection, persisted next to it.
+        Built from the stored articles the first time it is requested.
+        """
+        from .dedup import DuplicateIndex, DEDUP_FILE_TEMPLATE
+        
+        path = os.path.join(self.persist_directory, DEDUP_FILE_TEMPLATE.format(collection=self.collection_name))
+        exists = os.path.exists(path)
+        duplicate_index = DuplicateIndex(path, threshold=threshold)
+        if not exists:
+            count = duplicate_index.rebuild(self.vectorstore)
+            print(f"🧬 Built duplicate index from {count} stored articles")
+        return duplicate_index
+    
+    def get_retriever(self, search_type: str = "similarity", k: int = 3, with_scores: bool = False):
+        """Get a standard retriever, or a scored one when with_scores is set."""
+        if with_scores:
+            return ScoredRetriever(vectorstore=self.vectorstore, k=k)
+        if self.retriever is None or self.retriever.search_kwargs.get("k") != k:
             self.retriever = self.vectorstore.as_retriever(
                 search_type=search_type,
                 search_kwargs={"k": k}
@@ -72,16 +1030,206 @@ class VectorStoreService:
         return self.retriever
     
     def get_instruct_retriever(self, search_type: str = "similarity", k: int = 3, 
-                              task_description: str = "Retrieve most relevant documents to the query"):
+                              task_description: str = "Retrieve most relevant documents to the query",
+                              with_scores: bool = False):
         """Get an instruction-based retriever."""
-        base_retriever = self.get_retriever(search_type=search_type, k=k)
+        base_retriever = self.get_retriever(search_type=search_type, k=k, with_scores=with_scores)
         
         self.instruct_retriever = InstructRetriever(
             base_retriever=base_retriever,
             task_description=task_description
         )
         return self.instruct_retriever
+    
+    def _upsert(self, ids, embeddings, metadatas, documents, store=None):
+        """Write precomputed embeddings straight into the collection (or the given store)."""
+        store = store if store is not None else self.vectorstore
+        if isinstance(store, Chroma):
+            return store._collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+        return store.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+    
+    def get_batched_writer(self, store=None, max_batch_size: int = 32, max_wait_ms: float = 50):
+        """
+        Write-behind BatchedWriter over the vectorstore (or the given store), used
+        in its place by the ingest workflow so concurrent ingests share embedding
+        passes and commits.
+        """
+        store = store if store is not None else self.vectorstore
+        return BatchedWriter(
+            store,
+            lambda ids, embeddings, metadatas, documents: self._upsert(ids, embeddings, metadatas, documents, store=store),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+        )
+    
+    def export_snapshot(self, path: str, since: float = None, batch_size: int = 1000) -> int:
+        """
+        Export ids, metadata, documents and float32 embeddings to a .npz snapshot.
+        
+        Pages are streamed to temporary files next to the snapshot and then
+        copied into the archive, so memory stays bounded by one page however
+        large the collection is.
+        
+        Args:
+            path: Destination .npz file.
+            since: Only export documents ingested after this Unix timestamp
+                (incremental snapshot). Exports everything when None.
+            batch_size: Number of records read from the store per page.
+        
+        Returns:
+            int: Number of exported documents.
+        """
+        if not path.endswith(".npz"):
+            path += ".npz"
+        where = {"ingested_at": {"$gt": since}} if since is not None else None
+        columns = ("ids", "metadata", "document")
+        count, dim = 0, 0
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as tmp:
+            files = {name: open(os.path.join(tmp, name), "w+b") for name in
+                     [f"{column}_{part}" for column in columns for part in ("data", "offsets")] + ["embeddings"]}
+            try:
+                ends = dict.fromkeys(columns, 0)
+                offset = 0
+                while True:
+                    page = self.vectorstore.get(
+                        where=where,
+                        limit=batch_size,
+                        offset=offset,
+                        include=["embeddings", "metadatas", "documents"],
+                    )
+                    if not page["ids"]:
+                        break
+                    values = {
+                        "ids": page["ids"],
+                        "metadata": [json.dumps(metadata or {}) for metadata in page["metadatas"]],
+                        "document": [document or "" for document in page["documents"]],
+                    }
+                    for column in columns:
+                        data, offsets = _pack_strings(values[column])
+                        files[f"{column}_data"].write(data.tobytes())
+                        files[f"{column}_offsets"].write((offsets + ends[column]).tobytes())
+                        ends[column] += int(offsets[-1])
+                    embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                    dim = embeddings.shape[1]
+                    files["embeddings"].write(embeddings.tobytes())
+                    count += len(page["ids"])
+                    offset += len(page["ids"])
+                
+                shapes = {"embeddings": (count, dim) if count else (0, 0)}
+                for column in columns:
+                    shapes[f"{column}_data"] = (ends[column],)
+                    shapes[f"{column}_offsets"] = (count,)
+                dtypes = {name: np.uint8 if name.endswith("_data") else np.int64 for name in files}
+                dtypes["embeddings"] = np.float32
+                
+                # Same layout as np.savez: one uncompressed .npy member per array
+                tmp_path = os.path.join(tmp, "snapshot.npz")
+                with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+                    for name, f in files.items():
+                        f.seek(0)
+                        with archive.open(f"{name}.npy", "w", force_zip64=True) as member:
+                            np.lib.format.write_array_header_1_0(member, {
+                                "descr": np.lib.format.dtype_to_descr(np.dtype(dtypes[name])),
+                                "fortran_order": False,
+                                "shape": shapes[name],
+                            })
+                            shutil.copyfileobj(f, member)
+                    for name, value in (("embedding_model", np.array(self.model_name)),
+                                        ("created_at", np.array(time.time()))):
+                        with archive.open(f"{name}.npy", "w") as member:
+                            np.lib.format.write_array(member, value, allow_pickle=False)
+            finally:
+                for f in files.values():
+                    f.close()
+            os.replace(tmp_path, path)
+        print(f"📦 Exported {count} documents to {path}")
+        return count
+    
+    def import_snapshot(self, path: str, batch_size: int = 1000) -> int:
+        """
+        Bulk-load a snapshot written by export_snapshot.
+        
+        Stored embeddings are written as-is. If the snapshot was made with a
+        different embedding model, documents are re-embedded with the current one.
+        
+        Imported articles go through the same indexes as ingested ones: the
+        topic index, the duplicate index and the summary store.
+        
+        Returns:
+            int: Number of imported documents.
+        """
+        with np.load(path, allow_pickle=False) as snapshot:
+            ids = _unpack_strings(snapshot["ids_data"], snapshot["ids_offsets"])
+            metadatas = [json.loads(m) for m in _unpack_strings(snapshot["metadata_data"], snapshot["metadata_offsets"])]
+            documents = _unpack_strings(snapshot["document_data"], snapshot["document_offsets"])
+            embeddings = snapshot["embeddings"]
+            reembed = str(snapshot["embedding_model"]) != self.model_name
+        
+        if reembed:
+            print(f"⚠️ Snapshot embedding model differs from {self.model_name}, re-embedding documents")
+        
+        # Opened (and built from what is already stored) before the import adds to them
+        topic_index = self.get_topic_index()
+        duplicate_index = self.get_duplicate_index()
+        summary_store = self.get_summary_vectorstore()
+        
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            if reembed:
+                batch_embeddings = self.embeddings.embed_documents(documents[start:end])
+            else:
+                batch_embeddings = embeddings[start:end].tolist()
+            self._upsert(
+                ids=ids[start:end],
+                embeddings=batch_embeddings,
+                metadatas=[metadata or None for metadata in metadatas[start:end]],
+                documents=documents[start:end],
+            )
+            self._index_imported(ids[start:end], metadatas[start:end], documents[start:end],
+                                 topic_index, duplicate_index, summary_store)
+        print(f"📥 Imported {len(ids)} documents from {path}")
+        return len(ids)
+    
+    def _index_imported(self, ids, metadatas, documents, topic_index, duplicate_index, summary_store):
+        """The index updates add_to_chroma makes for an ingested article, for a batch of imported ones."""
+        summaries = []
+        for doc_id, metadata, document in zip(ids, metadatas, documents):
+            metadata = metadata or {}
+            if metadata.get("topics"):
+                topic_index.add(doc_id, metadata["topics"], metadata)
+            # Re-imported articles are already canonical copies
+            if document and doc_id not in duplicate_index.rows_by_id:
+                duplicate_index.add(doc_id, document, metadata)
+            if metadata.get("summary"):
+                summaries.append((doc_id, metadata))
+        if summary_store is not None and summaries:
+            summary_store.add_texts([metadata["summary"] for _, metadata in summaries],
+                                    metadatas=[summary_metadata(doc_id, metadata) for doc_id, metadata in summaries],
+                                    ids=[doc_id for doc_id, _ in summaries])
+
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Export or import NewsIQ vectorstore snapshots.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot .npz file")
+    parser.add_argument("--since", type=float, default=None,
+                        help="Export only documents ingested after this Unix timestamp")
+    parser.add_argument("--persist-directory", default=DEFAULT_PERSIST_DIRECTORY)
+    args = parser.parse_args()
+    
+    service = VectorStoreService(
+        persist_directory=args.persist_directory,
+        server_address=os.environ.get("VECTORSTORE_SOCKET"),
+        backend=os.environ.get("VECTORSTORE_BACKEND", "chroma"),
+        partition=os.environ.get("VECTORSTORE_PARTITION"),
+    )
+    if args.command == "export":
+        service.export_snapshot(args.path, since=args.since)
+    else:
+        service.import_snapshot(args.path)
 
 
-# Initialize global service
-vectorstore_service = VectorStoreService()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .documents import DocumentHandle, get_document_store
+
+
+class Session:
+    """Conversation state kept between follow-up questions."""
+
+    def __init__(self, session_id: str, max_turns: int = 5, max_documents: int = 10):
+        self.session_id = session_id
+        self.max_turns = max_turns
+        self.max_documents = max_documents
+        self.turns = []
+        self.documents = []
+        self.last_access = time.time()
+
+    def add_turn(self, question: str, answer: str):
+        """Record a question/answer pair, keeping only the most recent turns."""
+        self.turns.append((question, answer))
+        self.turns = self.turns[-self.max_turns:]
+
+    def add_documents(self, documents):
+        """
+        Remember documents graded relevant, newest first, without duplicates.
+        Stored documents are kept as id-only handles and reloaded on the next follow-up.
+        """
+        document_store = get_document_store()
+        merged = [
+            DocumentHandle(doc.id, doc.metadata)
+            if isinstance(doc, DocumentHandle) and not document_store.is_pending(doc.id) else doc
+            for doc in documents
+        ] + self.documents
+        seen = set()
+        unique = []
+        for doc in merged:
+            key = doc.metadata.get("link") or getattr(doc, "id", None) or doc.page_content[:200]
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(doc)
+        self.documents = unique[:self.max_documents]
+
+    def history(self) -> str:
+        """Format recent turns for the answering prompt."""
+        return "\n".join(f"Q: {question}\nA: {answer}" for question, answer in self.turns)
+
+    def size(self) -> int:
+        """Approximate memory footprint in bytes."""
+        size = sum(len(question) + len(answer) for question, answer in self.turns)
+        for doc in self.documents:
+            text_size = doc.text_size() if isinstance(doc, DocumentHandle) else len(doc.page_content)
+            size += text_size + len(str(doc.metadata))
+        return size
+
+
+class SessionStore:
+    """
+    Bounded session store with LRU and TTL eviction.
+
+    Sessions are evicted least-recently-used first once max_sessions or max_bytes
+    is exceeded, and expire after ttl_seconds of inactivity. When spill_directory
+    is set, sessions evicted for memory are pickled to disk and loaded back on access.
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl_seconds: int = 3600, spill_directory: str = None,
+                 max_turns: int = 5, max_documents: int = 10):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_directory = spill_directory
+        self.max_turns = max_turns
+        self.max_documents = max_documents
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if self.spill_directory:
+            os.makedirs(self.spill_directory, exist_ok=True)
+
+    def _spill_path(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_directory, f"{digest}.pkl")
+
+    def _expired(self, session: Session) -> bool:
+        return time.time() - session.last_access > self.ttl_seconds
+
+    def _load_spilled(self, session_id: str):
+        if not self.spill_directory:
+            return None
+        path = self._spill_path(session_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            session = pickle.load(f)
+        os.remove(path)
+        return session
+
+    def _spill(self, session: Session):
+        with open(self._spill_path(session.session_id), "wb") as f:
+            pickle.dump(session, f)
+
+    def _evict(self):
+        """Drop expired sessions, then evict LRU sessions until within bounds."""
+        for session_id in [sid for sid, s in self._sessions.items() if self._expired(s)]:
+            self._bytes -= self._sessions.pop(session_id).size()
+
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            _, session = self._sessions.popitem(last=False)
+            self._bytes -= session.size()
+            if self.spill_directory:
+                self._spill(session)
+
+    def get(self, session_id: str):
+        """Return a live session, or None if it does not exist or has expired."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._load_spilled(session_id)
+                if session is None:
+                    return None
+                self._sessions[session_id] = session
+                self._bytes += session.size()
+            if self._expired(session):
+                self._bytes -= self._sessions.pop(session_id).size()
+                return None
+            self._sessions.move_to_end(session_id)
+            session.last_access = time.time()
+            self._evict()
+            return session
+
+    def get_or_create(self, session_id: str) -> Session:
+        """Return the session for session_id, creating it when missing."""
+        session = self.get(session_id)
+        if session is not None:
+            return session
+        with self._lock:
+            session = Session(session_id, max_turns=self.max_turns, max_documents=self.max_documents)
+            self._sessions[session_id] = session
+            self._evict()
+            return session
+
+    def update(self, session: Session, question: str, answer: str, documents):
+        """Record a turn and its graded documents, re-accounting the session size."""
+        with self._lock:
+            previous_size = session.size()
+            session.add_turn(question, answer)
+            session.add_documents(documents)
+            session.last_access = time.time()
+            if session.session_id in self._sessions:
+                self._bytes += session.size() - previous_size
+                self._sessions.move_to_end(session.session_id)
+            else:
+                self._sessions[session.session_id] = session
+                self._bytes += session.size()
+            self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session from memory and disk. Returns True if it existed."""
+        with self._lock:
+            found = False
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.size()
+                found = True
+            if self.spill_directory:
+                path = self._spill_path(session_id)
+                if os.path.exists(path):
+                    os.remove(path)
+                    found = True
+            return found
+
+    def stats(self) -> dict:
+        """Current occupancy of the store."""
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes}
@@ -0,0 +1,85 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When many users ask the same question, or crawlers submit the same URL, at
+the same time, only the first request runs the graph; the others wait for
+its result. The shared work runs as its own task, so a waiter that is
+cancelled (e.g. the client disconnected) does not cancel it for the rest.
+"""
+import asyncio
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .metrics import metrics
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMETERS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation insensitive form of a question."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of an article URL: lowercase scheme and host, no default
+    port, fragment, tracking parameters or trailing slash, sorted query.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(TRACKING_PARAMETERS)
+    )
+    return urlunsplit((scheme, host, parts.path.rstrip("/") or "/", urlencode(query), ""))
+
+
+class SingleFlight:
+    """
+    Runs one coroutine per key at a time and shares its result with every
+    caller that asks for the same key meanwhile. Use from one event loop.
+
+    Args:
+        name: Used in the metrics (singleflight.<name>.*).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key, work):
+        """
+        Result of work() for key, joining a run already in flight.
+
+        Args:
+            key: Hashable identity of the request.
+            work: Zero-argument function returning the coroutine to run.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            metrics.incr(f"singleflight.{self.name}.executions")
+        else:
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            print(f"🔗 Joined in-flight {self.name} request")
+        metrics.set(f"singleflight.{self.name}.inflight", self.inflight)
+        # Cancelling this waiter leaves the shared task running for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        metrics.set(f"singleflight.{self.name}.inflight", self.inflight)
+        if not task.cancelled():
+            # Mark the exception retrieved when every waiter has gone away
+            task.exception()
@@ -0,0 +1,261 @@
+"""
+Topic -> document inverted index.
+
+Topics come back from the topics identifier as free text (bullets, numbered
+lists, comma-separated lines). They are normalized at ingest and kept in an
+in-memory index that is persisted as an append-only log next to the
+vectorstore, so listing topics, counting them and finding a topic's articles
+never scans the collection. Each topic's articles are kept ordered by
+ingestion time and the topics ordered by article count as they change, so a
+page costs O(page size) rather than a sort per request.
+"""
+import os
+import re
+import json
+import bisect
+import threading
+
+
+TOPICS_FILE_TEMPLATE = "topics_{collection}.jsonl"
+MAX_TOPIC_CHARS = 60
+# Article fields kept in the index so topic pages need no store lookups
+ARTICLE_FIELDS = ("title", "link", "publish_date", "ingested_at")
+
+LIST_MARKER = re.compile(r"^\s*(?:[-*•+]|\d+[.)])\s*")
+HEADER_LINE = re.compile(r"^\s*(?:main\s+)?(?:topics|entities|concepts)[^:]*:\s*", re.IGNORECASE)
+
+
+def topic_key(topic: str) -> str:
+    """Lookup key for a topic: lowercase with collapsed whitespace."""
+    return " ".join(topic.lower().split())
+
+
+def parse_topics(raw) -> list:
+    """
+    Normalize topics given as a list or as the identifier's free text.
+
+    Returns:
+        list: Unique display names in their original order, without list
+        markers, markdown emphasis or header lines.
+    """
+    if isinstance(raw, (list, tuple)):
+        parts = [str(part) for part in raw]
+    else:
+        parts = re.split(r"[\n,;]", str(raw or ""))
+
+    topics, seen = [], set()
+    for part in parts:
+        part = HEADER_LINE.sub("", LIST_MARKER.sub("", part.replace("**", "").replace("__", "")))
+        # Drop "Topic: explanation" tails and wrapping punctuation
+        part = part.split(":", 1)[0] if ":" in part else part
+        part = " ".join(part.split()).strip(" .\"'`()[]")
+        key = topic_key(part)
+        if not key or len(key) > MAX_TOPIC_CHARS or key in seen:
+            continue
+        seen.add(key)
+        topics.append(part)
+    return topics
+
+
+class TopicIndex:
+    """
+    Incrementally maintained topic -> document id index.
+
+    Every change is appended to a JSONL log which is replayed on load. Other
+    processes appending to the same log (multi-worker deployments) are picked
+    up before each read.
+
+    Args:
+        path: Log file, normally next to the collection it indexes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+        self._catch_up()
+
+    def _reset(self):
+        # key -> {"name": display name, "ids": set of doc ids, "order": sorted [(ingested_at, doc id)]}
+        self.topics = {}
+        self.documents = {}   # doc id -> {"topics": [keys], **ARTICLE_FIELDS}
+        self._keys = []       # sorted topic keys for prefix search
+        self._by_count = []   # sorted [(-count, key)] for the most common topics
+        self._offset = 0
+        self._inode = None
+
+    def _recount(self, key: str, before: int, after: int):
+        """Move a topic to its new place in the count order."""
+        if before:
+            del self._by_count[bisect.bisect_left(self._by_count, (-before, key))]
+        if after:
+            bisect.insort(self._by_count, (-after, key))
+
+    def _apply(self, record: dict):
+        doc_id = record["id"]
+        previous = self.documents.pop(doc_id, None)
+        if previous is not None:
+            position = (previous.get("ingested_at") or 0, doc_id)
+            for key in previous["topics"]:
+                entry = self.topics.get(key)
+                if entry is None or doc_id not in entry["ids"]:
+                    continue
+                entry["ids"].discard(doc_id)
+                del entry["order"][bisect.bisect_left(entry["order"], position)]
+                self._recount(key, len(entry["ids"]) + 1, len(entry["ids"]))
+                if not entry["ids"]:
+                    del self.topics[key]
+                    self._keys.pop(bisect.bisect_left(self._keys, key))
+        if record["op"] != "add":
+            return
+
+        article = record.get("article", {})
+        position = (article.get("ingested_at") or 0, doc_id)
+        keys = []
+        for name in record["topics"]:
+            key = topic_key(name)
+            entry = self.topics.get(key)
+            if entry is None:
+                entry = self.topics[key] = {"name": name, "ids": set(), "order": []}
+                bisect.insort(self._keys, key)
+            if doc_id in entry["ids"]:
+                continue
+            entry["ids"].add(doc_id)
+            bisect.insort(entry["order"], position)
+            self._recount(key, len(entry["ids"]) - 1, len(entry["ids"]))
+            keys.append(key)
+        self.documents[doc_id] = {"topics": keys, **article}
+
+    def _catch_up(self):
+        """Replay log lines written since the last read, reloading if the log was compacted."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self._offset):
+            self._reset()
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Another process is still writing this line
+                    break
+                self._offset += len(line)
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError):
+                    continue
+        self._inode = stat.st_ino
+
+    def _append(self, record: dict):
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # One O_APPEND write per record keeps concurrent writers from interleaving
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._catch_up()
+
+    def add(self, doc_id: str, topics, metadata: dict = None):
+        """Index a document under its topics (raw identifier output or a list)."""
+        metadata = metadata or {}
+        record = {
+            "op": "add",
+            "id": doc_id,
+            "topics": parse_topics(topics),
+            "article": {field: metadata.get(field) for field in ARTICLE_FIELDS if metadata.get(field) is not None},
+        }
+        with self._lock:
+            self._catch_up()
+            self._append(record)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._catch_up()
+            if doc_id in self.documents:
+                self._append({"op": "remove", "id": doc_id})
+
+    def list_topics(self, prefix: str = None, limit: int = 50, offset: int = 0, sort: str = "count") -> dict:
+        """
+        Topics with their article counts.
+
+        Args:
+            prefix: Only topics whose normalized name starts with this.
+            sort: "count" (most articles first) or "name".
+        """
+        with self._lock:
+            self._catch_up()
+            if prefix:
+                prefix = topic_key(prefix)
+                start = bisect.bisect_left(self._keys, prefix)
+                end = bisect.bisect_left(self._keys, prefix + "\uffff")
+                total = end - start
+                if sort == "count":
+                    # Only the topics under the prefix are ordered
+                    keys = sorted(self._keys[start:end], key=lambda key: (-len(self.topics[key]["ids"]), key))
+                    keys = keys[offset:offset + limit]
+                else:
+                    keys = self._keys[start + offset:min(end, start + offset + limit)]
+            else:
+                total = len(self._keys)
+                if sort == "count":
+                    keys = [key for _, key in self._by_count[offset:offset + limit]]
+                else:
+                    keys = self._keys[offset:offset + limit]
+            page = [
+                {"topic": self.topics[key]["name"], "key": key, "count": len(self.topics[key]["ids"])}
+                for key in keys
+            ]
+            return {"total": total, "topics": page}
+
+    def articles(self, topic: str, limit: int = 20, offset: int = 0) -> dict:
+        """Articles indexed under a topic, newest first. None when the topic is unknown."""
+        with self._lock:
+            self._catch_up()
+            entry = self.topics.get(topic_key(topic))
+            if entry is None:
+                return None
+            order = entry["order"]
+            # Newest first: walk the ingestion order backwards from the end
+            end = max(len(order) - offset, 0)
+            page = order[max(end - limit, 0):end][::-1]
+            articles = [{"id": doc_id, **{k: v for k, v in self.documents[doc_id].items() if k != "topics"}}
+                        for _, doc_id in page]
+            return {"topic": entry["name"], "total": len(order), "articles": articles}
+
+    def compact(self):
+        """Rewrite the log with only the live documents."""
+        with self._lock:
+            self._catch_up()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for doc_id, document in self.documents.items():
+                    f.write(json.dumps({
+                        "op": "add",
+                        "id": doc_id,
+                        "topics": [self.topics[key]["name"] for key in document["topics"]],
+                        "article": {k: v for k, v in document.items() if k != "topics"},
+                    }) + "\n")
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._catch_up()
+
+    def rebuild(self, vectorstore, batch_size: int = 1000) -> int:
+        """Index every document already in the store from its topics metadata. Returns the count."""
+        count, offset = 0, 0
+        while True:
+            page = vectorstore.get(include=["metadatas"], limit=batch_size, offset=offset)
+            ids = page.get("ids", [])
+            if not ids:
+                break
+            for doc_id, metadata in zip(ids, page.get("metadatas") or [{}] * len(ids)):
+                metadata = metadata or {}
+                if metadata.get("topics"):
+                    self.add(doc_id, metadata["topics"], metadata)
+                    count += 1
+            offset += len(ids)
+        return count
@@ -0,0 +1,245 @@
+"""
+Shared embedding and vector-store server.
+
+One process owns the e5 model and the Chroma index and serves them over a Unix
+socket, so multi-worker uvicorn deployments load the model once and never race
+on the same SQLite file. API workers talk to it through RemoteVectorStore.
+
+Connections unpickle what they receive, so the socket is only reachable by its
+owner (mode 0600 in a 0700 directory) and both sides need the shared secret in
+VECTORSTORE_AUTHKEY; there is no default.
+
+Run with:
+    VECTORSTORE_AUTHKEY=<secret> python -m app.vectorstore_server
+"""
+import os
+import stat
+import time
+import tempfile
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from typing import Any, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+# In a directory only this user can enter
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"newsiq-{os.getuid()}", "vectorstore.sock")
+
+
+def authkey() -> bytes:
+    """Shared secret of the server and its clients, required."""
+    key = os.environ.get("VECTORSTORE_AUTHKEY")
+    if not key:
+        raise RuntimeError("VECTORSTORE_AUTHKEY must be set to a secret shared by the vectorstore server and the API workers")
+    return key.encode("utf-8")
+
+
+def prepare_socket_directory(address: str):
+    """Create the socket's directory with mode 0700, refusing one other users can reach."""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid():
+        raise RuntimeError(f"Socket directory {directory} is owned by another user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(directory, 0o700)
+
+# Operations a client is allowed to run on the server
+READ_METHODS = {
+    "similarity_search",
+    "similarity_search_with_score",
+    "similarity_search_with_relevance_scores",
+    "similarity_search_by_vector_with_relevance_scores",
+    "get",
+    "get_by_ids",
+    "embed_query",
+    "embed_documents",
+}
+WRITE_METHODS = {"add_texts", "delete", "upsert"}
+
+
+class VectorStoreServer:
+    """Serves one VectorStoreService to many client processes."""
+
+    def __init__(self, service, address: str = DEFAULT_SOCKET):
+        self.service = service
+        self.address = address
+        self._write_lock = threading.Lock()
+
+    def _dispatch(self, method: str, args, kwargs):
+        if method == "embed_query":
+            return self.service.embeddings.embed_query(*args, **kwargs)
+        if method == "embed_documents":
+            return self.service.embeddings.embed_documents(*args, **kwargs)
+        if method in WRITE_METHODS:
+            # Chroma's SQLite has a single writer, serialize writes here
+            with self._write_lock:
+                if method == "upsert":
+                    return self.service._upsert(*args, **kwargs)
+                return getattr(self.service.vectorstore, method)(*args, **kwargs)
+        if method == "similarity_search_by_vector_with_relevance_scores":
+            from .services import search_by_vector
+            return search_by_vector(self.service.vectorstore, *args, **kwargs)
+        if method in READ_METHODS:
+            return getattr(self.service.vectorstore, method)(*args, **kwargs)
+        raise ValueError(f"Unsupported vectorstore method: {method}")
+
+    def _handle(self, conn):
+        try:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    conn.send(("ok", self._dispatch(method, args, kwargs)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        """Accept client connections, one thread per connection."""
+        key = authkey()
+        prepare_socket_directory(self.address)
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        # Owner-only from the moment the socket exists
+        previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=key)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self.address, 0o600)
+        with listener:
+            print(f"🧠 Vectorstore server listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except AuthenticationError:
+                    print("⚠️ Vectorstore server rejected a client with the wrong VECTORSTORE_AUTHKEY")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteConnection:
+    """Per-thread client connections to a VectorStoreServer."""
+
+    def __init__(self, address: str = DEFAULT_SOCKET, connect_timeout: float = 120.0):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        # The server may still be loading the model when workers start
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=authkey())
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+
+    def call(self, method: str, *args, **kwargs):
+        """Run a method on the server and return its result."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        try:
+            conn.send((method, args, kwargs))
+            status, result = conn.recv()
+        except (EOFError, OSError):
+            self._local.conn = None
+            raise
+        if status == "error":
+            raise RuntimeError(f"Vectorstore server error: {result}")
+        return result
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by the shared server's model."""
+
+    def __init__(self, connection: RemoteConnection):
+        self.connection = connection
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.connection.call("embed_documents", list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.connection.call("embed_query", text)
+
+
+class RemoteVectorStore(VectorStore):
+    """Thin client for the shared server, usable anywhere a Chroma store is."""
+
+    def __init__(self, connection: RemoteConnection):
+        self.connection = connection
+        self._embeddings = RemoteEmbeddings(connection)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        return self.connection.call("add_texts", list(texts), metadatas=metadatas, ids=ids, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.connection.call("similarity_search", query, k=k, **kwargs)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.connection.call("similarity_search_with_score", query, k=k, **kwargs)
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.connection.call("similarity_search_with_relevance_scores", query, k=k, **kwargs)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4,
+                                                          **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.connection.call("similarity_search_by_vector_with_relevance_scores", list(embedding), k=k, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any):
+        return self.connection.call("delete", ids=ids, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return self.connection.call("get", *args, **kwargs)
+
+    def get_by_ids(self, ids):
+        return self.connection.call("get_by_ids", ids)
+
+    def upsert(self, **kwargs):
+        return self.connection.call("upsert", **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("RemoteVectorStore connects to an existing server")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared NewsIQ embedding/vectorstore server.")
+    parser.add_argument("--socket", default=os.environ.get("VECTORSTORE_SOCKET", DEFAULT_SOCKET))
+    parser.add_argument("--persist-directory", default=None,
+                        help="Defaults to CHROMA_PERSIST_DIRECTORY, like the API")
+    parser.add_argument("--backend", default=os.environ.get("VECTORSTORE_BACKEND", "chroma"))
+    parser.add_argument("--partition", choices=["week", "month"], default=os.environ.get("VECTORSTORE_PARTITION") or None,
+                        help="One collection per week or month of ingestion")
+    args = parser.parse_args()
+    try:
+        authkey()
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    from app.services import VectorStoreService, DEFAULT_PERSIST_DIRECTORY
+
+    service = VectorStoreService(persist_directory=args.persist_directory or DEFAULT_PERSIST_DIRECTORY,
+                                 backend=args.backend, partition=args.partition)
+    VectorStoreServer(service, address=args.socket).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,17 @@
+import re
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
 from .workers import (create_question_answerer, retrieval_grader, create_question_rewriter, create_hallucination_checker)
+from ...metrics import metrics, estimate_tokens
+from ...grounding import precheck_grounding
+from ...llm_gateway import run_coroutine
+from ...services import get_detailed_instruct, reciprocal_rank_fusion
+from ...documents import DocumentHandle, get_document_store
+
+
+DRILL_DOWN_TASK = "Retrieve the passages of a news article that answer the query"
 
 
 def initialize_workflow(state):
@@ -9,78 +22,307 @@ def initialize_workflow(state):
         state (dict): The current graph state.
         
     Returns:
-        dict: Updated state with steps and question initialized.
+        dict: Updated state with the question and the initialization step.
     """
-    # Get or initialize question and steps
     question = state.get("question", "")
-    steps = state.get("steps", [])
-    
-    # Add initialization step
-    steps.append("Graph Initialization")
     
     return {
         "question": question,
-        "steps": steps,
+        "steps": ["Graph Initialization"],
     }
 
 
-def grade_documents(state,llm, retrieval_grader):
+def score_gate(document, score_thresholds):
+    """
+    Decide a document's relevance from its retrieval score alone, when the score is decisive.
+
+    Args:
+        document: Retrieved Document, with the similarity score in metadata["score"].
+        score_thresholds (dict): Maps a language code (or "default") to an
+            (accept, reject) pair of similarity scores.
+
+    Returns:
+        str or None: "accept" or "reject" for obvious hits and misses,
+        None when the document falls in the uncertain band and needs the LLM grader.
+    """
+    if not score_thresholds:
+        return None
+
+    score = document.metadata.get("score")
+    if score is None:
+        return None
+
+    language = document.metadata.get("language", "")
+    accept, reject = score_thresholds.get(language, score_thresholds.get("default", (None, None)))
+
+    if accept is not None and score >= accept:
+        return "accept"
+    if reject is not None and score <= reject:
+        return "reject"
+    return None
+
+
+def _grade(question, documents, llm, retrieval_grader, score_thresholds=None, max_concurrency=4, accepted_ids=()):
+    """
+    Relevance of each document to the question: accepted_ids pass as already
+    graded, decisive similarity scores skip the LLM, the rest are graded concurrently.
+
+    Returns:
+        tuple: (keep flags, grader calls skipped by the score gate)
+    """
+    grader_calls_skipped = 0
+    keep = [False] * len(documents)
+    to_grade = []
+    for i, d in enumerate(documents):
+        if d.id is not None and d.id in accepted_ids:
+            keep[i] = True
+            continue
+        # Skip the LLM for documents whose similarity score is decisive
+        decision = score_gate(d, score_thresholds)
+        if decision is not None:
+            grader_calls_skipped += 1
+            print(f"Score gate {decision}ed document with score {d.metadata.get('score')}")
+            keep[i] = decision == "accept"
+            continue
+        to_grade.append(i)
+
+    # Grade the remaining documents concurrently
+    inputs = [{"question": question, "document": documents[i].page_content} for i in to_grade]
+    scores = retrieval_grader(llm).batch(inputs, config={"max_concurrency": max_concurrency}) if inputs else []
+    metrics.incr("grading.llm_calls", len(inputs))
+    metrics.incr("grading.document_tokens", sum(estimate_tokens(item["document"]) for item in inputs))
+    for i, score in zip(to_grade, scores):
+        print(f"Grader output for document: {score}")  # Detailed debugging output
+        keep[i] = score.lower() in ["yes", "true", "1"]
+    return keep, grader_calls_skipped
+
+
+def _reused_ids(state):
+    """Ids of the session documents that already passed grading for this question."""
+    return {d.id for d in state.get("reused_documents") or [] if d.id is not None}
+
+
+def grade_documents(state,llm, retrieval_grader, score_thresholds=None, max_concurrency=4):
     question = state.get("question","")
     documents = state["documents"]
-    steps = state["steps"]
-    steps.append("grade_document_retrieval")
-    
-    filtered_docs = []
-    web_results_list = []
-    search = "No"
-    retrieval_grader = retrieval_grader(llm)
     
-    for d in documents:
-        # Call the grading function
-        score = retrieval_grader.invoke({"question": question, "document": d.page_content})
-        print(f"Grader output for document: {score}")  # Detailed debugging output
-        
-        
-        if score.lower() in ["yes", "true", "1"]:
-            filtered_docs.append(d)
+    keep, grader_calls_skipped = _grade(
+        question, documents, llm, retrieval_grader, score_thresholds, max_concurrency, _reused_ids(state)
+    )
+    filtered_docs = [d for d, kept in zip(documents, keep) if kept]
             
     # ✅ Fixed f-string syntax
     print(f"Filtered documents count: {len(filtered_docs)} from total document amount {len(documents)}")
+    print(f"Grader calls skipped by score gate: {grader_calls_skipped}")
     
     return {
+        "selected_documents": filtered_docs,
+        "question": question,
+        "steps": ["grade_document_retrieval"],
+        "grader_calls_skipped": state.get("grader_calls_skipped", 0) + grader_calls_skipped,
+    }
+
+
+def grade_session_documents(state, llm, retrieval_grader, score_thresholds=None, max_concurrency=4):
+    """
+    Grade the documents a follow-up question inherits from its session against
+    the new question. The ones that pass are answered from directly, or merged
+    into fresh retrieval results when too few pass.
+    """
+    question = state.get("question", "")
+    documents = state.get("session_documents") or []
+
+    keep, grader_calls_skipped = _grade(question, documents, llm, retrieval_grader, score_thresholds, max_concurrency)
+    reused = [d for d, kept in zip(documents, keep) if kept]
+    metrics.incr("session.documents_offered", len(documents))
+    metrics.incr("session.documents_reused", len(reused))
+    print(f"♻️ {len(reused)} of {len(documents)} session documents are relevant to the follow-up")
+
+    return {
+        "reused_documents": reused,
+        "documents": reused,
+        "selected_documents": reused,
+        "steps": ["grade_session_documents"],
+        "grader_calls_skipped": state.get("grader_calls_skipped", 0) + grader_calls_skipped,
+    }
+
+
+def session_documents_sufficient(state, min_documents=2):
+    """
+    Answer from the session's documents when at least min_documents of them
+    (or all of them, if the session has fewer) are relevant to the follow-up.
+    """
+    reused = len(state.get("reused_documents") or [])
+    needed = min(min_documents, len(state.get("session_documents") or []))
+    if reused and reused >= needed:
+        return "Answer from session documents"
+    return "Retrieve documents"
+
+
+def _merge_reused(state, documents):
+    """Relevant session documents first, then the retrieved ones not among them."""
+    reused = state.get("reused_documents") or []
+    reused_ids = _reused_ids(state)
+    return list(reused) + [d for d in documents if d.id is None or d.id not in reused_ids]
+
+
+async def _speculate(question, documents, history, question_answerer, grader, score_thresholds, accepted_ids=()):
+    """
+    Generate from all retrieved documents while grading them concurrently.
+
+    A failed speculative generation (rate limit, timeout) is counted and
+    discarded rather than failing the request: the answer is then None and
+    answering reruns as on a miss.
+
+    Returns:
+        tuple: (filtered_docs, grader_calls_skipped, answer or None, wasted_tokens)
+    """
+    partial = []
+
+    async def generate():
+        async for chunk in question_answerer.astream({"documents": documents, "question": question, "history": history}):
+            partial.append(chunk)
+        return "".join(partial)
+
+    async def grade(document):
+        if document.id is not None and document.id in accepted_ids:
+            return True, False
+        decision = score_gate(document, score_thresholds)
+        if decision is not None:
+            return decision == "accept", True
+        score = await grader.ainvoke({"question": question, "document": document.page_content})
+        print(f"Grader output for document: {score}")
+        return score.lower() in ["yes", "true", "1"], False
+
+    generation = asyncio.create_task(generate())
+    try:
+        results = await asyncio.gather(*(grade(d) for d in documents))
+    except BaseException:
+        generation.cancel()
+        raise
+    filtered_docs = [d for d, (keep, _) in zip(documents, results) if keep]
+    grader_calls_skipped = sum(1 for _, skipped in results if skipped)
+
+    if len(filtered_docs) == len(documents):
+        try:
+            return filtered_docs, grader_calls_skipped, await generation, 0
+        except Exception as e:
+            print(f"⚠️ Speculative answer failed, answering again: {e}")
+            metrics.incr("speculation.errors")
+    else:
+        # Grading disagreed: abort the in-flight generation
+        generation.cancel()
+        try:
+            await generation
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Failed before it could be cancelled
+            print(f"⚠️ Speculative answer failed: {e}")
+            metrics.incr("speculation.errors")
+    wasted_tokens = estimate_tokens(str(documents) + question + history) + estimate_tokens("".join(partial))
+    return filtered_docs, grader_calls_skipped, None, wasted_tokens
+
+
+def speculative_grade_and_answer(state, llm, retrieval_grader, create_question_answerer, score_thresholds=None):
+    """
+    Grade retrieved documents while speculatively answering from all of them.
+
+    If grading keeps every document the speculative answer is used as is.
+    Otherwise it is cancelled, and answering reruns on the filtered documents.
+    """
+    question = state.get("question", "")
+    documents = state["documents"]
+    history = state.get("history", "")
+    steps = ["speculative_grade_and_answer"]
+
+    filtered_docs, grader_calls_skipped, answer, wasted_tokens = run_coroutine(_speculate(
+        question, documents, history,
+        create_question_answerer(llm), retrieval_grader(llm), score_thresholds, _reused_ids(state),
+    ))
+
+    metrics.incr("speculation.attempts")
+    if answer is not None:
+        metrics.incr("speculation.hits")
+        steps.append("generate_answer")
+    else:
+        metrics.incr("speculation.misses")
+        metrics.incr("speculation.wasted_tokens", wasted_tokens)
+    metrics.set("speculation.hit_rate", metrics.ratio("speculation.hits", "speculation.attempts"))
+    print(f"Speculation {'hit' if answer is not None else 'miss'}: kept {len(filtered_docs)} of {len(documents)} documents")
+
+    update = {
         "selected_documents": filtered_docs,
         "question": question,
         "steps": steps,
+        "grader_calls_skipped": state.get("grader_calls_skipped", 0) + grader_calls_skipped,
+        "speculative_answer_accepted": answer is not None,
     }
+    if answer is not None:
+        update["answer"] = answer
+    elif filtered_docs:
+        # Regenerate from the documents that passed grading only
+        update["documents"] = filtered_docs
+    return update
 
 
-def grade_answer_v_documents(state,llm,create_hallucination_checker ):
+def speculation_outcome(state):
+    if state.get("speculative_answer_accepted"):
+        return "Speculative answer accepted"
+    return related_documents_count(state)
+
+
+def grade_answer_v_documents(state,llm,create_hallucination_checker, grounding_scorer=None):
     """
     Determines whether the generation is grounded in the document and answers the question.
+    A local grounding pre-check decides clear cases without calling the LLM.
+
+    An answer drawn only from reused session documents is not regenerated from
+    them when it fails: the question goes to retrieval instead.
+
+    Returns:
+        dict: answer_verdict ("No hallucinations", "Hallucinations" or
+        "Retrieve documents") and the steps taken, routed on by answer_outcome.
     """
     print("---CHECK HALLUCINATIONS---")
     answer = state.get("answer","")
     documents = state['selected_documents']
-    steps = state["steps"]
-    
+    steps = ["Check for hallucinations"]
     
-    steps.append("Check for hallucinations")
-    hallucination_grader = create_hallucination_checker(llm)
-    # Grading hallucinations
-    score = hallucination_grader.invoke(
-        {"answer": answer, "documents": documents}
+    # Joined only when a scorer needs it: reading page_content loads each handle's text
+    local_verdict = precheck_grounding(
+        grounding_scorer, answer or "", lambda: "\n\n".join(d.page_content for d in documents), state.get("steps", [])
     )
-    
+    if local_verdict == "fail":
+        steps.append("local_grounding_fail")
+    if local_verdict == "pass":
+        print("---no hallucinations (local check)---")
+        verdict = "No hallucinations"
+    elif local_verdict == "fail":
+        print("---Found hallucinations (local check)---")
+        verdict = "Hallucinations"
+    else:
+        hallucination_grader = create_hallucination_checker(llm)
+        # Grading hallucinations
+        score = hallucination_grader.invoke(
+            {"answer": answer, "documents": documents}
+        )
+        if score == "yes":
+            print("---Found hallucinations---")
+            verdict = "Hallucinations"
+        else:
+            print("---no hallucinations---")
+            verdict = "No hallucinations"
 
-    # Check hallucination
-    if score == "yes":
-        print("---Found hallucinations---")
-        return "Hallucinations"
-        
-    if score == "no":
-        print("---no hallucinations---")
-        return "No hallucinations"
-    
+    if verdict == "Hallucinations" and not state.get("retrieved"):
+        steps.append("retrieve_after_session_hallucination")
+        verdict = "Retrieve documents"
+    return {"answer_verdict": verdict, "steps": steps}
+
+
+def answer_outcome(state):
+    """Route on the verdict of grade_answer_v_documents."""
+    return state["answer_verdict"]
 
 
 def transform_query(state,llm, create_question_rewriter):
@@ -94,15 +336,12 @@ def transform_query(state,llm, create_question_rewriter):
 
     print("---TRANSFORM QUERY---")
     question = state["question"]
-    
-    steps = state["steps"]
-    steps.append("question_transformation")
 
     # Re-write question
     question_rewriter =  create_question_rewriter(llm)
     updated_question = question_rewriter.invoke({"question": question})
     print(f" Transformed question:  {updated_question}")
-    return { "question": updated_question} 
+    return {"question": updated_question, "steps": ["question_transformation"]}
 
 
 
@@ -115,15 +354,84 @@ def retrieve(state , retriever):
     Returns:
         state (dict): New key added to state, documents, that contains retrieved documents
     """
-    steps = state["steps"]
     question = state["question"]
 
-    
-   
-    documents = retriever.invoke(question)
-    
-    steps.append("retrieve_documents")
-    return {"documents": documents, "question": question, "steps": steps}
+    # Summary-stage hits carry the summary, not the article text, and stay Documents until expanded
+    document_store = get_document_store()
+    documents = [d if "doc_id" in d.metadata else document_store.wrap(d) for d in retriever.invoke(question, **_recency(state))]
+    return {"documents": _merge_reused(state, documents), "question": question,
+            "steps": ["retrieve_documents"], "retrieved": True}
+
+
+def _recency(state):
+    """Retriever arguments limiting the search to recent articles, when the question asks for it."""
+    max_age_days = state.get("max_age_days")
+    return {"max_age_days": max_age_days} if max_age_days else {}
+
+
+def _parse_queries(text, question, count):
+    """Paraphrases from the expander output, without numbering, blanks or repeats of the question."""
+    queries = []
+    seen = {question.strip().lower()}
+    for line in text.splitlines():
+        query = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip('"')
+        if query and query.lower() not in seen:
+            seen.add(query.lower())
+            queries.append(query)
+    return queries[:count]
+
+
+def multi_query_retrieve(state, retriever, llm, create_query_expander, num_queries=3, max_documents=None):
+    """
+    Retrieve with the question and num_queries LLM paraphrases of it.
+
+    The question is searched while the paraphrases are generated, the
+    paraphrases are embedded in one batch and searched concurrently, and all
+    result lists are fused with reciprocal rank fusion.
+
+    Args:
+        state (dict): The current graph state
+        retriever: Retriever with retrieve_many (InstructRetriever); plain retrievers use batch.
+        num_queries (int): Paraphrases to generate.
+        max_documents (int, optional): Fused documents passed on to grading.
+            Defaults to twice the hits of the question alone.
+    Returns:
+        state (dict): documents key with the fused documents
+    """
+    question = state["question"]
+    query_expander = create_query_expander(llm)
+
+    def retrieve_many(queries):
+        if hasattr(retriever, "retrieve_many"):
+            return retriever.retrieve_many(queries, **_recency(state))
+        return retriever.batch(queries, **_recency(state))
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        original = pool.submit(retrieve_many, [question])
+        try:
+            paraphrases = _parse_queries(query_expander.invoke({"question": question, "count": num_queries}), question, num_queries)
+        except Exception as e:
+            # The question's own results are still good enough to grade
+            print(f"⚠️ Query expansion failed, retrieving with the question only: {e}")
+            paraphrases = []
+        result_lists = original.result()
+
+    if paraphrases:
+        print(f"🔀 Multi-query retrieval with {len(paraphrases)} paraphrases: {paraphrases}")
+        result_lists += retrieve_many(paraphrases)
+    fused = reciprocal_rank_fusion(result_lists)
+    if max_documents is None:
+        max_documents = 2 * len(result_lists[0])
+    metrics.incr("multi_query.queries", len(result_lists))
+    metrics.incr("multi_query.candidates", sum(len(results) for results in result_lists))
+    metrics.incr("multi_query.unique_documents", len(fused))
+
+    # Summary-stage hits carry the summary, not the article text, and stay Documents until expanded
+    document_store = get_document_store()
+    documents = [d if "doc_id" in d.metadata else document_store.wrap(d) for d in fused[:max_documents]]
+
+    return {"documents": _merge_reused(state, documents), "question": question,
+            "steps": [f"multi_query_retrieve_{len(result_lists)}_queries"], "retrieved": True}
 
 
 
@@ -133,23 +441,95 @@ def question_answering(state,llm,create_question_answerer):
     """
     question = state.get("question","")
     documents = state["documents"]
+    history = state.get("history", "")
     question_answerer =  create_question_answerer(llm)
-    answer = question_answerer.invoke({"documents": documents, "question": question})
-    steps = state["steps"]
-    steps.append("generate_answer")
-    
+    answer = question_answerer.invoke({"documents": documents, "question": question, "history": history})
         
     return {
-        "documents": documents,
-        "question": question,
         "answer": answer,
-        "steps": steps,
+        "steps": ["generate_answer"],
     }
 
 
+def _split_chunks(text, chunk_chars):
+    """Split text into chunks of about chunk_chars characters on paragraph boundaries."""
+    chunks, current = [], ""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def expand_documents(state, vectorstore, drill_down="chunks", max_chunks=3, chunk_chars=1500):
+    """
+    Second stage of summary-first retrieval: replace the summaries that passed
+    grading with their full articles, or with the article chunks closest to
+    the question when drill_down is "chunks".
+
+    Args:
+        vectorstore: The main store holding the full articles.
+        max_chunks: Chunks kept per article in "chunks" mode.
+    """
+    question = state.get("question", "")
+
+    selected = state.get("selected_documents", [])
+    summaries = {d.metadata["doc_id"]: d for d in selected if "doc_id" in d.metadata}
+    if not summaries:
+        return {"steps": ["expand_documents"]}
+    # Reused session documents are already full articles or chunks
+    articles_kept = [d for d in selected if "doc_id" not in d.metadata]
+
+    articles = {doc.id: doc for doc in vectorstore.get_by_ids(list(summaries))}
+    question_vector = None
+    expanded = []
+    for doc_id, summary in summaries.items():
+        article = articles.get(doc_id)
+        if article is None:
+            # Deleted since its summary was indexed
+            continue
+        text = article.page_content
+        chunks = _split_chunks(text, chunk_chars)
+        if drill_down == "chunks" and len(chunks) > max_chunks:
+            if question_vector is None:
+                question_vector = np.asarray(vectorstore.embeddings.embed_query(get_detailed_instruct(DRILL_DOWN_TASK, question)))
+            similarity = np.asarray(vectorstore.embeddings.embed_documents(chunks)) @ question_vector
+            best = sorted(np.argsort(similarity)[::-1][:max_chunks])
+            text = "\n\n".join(chunks[i] for i in best)
+        metrics.incr("two_stage.article_tokens", estimate_tokens(article.page_content))
+        metrics.incr("two_stage.context_tokens", estimate_tokens(text))
+        metadata = {**article.metadata, "score": summary.metadata.get("score")}
+        # Full text stays backed by the vectorstore; selected chunks get their own handle
+        if text is article.page_content:
+            expanded.append(DocumentHandle(doc_id, metadata, text))
+        else:
+            expanded.append(get_document_store().put(text, metadata))
+
+    print(f"Expanded {len(expanded)} graded summaries to {drill_down}")
+    expanded = articles_kept + expanded
+    return {"documents": expanded, "selected_documents": expanded, "steps": ["expand_documents"]}
+
+
 def related_documents_count(state):
     selected_documents = state.get("selected_documents")
     if len(selected_documents) > 0 :
         return  "Are related documents"
     else:
-        return  "No related documents"
\ No newline at end of file
+        return  "No related documents"
+
+
+def session_context_available(state):
+    """
+    Route follow-up questions whose session holds previously relevant documents
+    to grading those against the new question, before any retrieval.
+    """
+    if state.get("session_documents"):
+        return "Grade session documents"
+    else:
+        return "Retrieve documents"
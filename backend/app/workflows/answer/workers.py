@@ -48,11 +48,12 @@ def create_question_answerer(llm):
     prompt = PromptTemplate(
         template="""You are an assistant for question-answering tasks. 
         You have to answer to the question: {question} only using these documents {documents}
+        Earlier conversation with the user, use it only to resolve what the question refers to: {history}
         Do not repeat yourself!
         Be informative and concise.
         Use only given documents!
         """,
-        input_variables=["question", "documents"],
+        input_variables=["question", "documents", "history"],
     )
 
     
@@ -116,4 +117,31 @@ def create_hallucination_checker(llm):
     hallucination_grader = prompt | llm |  StrOutputParser()
 
     # Return the hallucination checker object
-    return hallucination_grader
\ No newline at end of file
+    return hallucination_grader
+
+def create_query_expander(llm):
+    """
+    Function to create a query expander object using a passed LLM model.
+    
+    Args:
+        llm: The language model to be used for paraphrasing questions.
+        
+    Returns:
+        Callable: A pipeline function that writes alternative search queries, one per line.
+    """
+    
+    # Define the prompt template for query paraphrasing
+    expand_prompt = PromptTemplate(
+        template="""You are a search query writer for a news article vector store.\n
+        Write {count} different versions of the question below, each phrased differently or focusing on another aspect, so together they find more relevant articles.\n
+        Return only the questions, one per line, no numbering, preamble or explanation.
+        Here is the initial question: \n\n {question}.
+        """,
+        input_variables=["question", "count"],
+    )
+    
+    # Combine the prompt with the LLM and output parser
+    query_expander = expand_prompt | llm | StrOutputParser()
+
+    # Return the query expander object
+    return query_expander
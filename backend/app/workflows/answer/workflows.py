@@ -1,14 +1,16 @@
 import os
+import json
+import operator
 from langchain_core.retrievers import BaseRetriever
 from typing_extensions import TypedDict, List, Annotated
 from typing import Optional
 from langgraph.graph import  END, StateGraph
 import datetime
 import uuid
-from langchain_groq import ChatGroq
+from ...llm_gateway import get_llm_gateway
 import os
-from .nodes import initialize_workflow, retrieve, question_answering, grade_documents, transform_query ,related_documents_count, grade_answer_v_documents
-from .workers import create_question_answerer, retrieval_grader, create_question_rewriter, create_hallucination_checker
+from .nodes import initialize_workflow, retrieve, question_answering, grade_documents, transform_query ,related_documents_count, grade_answer_v_documents, session_context_available, speculative_grade_and_answer, speculation_outcome, expand_documents, multi_query_retrieve, grade_session_documents, session_documents_sufficient, answer_outcome
+from .workers import create_question_answerer, retrieval_grader, create_question_rewriter, create_hallucination_checker, create_query_expander
 
 
 
@@ -22,15 +24,110 @@ GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
 SERPER_API_KEY = os.environ.get('SERPER_API_KEY')
 EXA_API_KEY = os.environ.get('EXA_API_KEY')
 
+# Similarity-score gating for the retrieval grader. Documents scoring at or above
+# the accept threshold are kept, at or below the reject threshold are dropped,
+# and only the band in between is sent to the LLM grader.
+GRADE_ACCEPT_SCORE = os.environ.get('GRADE_ACCEPT_SCORE')
+GRADE_REJECT_SCORE = os.environ.get('GRADE_REJECT_SCORE')
+# Per-language calibration, e.g. '{"lt": [0.88, 0.72], "en": [0.9, 0.75]}'
+GRADE_SCORE_THRESHOLDS = os.environ.get('GRADE_SCORE_THRESHOLDS')
 
+# Start answering while documents are still being graded
+SPECULATIVE_ANSWERS = os.environ.get('SPECULATIVE_ANSWERS', 'false').lower() == 'true'
 
-def question_answering_graph(retriever):
+# Concurrent LLM grader calls per question
+GRADER_MAX_CONCURRENCY = int(os.environ.get('GRADER_MAX_CONCURRENCY', '4'))
+# Two-stage retrieval drill-down: "chunks" (most relevant chunks) or "full" (whole article)
+DRILL_DOWN = os.environ.get('DRILL_DOWN', 'chunks')
+DRILL_DOWN_CHUNKS = int(os.environ.get('DRILL_DOWN_CHUNKS', '3'))
+# Up-front multi-query retrieval: paraphrases searched concurrently and fused with RRF
+MULTI_QUERY = os.environ.get('MULTI_QUERY', 'false').lower() == 'true'
+MULTI_QUERY_COUNT = int(os.environ.get('MULTI_QUERY_COUNT', '3'))
+# Fused documents sent to grading, defaults to twice the hits of a single query
+MULTI_QUERY_MAX_DOCUMENTS = int(os.environ['MULTI_QUERY_MAX_DOCUMENTS']) if os.environ.get('MULTI_QUERY_MAX_DOCUMENTS') else None
+# Follow-ups answer from their session's documents only when this many still pass grading
+SESSION_MIN_RELEVANT_DOCUMENTS = int(os.environ.get('SESSION_MIN_RELEVANT_DOCUMENTS', '2'))
+
+
+def _threshold(setting: str, value):
+    """One accept or reject score: None, or a number between 0 and 1."""
+    if value is None or value == "":
+        return None
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{setting}: score threshold must be a number, got {value!r}") from None
+    if not 0.0 <= score <= 1.0:
+        raise ValueError(f"{setting}: score threshold must be between 0 and 1, got {score}")
+    return score
+
+
+def _threshold_pair(setting: str, accept, reject) -> tuple:
+    accept, reject = _threshold(setting, accept), _threshold(setting, reject)
+    if accept is not None and reject is not None and accept <= reject:
+        raise ValueError(f"{setting}: accept threshold {accept} must be above reject threshold {reject}")
+    return accept, reject
+
+
+def load_score_thresholds():
+    """
+    Build the score gate thresholds from the environment.
+
+    Returns:
+        dict: Language code (or "default") -> (accept, reject) pair. Empty when gating is disabled.
+
+    Raises:
+        ValueError: A threshold is not a number between 0 and 1, an accept
+            threshold is not above its reject threshold, or
+            GRADE_SCORE_THRESHOLDS is not a JSON object of [accept, reject] pairs.
+    """
+    thresholds = {}
+    if GRADE_ACCEPT_SCORE or GRADE_REJECT_SCORE:
+        thresholds["default"] = _threshold_pair("GRADE_ACCEPT_SCORE/GRADE_REJECT_SCORE",
+                                                GRADE_ACCEPT_SCORE, GRADE_REJECT_SCORE)
+    if GRADE_SCORE_THRESHOLDS:
+        try:
+            overrides = json.loads(GRADE_SCORE_THRESHOLDS)
+        except ValueError as e:
+            raise ValueError(f"GRADE_SCORE_THRESHOLDS is not valid JSON: {e}") from None
+        if not isinstance(overrides, dict):
+            raise ValueError('GRADE_SCORE_THRESHOLDS must be a JSON object, e.g. {"lt": [0.88, 0.72]}')
+        for language, pair in overrides.items():
+            if not isinstance(pair, list) or len(pair) != 2:
+                raise ValueError(f"GRADE_SCORE_THRESHOLDS[{language!r}] must be an [accept, reject] pair, got {pair!r}")
+            thresholds[language] = _threshold_pair(f"GRADE_SCORE_THRESHOLDS[{language!r}]", *pair)
+    return thresholds
+
+
+def question_answering_graph(retriever, score_thresholds=None, speculative=None, grounding_scorer=None,
+                             drill_down_vectorstore=None, multi_query=None):
     """
     Builds the scrape/search workflow graph.
 
     Args:
         retriever: The retriever used to fetch documents.
+        score_thresholds (dict, optional): Score gate thresholds for grading.
+            Defaults to the values configured in the environment.
+        speculative (bool, optional): Overlap answer generation with grading.
+            Defaults to SPECULATIVE_ANSWERS.
+        grounding_scorer (GroundingScorer, optional): Local pre-check run before
+            the LLM hallucination grader.
+        drill_down_vectorstore (optional): Enables two-stage retrieval. The
+            retriever then returns article summaries, which are graded and the
+            passing ones expanded from this store before answering.
+        multi_query (bool, optional): Retrieve with LLM paraphrases of the
+            question as well, fused with reciprocal rank fusion. Defaults to MULTI_QUERY.
     """
+    if score_thresholds is None:
+        score_thresholds = load_score_thresholds()
+    if speculative is None:
+        speculative = SPECULATIVE_ANSWERS
+    if multi_query is None:
+        multi_query = MULTI_QUERY
+    # Speculating on summaries would answer from the wrong context
+    two_stage = drill_down_vectorstore is not None
+    if two_stage:
+        speculative = False
 
     from typing import TypedDict, List
 
@@ -46,22 +143,38 @@ def question_answering_graph(retriever):
             search_type: type of search strategy
             k: number of top documents retrieved
             selected_documents: selected documents for answering
+            grader_calls_skipped: LLM grader calls avoided by the score gate
+            history: recent conversation turns of the session
+            speculative_answer_accepted: whether the speculative answer was kept
+            max_age_days: only retrieve articles ingested in this many days
+            session_documents: documents found relevant earlier in the session
+            reused_documents: session documents graded relevant to this question
+            retrieved: whether retrieval ran in this run
+            answer_verdict: outcome of the last hallucination check
         """
         question: str
         answer: str
         documents: List[str]
-        steps: List[str]
+        steps: Annotated[List[str], operator.add]
         generation_count: int
         search_type: str
         k: int
         selected_documents: str
+        grader_calls_skipped: int
+        history: str
+        speculative_answer_accepted: bool
+        max_age_days: int
+        session_documents: List[str]
+        reused_documents: List[str]
+        retrieved: bool
+        answer_verdict: str
 
-    llm = ChatGroq(
+    # Interactive priority: answers are served before background ingest
+    llm = get_llm_gateway().chat_model(
+        priority="interactive",
         model="meta-llama/llama-4-maverick-17b-128e-instruct",  
         temperature=0.0,
         max_tokens=4000,
-        max_retries=3,
-        
     )
 
     # Graph
@@ -69,33 +182,78 @@ def question_answering_graph(retriever):
 
     # --- Nodes ---
     workflow.add_node("initialize_workflow", lambda state: initialize_workflow(state))
-    workflow.add_node("retrieve_documents", lambda state: retrieve(state, retriever))
+    if multi_query:
+        workflow.add_node("retrieve_documents", lambda state: multi_query_retrieve(
+            state, retriever, llm, create_query_expander,
+            num_queries=MULTI_QUERY_COUNT, max_documents=MULTI_QUERY_MAX_DOCUMENTS,
+        ))
+    else:
+        workflow.add_node("retrieve_documents", lambda state: retrieve(state, retriever))
     workflow.add_node( "question_answering",lambda state: question_answering(state,llm,create_question_answerer))
-    workflow.add_node("grade_documents", lambda state: grade_documents(state ,llm, retrieval_grader))
+    workflow.add_node("grade_session_documents", lambda state: grade_session_documents(state, llm, retrieval_grader, score_thresholds, GRADER_MAX_CONCURRENCY))
+    if speculative:
+        workflow.add_node("grade_documents", lambda state: speculative_grade_and_answer(state, llm, retrieval_grader, create_question_answerer, score_thresholds))
+    else:
+        workflow.add_node("grade_documents", lambda state: grade_documents(state ,llm, retrieval_grader, score_thresholds, GRADER_MAX_CONCURRENCY))
+    workflow.add_node("check_answer", lambda state: grade_answer_v_documents(state, llm, create_hallucination_checker, grounding_scorer))
     workflow.add_node("transform_query", lambda state: transform_query(state,llm, create_question_rewriter))
+    if two_stage:
+        workflow.add_node("expand_documents", lambda state: expand_documents(
+            state, drill_down_vectorstore, drill_down=DRILL_DOWN, max_chunks=DRILL_DOWN_CHUNKS,
+        ))
 
     # --- Graph structure ---
     workflow.set_entry_point("initialize_workflow")
 
-    workflow.add_edge("initialize_workflow", "retrieve_documents")
-    workflow.add_edge("retrieve_documents", "grade_documents")
-
     workflow.add_conditional_edges(
-        "grade_documents",
-        lambda state: related_documents_count(state),
+        "initialize_workflow",
+        lambda state: session_context_available(state),
+        {
+            "Grade session documents": "grade_session_documents",
+            "Retrieve documents": "retrieve_documents",
+        },
+    )
+    workflow.add_conditional_edges(
+        "grade_session_documents",
+        lambda state: session_documents_sufficient(state, SESSION_MIN_RELEVANT_DOCUMENTS),
         {
-            "Are related documents": "question_answering",
-            "No related documents": "transform_query",
+            "Answer from session documents": "question_answering",
+            "Retrieve documents": "retrieve_documents",
         },
     )
+    workflow.add_edge("retrieve_documents", "grade_documents")
+
+    if speculative:
+        workflow.add_conditional_edges(
+            "grade_documents",
+            lambda state: speculation_outcome(state),
+            {
+                "Speculative answer accepted": "check_answer",
+                "Are related documents": "question_answering",
+                "No related documents": "transform_query",
+            },
+        )
+    else:
+        workflow.add_conditional_edges(
+            "grade_documents",
+            lambda state: related_documents_count(state),
+            {
+                "Are related documents": "expand_documents" if two_stage else "question_answering",
+                "No related documents": "transform_query",
+            },
+        )
+        if two_stage:
+            workflow.add_edge("expand_documents", "question_answering")
 
     workflow.add_edge("transform_query", "retrieve_documents")
 
+    workflow.add_edge("question_answering", "check_answer")
     workflow.add_conditional_edges(
-        "question_answering",
-        lambda state: grade_answer_v_documents(state, llm, create_hallucination_checker),
+        "check_answer",
+        lambda state: answer_outcome(state),
         {
             "Hallucinations": "question_answering",
+            "Retrieve documents": "retrieve_documents",
             "No hallucinations": END,
         },
     )
@@ -1,44 +1,120 @@
-from .workers import create_article_summarizer, create_topics_identifier
+from .workers import create_article_summarizer, create_topics_identifier, create_chunk_summarizer
+from langchain_core.runnables import RunnableParallel
 from langchain_core.documents import Document
 from uuid import uuid4
-from langchain_community.document_loaders import NewsURLLoader
+import re
+import time
+from .tools import get_extraction_engine
+from ...grounding import precheck_grounding, SENTENCE_PATTERN
+from ...metrics import estimate_tokens
+from ...topics import parse_topics
+from ...services import summary_metadata
+from ...documents import DocumentHandle, get_document_store
 
 
-def grade_summary_v_article(state,llm,create_hallucination_checker ):
+# Words long enough to tell which part of an article a sentence comes from
+CLAIM_WORD_PATTERN = re.compile(r"\w{4,}")
+
+
+def claims_by_chunk(summary, chunks):
+    """
+    Group summary sentences by the article chunk sharing the most words with
+    each, i.e. the text each claim most likely comes from.
+
+    Returns:
+        dict: Chunk index -> list of summary sentences.
+    """
+    chunk_words = [set(CLAIM_WORD_PATTERN.findall(chunk.lower())) for chunk in chunks]
+    claims = {}
+    for sentence in SENTENCE_PATTERN.split(summary.strip()):
+        words = set(CLAIM_WORD_PATTERN.findall(sentence.lower()))
+        if not words or not chunks:
+            continue
+        best = max(range(len(chunks)), key=lambda index: len(words & chunk_words[index]))
+        claims.setdefault(best, []).append(sentence)
+    return claims
+
+
+def grade_summary_v_article(state,llm,create_hallucination_checker, grounding_scorer=None,
+                            chunk_tokens=3000, max_concurrency=4):
     """
     Determines whether the generation is grounded in the document and answers the question.
+    A local grounding pre-check decides clear cases without calling the LLM.
+    Summaries reduced from chunk summaries are checked against the article
+    itself, not the chunk summaries, so mistakes of the map step are caught:
+    each summary sentence is graded against the article chunk it most likely
+    comes from, one LLM call per chunk, so long articles are never sent whole.
+    The chunks whose claims fail lose their chunk summary, and only those are
+    summarized again on the retry.
+
+    Returns:
+        dict: summary_verdict ("No hallucinations" or "Hallucinations") and the
+        steps taken, routed on by summary_outcome.
     """
     print("---CHECK HALLUCINATIONS---")
     # selected_document is a list of Document objects
     documents = state["selected_document"]
     article_text = documents[0].page_content if documents else ""
     
-    steps = state["steps"]
+    steps = ["Check for hallucinations"]
     summary = state.get("summary")
+    chunk_summaries = state.get("chunk_summaries")
     
-    steps.append("Check for hallucinations")
+    local_verdict = precheck_grounding(grounding_scorer, summary or "", article_text, state.get("steps", []))
+    if local_verdict == "pass":
+        print("---no hallucinations (local check)---")
+        return {"summary_verdict": "No hallucinations", "steps": steps}
+    if local_verdict == "fail":
+        print("---Found hallucinations (local check)---")
+        return {"summary_verdict": "Hallucinations", "steps": steps + ["local_grounding_fail"]}
+
     hallucination_grader = create_hallucination_checker(llm)
+    if chunk_summaries:
+        chunks = split_article(article_text, chunk_tokens)
+        claims = claims_by_chunk(summary or "", chunks)
+        indices = sorted(claims)
+        scores = hallucination_grader.batch(
+            [{"article": chunks[index], "summary": " ".join(claims[index])} for index in indices],
+            config={"max_concurrency": max_concurrency},
+        )
+        failed = {index for index, score in zip(indices, scores) if score == "yes"}
+        if not failed:
+            print("---no hallucinations---")
+            return {"summary_verdict": "No hallucinations", "steps": steps}
+        print(f"---Found hallucinations in claims from {len(failed)} of {len(chunks)} chunks---")
+        update = {"summary_verdict": "Hallucinations", "steps": steps}
+        if len(chunk_summaries) == len(chunks):
+            update["chunk_summaries"] = [None if index in failed else chunk_summary
+                                         for index, chunk_summary in enumerate(chunk_summaries)]
+        return update
+
     # Grading hallucinations
-    score = hallucination_grader.invoke(
-        {"article": article_text, "summary": summary}
-    )
+    score = hallucination_grader.invoke({"article": article_text, "summary": summary})
     
 
     # Check hallucination
     if score == "yes":
         print("---Found hallucinations---")
-        return "Hallucinations"
+        return {"summary_verdict": "Hallucinations", "steps": steps}
         
-    if score == "no":
-        print("---no hallucinations---")
-        return "No hallucinations"
+    print("---no hallucinations---")
+    return {"summary_verdict": "No hallucinations", "steps": steps}
+
 
+def summary_outcome(state):
+    """Route on the verdict of grade_summary_v_article."""
+    return state["summary_verdict"]
 
 
-def add_to_chroma(state,vectorstore):
+
+def add_to_chroma(state,vectorstore,topic_index=None,duplicate_index=None,summary_vectorstore=None):
     """
     Adds the article to Chroma using vectorstore from state.
     Stores title, source, topics, summary in metadata, and article text as page_content.
+    Topics are normalized first and, with a topic_index, indexed under the new document id.
+    With a duplicate_index the article becomes the canonical copy for later near-duplicates.
+    With a summary_vectorstore the summary is embedded there too, for two-stage retrieval.
+    The article keeps the id of its handle, so later reads load it from the vectorstore.
     """
 
     
@@ -49,9 +125,7 @@ def add_to_chroma(state,vectorstore):
     article = documents[0]  # Get the first (and only) document from the list
 
     summary = state.get("summary", "")
-    topics = state.get("topics", [])
-    steps = state.get("steps", [])
-    steps.append("add_to_chroma")
+    topics = parse_topics(state.get("topics", []))
 
     article_text = article.page_content  # ← Use .page_content, not .get("text")
     article_title = article.metadata.get("title", "Untitled")  # ← Access metadata
@@ -68,50 +142,117 @@ def add_to_chroma(state,vectorstore):
         "title": article_title,
         "link": article_link,
         "summary": summary,
-        "topics": ", ".join(topics) if isinstance(topics, list) else str(topics),
+        "topics": ", ".join(topics),
         "language": article_language,
-        "authors": ", ".join(article_authors) if isinstance(topics, list) else str(article_authors), 
+        "authors": ", ".join(article_authors) if isinstance(article_authors, list) else str(article_authors), 
+        "publish_date": str(article.metadata.get("publish_date") or ""),
+        "ingested_at": time.time(),
     }
 )
 
     # Add to Chroma
-    doc_id = str(uuid4())
+    doc_id = getattr(article, "id", None) or str(uuid4())
     vectorstore.add_documents(documents=[doc], ids=[doc_id])
+    get_document_store().stored(doc_id)
+    if topic_index is not None:
+        topic_index.add(doc_id, topics, doc.metadata)
+    if duplicate_index is not None:
+        duplicate_index.add(doc_id, article_text, doc.metadata)
+    if summary_vectorstore is not None and summary:
+        summary_vectorstore.add_texts([summary], metadatas=[summary_metadata(doc_id, doc.metadata)], ids=[doc_id])
     
 
     print(f"✅ Document added to Chroma: {doc_id}")
 
     # Update state
     return {
-        **state,
-        "documents": state.get("documents", []) + [doc],
-        "steps": steps
+        "documents": state.get("documents", []) + [DocumentHandle(doc_id, doc.metadata)],
+        "steps": ["add_to_chroma"]
     }
 
 
 
 
-def summarize_article(state, llm, create_article_summarizer,create_topics_identifier):
+def split_article(article_text, chunk_tokens):
+    """
+    Split an article into chunks of about chunk_tokens tokens on paragraph boundaries.
+    Paragraphs longer than a chunk are cut on sentence boundaries.
+    """
+    chunk_chars = chunk_tokens * 4
+    pieces = []
+    for paragraph in article_text.split("\n"):
+        if len(paragraph) <= chunk_chars:
+            pieces.append(paragraph)
+            continue
+        sentences = paragraph.replace(". ", ".\n").split("\n")
+        pieces.extend(sentence[i:i + chunk_chars] for sentence in sentences for i in range(0, len(sentence), chunk_chars))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{piece}" if current else piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def summarize_article(state, llm, create_article_summarizer,create_topics_identifier,
+                      map_reduce_tokens=6000, chunk_tokens=3000, max_concurrency=4):
     """
     Summarize the article and extract main topics using the structured summarizer.
+
+    Articles longer than map_reduce_tokens are split into chunks that are
+    summarized concurrently; the summary and topics are then produced from the
+    chunk summaries, so latency stays roughly flat with article length. A
+    retry after a failed hallucination check reuses the chunk summaries and
+    only summarizes again the chunks the check dropped (None entries), before
+    repeating the reduce step.
     """
 
     # Extract from state - selected_document is a list of Document objects
     documents = state["selected_document"]
     article_text = documents[0].page_content if documents else ""
     
-    steps = state["steps"]
-
-    
-    steps.append("summarize_article")
+    steps = ["summarize_article"]
 
     # Create the summarization pipeline
     summarizer = create_article_summarizer(llm)
     topics_identifier = create_topics_identifier(llm)
 
-    
-    summary = summarizer.invoke({"article": article_text})
-    topics =  topics_identifier.invoke({"article": article_text})
+    chunk_summaries = state.get("chunk_summaries")
+    article_tokens = estimate_tokens(article_text)
+    if chunk_summaries or article_tokens > map_reduce_tokens:
+        chunks = split_article(article_text, chunk_tokens)
+        chunk_summaries = list(chunk_summaries or [None] * len(chunks))
+        missing = [index for index, chunk_summary in enumerate(chunk_summaries) if chunk_summary is None]
+        if len(missing) < len(chunk_summaries):
+            print(f"♻️ Reusing {len(chunk_summaries) - len(missing)} chunk summaries")
+            steps.append("reuse_chunk_summaries")
+        else:
+            print(f"📚 Long article ({article_tokens} tokens), summarizing {len(chunks)} chunks")
+        if missing:
+            # Map: summarize chunks concurrently
+            chunk_summarizer = create_chunk_summarizer(llm)
+            mapped = chunk_summarizer.batch(
+                [{"article": chunks[index]} for index in missing],
+                config={"max_concurrency": max_concurrency},
+            )
+            for index, chunk_summary in zip(missing, mapped):
+                chunk_summaries[index] = chunk_summary
+            steps.append(f"map_summarize_{len(missing)}_chunks")
+
+    if chunk_summaries:
+        # Reduce: final summary and topics from the chunk summaries, in parallel
+        reduced = RunnableParallel(summary=summarizer, topics=topics_identifier).invoke(
+            {"article": "\n\n".join(chunk_summaries)}
+        )
+        summary = reduced["summary"]
+        topics = reduced["topics"]
+    else:
+        summary = summarizer.invoke({"article": article_text})
+        topics =  topics_identifier.invoke({"article": article_text})
 
     # Log for debugging (optional)
     print("📝 Article summarization completed.")
@@ -120,9 +261,9 @@ def summarize_article(state, llm, create_article_summarizer,create_topics_identi
 
     # Return updated state
     return {
-        **state,
         "summary": summary,
         "topics": topics,
+        "chunk_summaries": chunk_summaries,
         "steps": steps,
     }
 
@@ -137,19 +278,10 @@ def initialize_workflow(state):
     Returns:
         state (dict): Updated state with steps, topic, and websites
     """
-    # Ensure required fields exist
-    if "steps" not in state:
-        state["steps"] = []
-    if "website_address" not in state:
-        state["website_address"] = []
-
-    steps = state["steps"]
-    website_address = state.get("website_address", [])
-    
+    website_address = state.get("website_address") or []
     
     # Add initialization steps
-    steps.append("topic initialization")
-    steps.append("question_asked")
+    steps = ["topic initialization", "question_asked"]
     if website_address:
         steps.append(f"initialized with {len(website_address)} websites")
     
@@ -161,35 +293,81 @@ def initialize_workflow(state):
     }
 
 
-def scrape_webpage_content(state):
+def scrape_webpage_content(state, extraction_engine=None):
     """
     Scrapes a webpage and returns its content as part of the updated graph state.
 
     Args:
-        state (dict): The current graph state. Must contain "url".
-        scraper_tool (callable): A function that takes a URL and returns a dict
-                                 with keys: title, text, source, error.
+        state (dict): The current graph state. Must contain "website_address",
+            or an already extracted "selected_document".
+        extraction_engine (ExtractionEngine, optional): Engine used to fetch and
+            parse the page. Defaults to the shared engine from tools.
 
     Returns:
-        dict: Updated state fragment with keys: documents (list of scraped docs)
-              and error if scraping fails.
+        dict: Updated state fragment with keys: selected_document (list with a
+              handle to the scraped document), extraction_timings, and error if
+              scraping fails. The page HTML is dropped from the state.
     """
-    steps = state["steps"]
-    steps.append("web_scraping")
+    document_store = get_document_store()
+
+    # Bulk ingestion passes documents it already extracted and checkpointed
+    if state.get("selected_document"):
+        return {"selected_document": [document_store.wrap(d) for d in state["selected_document"]],
+                "steps": ["preextracted_document"]}
 
     website_address = state.get("website_address")
     if not website_address:
-        return {"error": "No URL provided."}
+        return {"error": "No URL provided.", "steps": ["web_scraping"]}
 
-    loader = NewsURLLoader(
-    urls=[website_address],
-)
-    docs = loader.load()
-    print(f"loaded document content:  {docs}")
+    extraction_engine = extraction_engine or get_extraction_engine()
+    doc = extraction_engine.extract(website_address, html=state.get("html"))
+    timings = doc.metadata.pop("timings")
+    print(f"loaded document: {doc.metadata.get('title')} ({len(doc.page_content)} chars)")
+    print(f"⏱️ Extraction timings: {timings}")
+
+    return {
+        "selected_document": [document_store.put(doc.page_content, doc.metadata)],
+        "extraction_timings": timings,
+        "html": None,
+        "steps": ["web_scraping"]
+    }
 
-    
 
+def detect_duplicate(state, duplicate_index, vectorstore):
+    """
+    Look the scraped article up in the near-duplicate index before any LLM call.
+
+    A duplicate is linked to the canonical article and gets its stored summary
+    and topics, so syndicated copies are not summarized or stored again.
+    """
+    steps = ["detect_duplicate"]
+    documents = state.get("selected_document") or []
+    if duplicate_index is None or not documents:
+        return {"duplicate_of": None, "steps": steps}
+
+    article = documents[0]
+    canonical = duplicate_index.find(article.page_content)
+    # A resumed bulk record finds its own earlier copy; store it again over itself
+    if canonical is None or canonical["id"] == article.id:
+        return {"duplicate_of": None, "steps": steps}
+
+    link = article.metadata.get("link") or state.get("website_address", "")
+    print(f"♊ Near-duplicate ({canonical['similarity']}) of {canonical['link'] or canonical['id']}")
+    duplicate_index.link_duplicate(canonical["id"], link)
+
+    stored = vectorstore.get(where={"link": canonical["link"]}, limit=1, include=["metadatas"]) if canonical["link"] else {}
+    metadata = (stored.get("metadatas") or [{}])[0] or {}
     return {
-        "selected_document": docs,
-        "steps": steps
-    }
\ No newline at end of file
+        "duplicate_of": canonical,
+        "summary": metadata.get("summary", ""),
+        "topics": parse_topics(metadata.get("topics", "")),
+        "steps": steps,
+    }
+
+
+def is_duplicate(state):
+    """Route duplicates past summarization and storage."""
+    if state.get("duplicate_of"):
+        return "Duplicate"
+    return "New article"
+
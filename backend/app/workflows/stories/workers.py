@@ -107,7 +107,35 @@ def create_article_summarizer(llm):
 
 
 
+def create_chunk_summarizer(llm):
+    """
+    Creates a summarizer for one part of a long article (the map step of map-reduce summarization).
 
+    Args:
+        llm: The language model used for summarization.
 
+    Returns:
+        Callable: A summarization pipeline that outputs the summary of an article part.
+    """
 
+    # Define the prompt template
+    prompt = PromptTemplate(
+        template="""
+        You are a professional content summarizer.
+        Read the part of a longer article provided below and:
+        1. Write a factual summary of this part (3-5 sentences).
+        Keep names, numbers and dates exactly as written.
+        Do not add anything else!
+        
+        ARTICLE PART:
+        {article}
+        """,
+        input_variables=["article"],
+    )
+
+    # Combine prompt and model into a reusable summarization pipeline
+    chunk_summarizer = prompt | llm | StrOutputParser()
+
+    # Return the ready-to-use summarizer pipeline
+    return chunk_summarizer
 
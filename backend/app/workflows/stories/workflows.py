@@ -1,4 +1,5 @@
 import os
+import operator
 from typing_extensions import TypedDict, List, Annotated
 from typing import Optional
 
@@ -6,23 +7,36 @@ from typing import Optional
 from langgraph.graph import END, StateGraph
 import datetime
 import uuid
-from langchain_groq import ChatGroq
+from ...llm_gateway import get_llm_gateway
 from typing import TypedDict, List
 
-from .nodes import initialize_workflow, scrape_webpage_content, summarize_article, add_to_chroma, grade_summary_v_article
+from .nodes import initialize_workflow, scrape_webpage_content, summarize_article, add_to_chroma, grade_summary_v_article, summary_outcome, detect_duplicate, is_duplicate
 from .workers import create_article_summarizer, create_topics_identifier,  create_hallucination_checker
 
 
+# Map-reduce summarization of long articles
+SUMMARY_MAP_REDUCE_TOKENS = int(os.environ.get('SUMMARY_MAP_REDUCE_TOKENS', '6000'))
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', '3000'))
+SUMMARY_MAX_CONCURRENCY = int(os.environ.get('SUMMARY_MAX_CONCURRENCY', '4'))
 
 
 
-def article_summarization_graph(vectorstore):
+
+
+def article_summarization_graph(vectorstore, grounding_scorer=None, topic_index=None, duplicate_index=None,
+                                summary_vectorstore=None):
     """
     Builds the scrape/search workflow graph.
 
     Args:
-        search_type (str): The type of search strategy to use.
-        k (int): Number of top documents to retrieve.
+        vectorstore: The vectorstore articles are added to.
+        grounding_scorer (GroundingScorer, optional): Local pre-check run before
+            the LLM hallucination grader.
+        topic_index (TopicIndex, optional): Index updated with each added article's topics.
+        duplicate_index (DuplicateIndex, optional): Near-duplicates found here skip
+            summarization and storage and are linked to the canonical article.
+        summary_vectorstore (optional): Store the summaries are embedded in for
+            two-stage retrieval.
     """
 
     class GraphState(TypedDict):
@@ -34,12 +48,18 @@ def article_summarization_graph(vectorstore):
             search: whether to add search
             documents: list of documents
             generations_count : generations count
+            html: pre-fetched page HTML, scraping then skips the download
+            extraction_timings: fetch/parse timing breakdown of the scraped page
+            duplicate_of: canonical article when the scraped one is a near-duplicate
+            chunk_summaries: map step output for long articles, reused by retries; None
+                marks a chunk the hallucination check sends back to the map step
+            summary_verdict: outcome of the last hallucination check
         """
         question: str
         generation: str
         search: str
         documents: List[str]
-        steps: List[str]
+        steps: Annotated[List[str], operator.add]
         generation_count: int
         search_type: str
         k: int
@@ -47,17 +67,21 @@ def article_summarization_graph(vectorstore):
         summary: str
         topics: List[str]
         selected_document: str
+        html: str
+        extraction_timings: dict
+        duplicate_of: dict
+        chunk_summaries: List[Optional[str]]
+        summary_verdict: str
 
     
     
     # LLM
-    llm = ChatGroq(
+    # Background priority: ingest yields the rate limit to interactive answers
+    llm = get_llm_gateway().chat_model(
+        priority="background",
         model="openai/gpt-oss-120b",  
         temperature=0.0,
         max_tokens=6000,
-        max_retries=3,
-        
-        
     )
     
    
@@ -69,17 +93,37 @@ def article_summarization_graph(vectorstore):
     workflow.add_node("initialize_workflow", lambda state: initialize_workflow(state))
      
     workflow.add_node("scrape_article", lambda state: scrape_webpage_content(state))
-    workflow.add_node("summarize_article", lambda state: summarize_article(state, llm, create_article_summarizer,create_topics_identifier))
-    workflow.add_node("add_to_chroma", lambda state: add_to_chroma(state,vectorstore))
+    workflow.add_node("summarize_article", lambda state: summarize_article(
+        state, llm, create_article_summarizer, create_topics_identifier,
+        map_reduce_tokens=SUMMARY_MAP_REDUCE_TOKENS,
+        chunk_tokens=SUMMARY_CHUNK_TOKENS,
+        max_concurrency=SUMMARY_MAX_CONCURRENCY,
+    ))
+    workflow.add_node("check_summary", lambda state: grade_summary_v_article(
+        state, llm, create_hallucination_checker, grounding_scorer,
+        chunk_tokens=SUMMARY_CHUNK_TOKENS,
+        max_concurrency=SUMMARY_MAX_CONCURRENCY,
+    ))
+    workflow.add_node("detect_duplicate", lambda state: detect_duplicate(state, duplicate_index, vectorstore))
+    workflow.add_node("add_to_chroma", lambda state: add_to_chroma(state,vectorstore,topic_index,duplicate_index,summary_vectorstore))
 
     # Graph structure
     workflow.set_entry_point("initialize_workflow")
 
     workflow.add_edge("initialize_workflow", "scrape_article")
-    workflow.add_edge("scrape_article", "summarize_article")
+    workflow.add_edge("scrape_article", "detect_duplicate")
+    workflow.add_conditional_edges(
+        "detect_duplicate",
+        is_duplicate,
+        {
+            "Duplicate": END,
+            "New article": "summarize_article",
+        },
+    )
+    workflow.add_edge("summarize_article", "check_summary")
     workflow.add_conditional_edges(
-        "summarize_article",
-        lambda state: grade_summary_v_article(state,llm,create_hallucination_checker),
+        "check_summary",
+        lambda state: summary_outcome(state),
         {
             "Hallucinations": "summarize_article",
             "No hallucinations": "add_to_chroma",
@@ -1,11 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uuid
 import os
 import asyncio
 from dotenv import load_dotenv
+from app.sessions import SessionStore
+from app.responses import lean_response, to_jsonable
+from app.documents import configure_document_store, document_texts_cached
+from app.admission import Overloaded, create_admission_controller
+from app.singleflight import SingleFlight, normalize_question, normalize_url
+from app import profiling
 
 # Load environment variables
 load_dotenv()
@@ -22,31 +30,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Response compression: brotli when brotli-asgi is installed (it falls back to gzip), gzip otherwise
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1000)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Outermost, so a traced request includes serialization and compression
+app.add_middleware(profiling.ProfilingMiddleware)
+
 # Global instances - initialized on startup
 vectorstore_service = None
 summarizer_graph = None
 qa_graph = None
+topic_index = None
+vectorstore_writers = []
+
+# Session store settings
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+SESSION_SPILL_DIRECTORY = os.environ.get("SESSION_SPILL_DIRECTORY")
+
+# Write-behind batching of ingest writes: concurrent ingests share embedding passes and commits
+VECTORSTORE_WRITE_BEHIND = os.environ.get("VECTORSTORE_WRITE_BEHIND", "true").lower() == "true"
+VECTORSTORE_WRITE_BATCH_SIZE = int(os.environ.get("VECTORSTORE_WRITE_BATCH_SIZE", "32"))
+VECTORSTORE_WRITE_WINDOW_MS = float(os.environ.get("VECTORSTORE_WRITE_WINDOW_MS", "50"))
+
+# Bulk ingestion only reads archives below this directory
+BULK_INGEST_ROOT = os.path.abspath(os.environ.get("BULK_INGEST_ROOT", "./app/archives"))
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services and workflows on startup."""
-    global vectorstore_service, summarizer_graph, qa_graph
+    global vectorstore_service, summarizer_graph, qa_graph, topic_index, vectorstore_writers
     
-    from app.services import VectorStoreService
+    from app.services import VectorStoreService, DEFAULT_PERSIST_DIRECTORY
     from app.workflows.stories.workflows import article_summarization_graph
     from app.workflows.answer.workflows import question_answering_graph
     
     # Initialize services
     print("🚀 Initializing NewsIQ services...")
-    vectorstore_service = VectorStoreService(persist_directory="./app/chroma")
+    # With VECTORSTORE_SOCKET set, workers share one model/index server process
+    vectorstore_service = VectorStoreService(
+        persist_directory=DEFAULT_PERSIST_DIRECTORY,
+        server_address=os.environ.get("VECTORSTORE_SOCKET"),
+        backend=os.environ.get("VECTORSTORE_BACKEND", "chroma"),
+        partition=os.environ.get("VECTORSTORE_PARTITION"),
+        max_loaded_partitions=int(os.environ.get("VECTORSTORE_MAX_LOADED_PARTITIONS", "6")),
+    )
     
     # Initialize workflows
     print("📊 Building workflow graphs...")
     vectorstore = vectorstore_service.get_vectorstore()
-    instruct_retriever = vectorstore_service.get_instruct_retriever(k=3)
+    # Graph states hold document handles; stored texts are loaded from here on demand
+    configure_document_store(vectorstore)
+    instruct_retriever = vectorstore_service.get_instruct_retriever(k=3, with_scores=True)
+    
+    # Two-stage retrieval: grade many article summaries, then drill down into the passing articles
+    summary_vectorstore = None
+    drill_down_vectorstore = None
+    if os.environ.get("TWO_STAGE_RETRIEVAL", "false").lower() == "true":
+        summary_retriever = vectorstore_service.get_summary_retriever(
+            k=int(os.environ.get("SUMMARY_CANDIDATES", "20"))
+        )
+        if summary_retriever is None:
+            print("⚠️ Two-stage retrieval needs a local vectorstore, using single-stage retrieval")
+        else:
+            instruct_retriever = summary_retriever
+            summary_vectorstore = vectorstore_service.get_summary_vectorstore()
+            drill_down_vectorstore = vectorstore
+    topic_index = vectorstore_service.get_topic_index()
+    
+    # Syndicated copies of stored articles skip the LLM calls entirely
+    duplicate_index = None
+    if os.environ.get("DUPLICATE_DETECTION", "true").lower() == "true":
+        duplicate_index = vectorstore_service.get_duplicate_index(
+            threshold=float(os.environ.get("DUPLICATE_THRESHOLD", "0.8"))
+        )
     
-    summarizer_graph = article_summarization_graph(vectorstore)
-    qa_graph = question_answering_graph(instruct_retriever)
+    # Local grounding pre-check reuses the already loaded embedding model
+    grounding_scorer = None
+    if os.environ.get("GROUNDING_PRECHECK", "false").lower() == "true":
+        from app.grounding import GroundingScorer
+        grounding_scorer = GroundingScorer(
+            vectorstore_service.embeddings,
+            pass_similarity=float(os.environ.get("GROUNDING_PASS_SIMILARITY", "0.88")),
+            fail_similarity=float(os.environ.get("GROUNDING_FAIL_SIMILARITY", "0.72")),
+        )
+    
+    # Ingest writes go through single-writer batchers; reads still hit the store directly
+    ingest_vectorstore = vectorstore
+    if VECTORSTORE_WRITE_BEHIND:
+        writer_settings = {"max_batch_size": VECTORSTORE_WRITE_BATCH_SIZE, "max_wait_ms": VECTORSTORE_WRITE_WINDOW_MS}
+        ingest_vectorstore = vectorstore_service.get_batched_writer(**writer_settings)
+        vectorstore_writers.append(ingest_vectorstore)
+        if summary_vectorstore is not None:
+            summary_vectorstore = vectorstore_service.get_batched_writer(summary_vectorstore, **writer_settings)
+            vectorstore_writers.append(summary_vectorstore)
+    
+    summarizer_graph = article_summarization_graph(
+        ingest_vectorstore,
+        grounding_scorer=grounding_scorer,
+        topic_index=topic_index,
+        duplicate_index=duplicate_index,
+        summary_vectorstore=summary_vectorstore,
+    )
+    qa_graph = question_answering_graph(
+        instruct_retriever,
+        grounding_scorer=grounding_scorer,
+        drill_down_vectorstore=drill_down_vectorstore,
+    )
     
     print("✅ NewsIQ is ready!")
 
@@ -54,6 +149,10 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     print("👋 Shutting down NewsIQ...")
+    for writer in vectorstore_writers:
+        writer.close()
+    if vectorstore_service is not None and hasattr(vectorstore_service.vectorstore, "persist"):
+        vectorstore_service.vectorstore.persist()
 
 # Request/Response Models
 class ArticleIngestRequest(BaseModel):
@@ -65,12 +164,18 @@ class ArticleIngestRequest(BaseModel):
 class ScrapeAndSummarizeRequest(BaseModel):
     website_address: str
 
+class BulkIngestRequest(BaseModel):
+    path: str
+    workers: int = 4
+
 class QuestionAnswerRequest(BaseModel):
     question: str
 
 class QuestionRequest(BaseModel):
     question: str
     session_id: Optional[str] = None
+    reuse_context: bool = True
+    max_age_days: Optional[int] = None
 
 class ChatResponse(BaseModel):
     answer: str
@@ -87,9 +192,82 @@ class ArticleIngestResponse(BaseModel):
     article_language: Optional[str] = None
     article_topics: Optional[str] = None
     article_text: Optional[str] = None
+    duplicate_of: Optional[dict] = None
 
 # Store for session-based conversations
-sessions = {}
+sessions = SessionStore(
+    max_sessions=SESSION_MAX_SESSIONS,
+    max_bytes=SESSION_MAX_BYTES,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    spill_directory=SESSION_SPILL_DIRECTORY,
+)
+
+# Running and finished bulk ingestion jobs
+bulk_jobs = {}
+
+# Per-endpoint concurrency limits with bounded queues; ingestion is shed before answers
+admission = create_admission_controller()
+
+# Identical in-flight questions and article URLs share one graph run
+answer_flights = SingleFlight("answer")
+ingest_flights = SingleFlight("ingest")
+
+def invoke_graph(graph, graph_input: dict, finish=None):
+    """
+    Run a graph, then finish(result) when given, loading each stored document
+    text at most once for both.
+    """
+    with document_texts_cached():
+        result = profiling.profiled(graph.invoke, graph_input)
+        return finish(result) if finish else result
+
+async def run_graph(name: str, graph, graph_input: dict, finish=None):
+    """
+    Run a graph in a worker thread under the admission limit of its endpoint class.
+    
+    finish builds the response from the result in the same thread, so reading
+    document texts never blocks the event loop.
+    """
+    async with admission.slot(name):
+        return await asyncio.to_thread(invoke_graph, graph, graph_input, finish)
+
+def answer_sources(result: dict) -> List[dict]:
+    """Up to 5 source documents of an answer, with their text."""
+    documents = result.get("selected_documents", result.get("documents", []))
+    sources = []
+    for doc in documents[:5]:
+        if hasattr(doc, 'metadata'):
+            # Convert authors to string if it's a list
+            authors = doc.metadata.get("authors", "")
+            authors_str = ", ".join(authors) if isinstance(authors, list) else str(authors)
+            content = doc.page_content if hasattr(doc, 'page_content') else ""
+            
+            source = {
+                "title": doc.metadata.get("title", "Unknown"),
+                "url": doc.metadata.get("link", ""),
+                "snippet": content[:300],
+                "content": content,  # Full content
+                "authors": authors_str,
+                "language": doc.metadata.get("language", ""),
+                "topics": doc.metadata.get("topics", ""),
+                "summary": doc.metadata.get("summary", "")
+            }
+            sources.append(source)
+            print(f"📚 Added source: {source['title']}")
+    return sources
+
+def with_article_text(result: dict) -> dict:
+    """Ingestion result with the stored article's text loaded."""
+    documents = result.get("selected_document", [])
+    return {**result, "article_text": documents[0].page_content if documents else ""}
+
+def overloaded_error(error: Overloaded) -> HTTPException:
+    """503 with Retry-After for a request rejected by admission control."""
+    return HTTPException(
+        status_code=503,
+        detail=f"Server busy ({error.reason}), retry later",
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
 @app.get("/")
 async def root():
@@ -99,7 +277,8 @@ async def root():
         "endpoints": {
             "/api/ingest": "POST - Ingest articles into vectorstore",
             "/api/ask": "POST - Ask questions about articles",
-            "/api/health": "GET - Health check"
+            "/api/health": "GET - Health check",
+            "/api/ready": "GET - Readiness (503 when overloaded)"
         }
     }
 
@@ -107,11 +286,32 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """
+    Readiness for load balancers: 503 while starting up or while request
+    queues are filling up or recent latency is too high. The docker
+    healthcheck uses /api/health instead, so shedding never restarts the container.
+    """
+    readiness = admission.readiness()
+    if qa_graph is None or summarizer_graph is None:
+        readiness["ready"] = False
+        readiness["reasons"].append("starting up")
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Workflow counters and gauges (speculation, grading, LLM usage, ...)."""
+    from app.metrics import metrics
+    return metrics.snapshot()
+
 @app.post("/api/scrape-summarize")
-async def scrape_and_summarize(request: ScrapeAndSummarizeRequest):
+async def scrape_and_summarize(request: ScrapeAndSummarizeRequest, fields: Optional[str] = None):
     """
     Scrape, summarize, and add article to vectorstore using the workflow.
     
+    Pass ?fields=result.summary,result.topics to return only selected fields.
+    
     Example request:
     {
         "website_address": "https://www.wired.com/story/the-repair-app/"
@@ -121,31 +321,44 @@ async def scrape_and_summarize(request: ScrapeAndSummarizeRequest):
         if not summarizer_graph:
             raise HTTPException(status_code=500, detail="Summarizer workflow not initialized")
         
-        # Invoke the summarization workflow asynchronously
-        result = await asyncio.to_thread(
-            summarizer_graph.invoke,
-            {"website_address": request.website_address}
+        # Invoke the summarization workflow asynchronously, once per URL in flight
+        graph_input = {"website_address": request.website_address}
+        result = await ingest_flights.do(
+            normalize_url(request.website_address),
+            lambda: run_graph("ingest", summarizer_graph, graph_input, finish=with_article_text),
         )
         
-        return {
+        result = {key: value for key, value in result.items() if key != "article_text"}
+        return lean_response({
             "success": True,
             "message": "Article scraped, summarized, and added to vectorstore",
-            "result": result
-        }
+            "result": to_jsonable(result)
+        }, fields)
         
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing article: {str(e)}")
 
 @app.post("/api/answer")
-async def answer_question(request: QuestionAnswerRequest):
+async def answer_question(request: QuestionRequest, fields: Optional[str] = None):
     """
     Answer a question using the question-answering workflow.
     
+    Pass ?fields=answer,sources.title,sources.url to return only selected fields.
+    
+    Set max_age_days to only search articles ingested in the last days.
+    
+    Follow-up questions sent with a session_id reuse the session's recent turns
+    and, unless reuse_context is false, the session's documents that are still
+    relevant to the new question, merged with fresh retrieval when too few are.
+    
     Example request:
     {
-        "question": "Why humanoids can be an issue for humanity?"
+        "question": "Why humanoids can be an issue for humanity?",
+        "session_id": "optional-session-id"
     }
     """
     try:
@@ -154,56 +367,66 @@ async def answer_question(request: QuestionAnswerRequest):
         
         print(f"📥 Received question: {request.question}")
         
-        # Invoke the question-answering workflow asynchronously
-        result = await asyncio.to_thread(
-            qa_graph.invoke,
-            {"question": request.question}
+        session_id = request.session_id or str(uuid.uuid4())
+        session = sessions.get_or_create(session_id)
+        
+        graph_input = {"question": request.question, "history": session.history()}
+        if request.max_age_days:
+            # Recency-scoped: with partitioning only the recent collections are searched
+            graph_input["max_age_days"] = request.max_age_days
+        if request.reuse_context and session.documents:
+            # Graded against the new question first; too few relevant ones fall back to retrieval
+            print(f"♻️ Offering {len(session.documents)} documents from session {session_id}")
+            graph_input["session_documents"] = list(session.documents)
+        
+        # Invoke the question-answering workflow asynchronously; identical questions
+        # with the same session context share one run
+        flight_key = (
+            normalize_question(request.question),
+            request.max_age_days,
+            graph_input["history"],
+            tuple(getattr(doc, "id", None) or doc.metadata.get("link", "") for doc in graph_input.get("session_documents", [])),
+        )
+        result = await answer_flights.do(
+            flight_key,
+            lambda: run_graph("answer", qa_graph, graph_input,
+                              finish=lambda result: {**result, "sources": answer_sources(result)}),
+        )
+        
+        sessions.update(
+            session,
+            request.question,
+            result.get("answer", ""),
+            result.get("selected_documents", []),
         )
         
         print(f"🔍 Workflow result keys: {result.keys()}")
         print(f"📄 Selected documents count: {len(result.get('selected_documents', []))}")
         
-        # Extract documents/sources if available
-        documents = result.get("selected_documents", result.get("documents", []))
-        sources = []
-        if documents:
-            for doc in documents[:5]:  # Show up to 5 source documents
-                if hasattr(doc, 'metadata'):
-                    # Convert authors to string if it's a list
-                    authors = doc.metadata.get("authors", "")
-                    authors_str = ", ".join(authors) if isinstance(authors, list) else str(authors)
-                    
-                    source = {
-                        "title": doc.metadata.get("title", "Unknown"),
-                        "url": doc.metadata.get("link", ""),
-                        "snippet": doc.page_content[:300] if hasattr(doc, 'page_content') else "",
-                        "content": doc.page_content if hasattr(doc, 'page_content') else "",  # Full content
-                        "authors": authors_str,
-                        "language": doc.metadata.get("language", ""),
-                        "topics": doc.metadata.get("topics", ""),
-                        "summary": doc.metadata.get("summary", "")
-                    }
-                    sources.append(source)
-                    print(f"📚 Added source: {source['title']}")
-        
+        # Sources were built with the run, in its worker thread
+        sources = result["sources"]
         print(f"✅ Returning {len(sources)} sources")
         
-        return {
+        return lean_response({
             "answer": result.get("answer", "No answer generated"),
             "sources": sources,
-            "session_id": str(uuid.uuid4())
-        }
+            "grader_calls_skipped": result.get("grader_calls_skipped", 0),
+            "session_id": session_id
+        }, fields)
         
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error answering question: {str(e)}")
 
 @app.post("/api/ingest", response_model=ArticleIngestResponse)
-async def ingest_article(request: ArticleIngestRequest):
+async def ingest_article(request: ArticleIngestRequest, fields: Optional[str] = None):
     """
     Ingest an article using the scrape-summarize workflow.
     Requires article_url (direct article URL).
+    Pass ?fields=article_title,article_summary to skip echoing the article text.
     """
     try:
         if not request.article_url:
@@ -212,10 +435,11 @@ async def ingest_article(request: ArticleIngestRequest):
         if not summarizer_graph:
             raise HTTPException(status_code=500, detail="Summarizer workflow not initialized")
         
-        # Invoke the article summarization workflow asynchronously
-        result = await asyncio.to_thread(
-            summarizer_graph.invoke,
-            {"website_address": request.article_url}
+        # Invoke the article summarization workflow asynchronously, once per URL in flight
+        graph_input = {"website_address": request.article_url}
+        result = await ingest_flights.do(
+            normalize_url(request.article_url),
+            lambda: run_graph("ingest", summarizer_graph, graph_input, finish=with_article_text),
         )
         
         # Extract article details from result
@@ -226,7 +450,7 @@ async def ingest_article(request: ArticleIngestRequest):
         print(f"📄 Number of documents: {len(documents)}")
         if article:
             print(f"📝 Article metadata: {article.metadata}")
-            print(f"📄 Article content length: {len(article.page_content)}")
+            print(f"📄 Article content length: {len(result['article_text'])}")
         
         topics = result.get("topics", [])
         topics_str = ", ".join(topics) if isinstance(topics, list) else str(topics)
@@ -235,34 +459,169 @@ async def ingest_article(request: ArticleIngestRequest):
         authors = article.metadata.get("authors", "") if article else ""
         authors_str = ", ".join(authors) if isinstance(authors, list) else str(authors)
         
+        duplicate_of = result.get("duplicate_of")
+        message = "Article successfully processed and stored in vectorstore"
+        if duplicate_of:
+            message = f"Article is a near-duplicate of {duplicate_of.get('link') or duplicate_of.get('id')}, not stored again"
+        
         response_data = ArticleIngestResponse(
             success=True,
-            message=f"Article successfully processed and stored in vectorstore",
+            message=message,
             article_summary=result.get("summary", ""),
             article_title=article.metadata.get("title", "") if article else "",
             article_url=article.metadata.get("link", "") if article else request.article_url,
             article_authors=authors_str,
             article_language=article.metadata.get("language", "") if article else "",
             article_topics=topics_str,
-            article_text=article.page_content if article else ""  # Full content
+            article_text=result["article_text"],  # Full content, loaded in the worker thread
+            duplicate_of=duplicate_of
         )
         
         print(f"✅ Returning response with title: {response_data.article_title}")
         print(f"✅ Response has summary: {bool(response_data.article_summary)}")
         print(f"✅ Response has text: {bool(response_data.article_text)}")
         
-        return response_data
+        return lean_response(response_data.model_dump(), fields)
         
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error ingesting article: {str(e)}")
 
+@app.post("/api/ingest/bulk")
+async def bulk_ingest(request: BulkIngestRequest):
+    """
+    Start ingesting a directory of HTML files or a WARC/JSONL archive stored
+    under BULK_INGEST_ROOT. Returns a job id to poll for progress.
+    
+    Example request:
+    {
+        "path": "crawl-2025-01.warc.gz",
+        "workers": 4
+    }
+    """
+    from app.bulk_ingest import BulkIngestor
+    from app.workflows.stories.tools import get_extraction_engine
+    
+    if not summarizer_graph:
+        raise HTTPException(status_code=500, detail="Summarizer workflow not initialized")
+    
+    path = os.path.abspath(os.path.join(BULK_INGEST_ROOT, request.path))
+    if os.path.commonpath([path, BULK_INGEST_ROOT]) != BULK_INGEST_ROOT or not os.path.exists(path):
+        raise HTTPException(status_code=400, detail="path must exist under the bulk ingest root")
+    
+    job_id = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    ingestor = BulkIngestor(
+        summarizer_graph,
+        get_extraction_engine(),
+        f"{path.rstrip(os.sep)}.checkpoint",
+        workers=request.workers,
+        # Records share the ingest slots with /api/ingest and yield to answers
+        admit=lambda: admission.wait_for_slot("ingest", loop),
+    )
+    job = {"status": "running", "path": request.path, "ingestor": ingestor, "error": None}
+    bulk_jobs[job_id] = job
+    
+    async def run_job():
+        try:
+            await asyncio.to_thread(ingestor.run, path)
+            job["status"] = "finished"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+    
+    job["task"] = asyncio.create_task(run_job())
+    return {"job_id": job_id, "status": "running"}
+
+@app.get("/api/ingest/bulk/{job_id}")
+async def bulk_ingest_status(job_id: str):
+    """Progress and throughput of a bulk ingestion job."""
+    job = bulk_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "path": job["path"],
+        "error": job["error"],
+        "stats": dict(job["ingestor"].stats),
+    }
+
+@app.get("/api/topics")
+async def list_topics(prefix: Optional[str] = None, limit: int = 50, offset: int = 0, sort: str = "count"):
+    """
+    Topics of the ingested articles with article counts, served from the topic index.
+    
+    Pass ?prefix=clim to search topics by prefix and ?sort=name for alphabetical order.
+    """
+    if topic_index is None:
+        raise HTTPException(status_code=500, detail="Topic index not initialized")
+    if sort not in ("count", "name"):
+        raise HTTPException(status_code=400, detail="sort must be 'count' or 'name'")
+    return lean_response(topic_index.list_topics(prefix=prefix, limit=limit, offset=offset, sort=sort))
+
+@app.get("/api/topics/{topic}/articles")
+async def topic_articles(topic: str, limit: int = 20, offset: int = 0, fields: Optional[str] = None):
+    """Articles tagged with a topic, newest first."""
+    if topic_index is None:
+        raise HTTPException(status_code=500, detail="Topic index not initialized")
+    result = topic_index.articles(topic, limit=limit, offset=offset)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return lean_response(result, fields)
+
+def require_admin(token: Optional[str]):
+    """404 while profiling is disabled (no ADMIN_TOKEN), 403 for a wrong token."""
+    if not profiling.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.check_admin_token(token or ""):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.post("/api/admin/profile")
+async def sample_profile(seconds: float = 10, interval_ms: float = 5, x_admin_token: Optional[str] = Header(None)):
+    """
+    Sample all threads of this worker for a few seconds and return the stacks in
+    collapsed format (flamegraph.pl, speedscope).
+    """
+    require_admin(x_admin_token)
+    if seconds <= 0 or interval_ms < 1:
+        raise HTTPException(status_code=400, detail="seconds must be positive and interval_ms at least 1")
+    print(f"🔬 Sampling profile for {min(seconds, profiling.PROFILE_MAX_SECONDS):.1f}s")
+    sampler = await asyncio.to_thread(profiling.StackSampler(interval_ms).run, seconds)
+    return PlainTextResponse(sampler.collapsed())
+
+@app.get("/api/admin/traces")
+async def list_traces(x_admin_token: Optional[str] = Header(None)):
+    """Recently traced requests (sent with the X-Profile-Trace header)."""
+    require_admin(x_admin_token)
+    return [
+        {"id": trace.id, "method": trace.method, "path": trace.path, "duration_s": round(trace.duration, 4)}
+        for trace in reversed(profiling.traces)
+    ]
+
+@app.get("/api/admin/traces/{trace_id}")
+async def get_trace(trace_id: str, format: str = "json", x_admin_token: Optional[str] = Header(None)):
+    """
+    A traced request: cProfile functions and top allocation sites as JSON, or
+    its stack samples in collapsed format with ?format=collapsed.
+    """
+    require_admin(x_admin_token)
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'collapsed'")
+    trace = profiling.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "collapsed":
+        return PlainTextResponse(trace.sampler.collapsed())
+    return trace.report()
+
 @app.delete("/api/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear a chat session."""
-    if session_id in sessions:
-        del sessions[session_id]
+    if sessions.delete(session_id):
         return {"message": "Session cleared"}
     return {"message": "Session not found"}
 
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Chat models are constructed in the tests but only ever talk to local fakes
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    """Counters are process-wide; hedging budgets and assertions read them."""
+    from app.metrics import metrics
+
+    with metrics._lock:
+        metrics._values.clear()
+    yield
@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.metrics import metrics
+from app.services import BatchedWriter
+
+
+class FakeVectorstore:
+    """Embeddings and persist() of a vectorstore; writes go through the writer's upsert."""
+
+    def __init__(self, persist_failures: int = 0):
+        self.embeddings = DeterministicFakeEmbedding(size=8)
+        self.persist_failures = persist_failures
+        self.persisted = 0
+
+    def persist(self):
+        if self.persist_failures:
+            self.persist_failures -= 1
+            raise OSError("disk full")
+        self.persisted += 1
+
+
+class RecordingUpsert:
+    """Records committed batches; the first one can be held until released."""
+
+    def __init__(self, hold_first: bool = False, fail: Exception = None):
+        self.batches = []
+        self.fail = fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        if not hold_first:
+            self.release.set()
+
+    def __call__(self, ids, embeddings, metadatas, documents):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        assert len(ids) == len(embeddings) == len(metadatas) == len(documents)
+        self.batches.append(list(ids))
+
+
+@pytest.fixture
+def writers():
+    created = []
+
+    def make(vectorstore=None, upsert=None, **kwargs):
+        writer = BatchedWriter(vectorstore or FakeVectorstore(), upsert or RecordingUpsert(), **kwargs)
+        created.append(writer)
+        return writer
+
+    yield make
+    for writer in created:
+        writer.close()
+
+
+def test_writes_queued_behind_a_commit_share_one_batch(writers):
+    upsert = RecordingUpsert(hold_first=True)
+    writer = writers(upsert=upsert, max_batch_size=32, max_wait_ms=0)
+
+    first = writer.submit(["first"], ids=["a"])
+    assert upsert.entered.wait(5)
+    queued = [writer.submit([f"text {i}"], ids=[f"b{i}"]) for i in range(5)]
+    upsert.release.set()
+
+    assert first.result(5) == ["a"]
+    assert [future.result(5) for future in queued] == [[f"b{i}"] for i in range(5)]
+    assert upsert.batches == [["a"], [f"b{i}" for i in range(5)]]
+    assert metrics.get("vectorstore_writer.batches") == 2
+    assert metrics.get("vectorstore_writer.documents") == 6
+
+
+def test_batches_stop_at_max_batch_size(writers):
+    upsert = RecordingUpsert(hold_first=True)
+    writer = writers(upsert=upsert, max_batch_size=2, max_wait_ms=0)
+
+    writer.submit(["first"], ids=["a"])
+    assert upsert.entered.wait(5)
+    queued = [writer.submit([f"text {i}"], ids=[f"b{i}"]) for i in range(4)]
+    upsert.release.set()
+    for future in queued:
+        future.result(5)
+    assert [len(batch) for batch in upsert.batches] == [1, 2, 2]
+
+
+def test_add_documents_returns_ids_once_committed(writers):
+    upsert = RecordingUpsert()
+    writer = writers(upsert=upsert)
+    documents = [Document(page_content="one"), Document(page_content="two")]
+    assert writer.add_documents(documents, ids=["1", "2"]) == ["1", "2"]
+    assert upsert.batches == [["1", "2"]]
+
+
+def test_failed_upsert_fails_every_caller_of_the_batch(writers):
+    upsert = RecordingUpsert(hold_first=True, fail=RuntimeError("index down"))
+    writer = writers(upsert=upsert, max_wait_ms=0)
+
+    first = writer.submit(["first"], ids=["a"])
+    assert upsert.entered.wait(5)
+    second = writer.submit(["second"], ids=["b"])
+    upsert.release.set()
+    for future in (first, second):
+        with pytest.raises(RuntimeError, match="index down"):
+            future.result(5)
+
+    # The writer keeps serving later writes
+    upsert.fail = None
+    assert writer.add_texts(["third"], ids=["c"]) == ["c"]
+    assert upsert.batches == [["c"]]
+
+
+def test_failed_persist_does_not_fail_committed_writes_and_is_retried_on_close(writers):
+    vectorstore = FakeVectorstore(persist_failures=1)
+    upsert = RecordingUpsert()
+    writer = writers(vectorstore=vectorstore, upsert=upsert)
+
+    assert writer.add_texts(["text"], ids=["a"]) == ["a"]
+    assert metrics.get("vectorstore_writer.persist_errors") == 1
+    assert vectorstore.persisted == 0
+
+    writer.close()
+    assert vectorstore.persisted == 1
+
+
+def test_writes_after_close_are_rejected(writers):
+    writer = writers()
+    writer.close()
+    writer.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        writer.submit(["late"])
+
+
+def test_reads_go_to_the_vectorstore(writers):
+    vectorstore = FakeVectorstore()
+    writer = writers(vectorstore=vectorstore)
+    assert writer.embeddings is vectorstore.embeddings
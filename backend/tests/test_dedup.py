@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from app.dedup import DuplicateIndex
+from app.metrics import metrics
+
+
+def story(seed: int, words: int = 200) -> str:
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(words))
+
+
+def edited(text: str, changes: int, seed: int = 0) -> str:
+    """The text with a few words replaced, like a syndicated copy with a new byline."""
+    rng = random.Random(seed)
+    words = text.split()
+    for position in rng.sample(range(len(words)), changes):
+        words[position] = f"edit{position}"
+    return " ".join(words)
+
+
+class PagedVectorstore:
+    """get(limit, offset) over a list of (id, text, metadata) triples."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def get(self, include=None, limit=None, offset=0):
+        page = self.items[offset:offset + limit]
+        return {"ids": [item[0] for item in page], "documents": [item[1] for item in page],
+                "metadatas": [item[2] for item in page]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DuplicateIndex(str(tmp_path / "dedup_news.jsonl"))
+
+
+def test_near_copies_are_found_and_different_stories_are_not(index):
+    original = story(1)
+    index.add("a", original, {"link": "https://a.example/1", "title": "Original"})
+    index.add("b", story(2), {"link": "https://b.example/2"})
+
+    match = index.find(edited(original, 2))
+    assert match["id"] == "a"
+    assert match["link"] == "https://a.example/1"
+    assert match["similarity"] >= index.threshold
+    assert index.find(edited(original, 60)) is None
+    assert index.find(story(3)) is None
+
+
+def test_short_texts_are_never_duplicates(index):
+    text = "a short update"
+    assert index.signature(text) is None
+    index.add("short", text)
+    assert index.find(text) is None
+    assert index.rows_by_id == {}
+
+
+def test_signatures_are_stable_across_instances(index, tmp_path):
+    other = DuplicateIndex(str(tmp_path / "other.jsonl"))
+    assert (index.signature(story(1)) == other.signature(story(1))).all()
+    with pytest.raises(ValueError):
+        DuplicateIndex(str(tmp_path / "bad.jsonl"), num_perm=100, bands=16)
+
+
+def test_duplicates_are_linked_and_counted(index):
+    index.add("a", story(1))
+    assert index.find(story(1))["id"] == "a"
+    index.link_duplicate("a", "https://copy.example/1")
+    index.link_duplicate("a", "https://copy.example/2")
+
+    assert index.records[index.rows_by_id["a"]]["duplicates"] == ["https://copy.example/1", "https://copy.example/2"]
+    assert metrics.get("dedup.duplicates") == 2
+    assert metrics.get("dedup.llm_calls_saved") == 6
+
+
+def test_removed_articles_are_not_matched(index, tmp_path):
+    log = tmp_path / "dedup_news.jsonl"
+    index.add("a", story(1))
+    index.remove("a")
+    assert index.find(story(1)) is None
+    # Removing twice writes nothing more
+    size = len(log.read_text().splitlines())
+    index.remove("a")
+    assert len(log.read_text().splitlines()) == size
+
+    index.add("a", story(1))
+    assert index.find(story(1))["id"] == "a"
+
+
+def test_log_is_replayed_and_shared_between_workers(index):
+    index.add("a", story(1), {"link": "https://a.example/1"})
+    index.link_duplicate("a", "https://copy.example/1")
+
+    other = DuplicateIndex(index.path)
+    assert other.find(story(1))["link"] == "https://a.example/1"
+    assert other.records[other.rows_by_id["a"]]["duplicates"] == ["https://copy.example/1"]
+
+    other.add("b", story(2))
+    assert index.find(story(2))["id"] == "b"
+
+
+def test_rebuild_indexes_stored_articles(index):
+    vectorstore = PagedVectorstore([(f"doc{i}", story(i) if i != 3 else "", {}) for i in range(5)])
+    assert index.rebuild(vectorstore, batch_size=2) == 4
+    assert index.find(story(4))["id"] == "doc4"
+    assert "doc3" not in index.rows_by_id
@@ -0,0 +1,94 @@
+import gc
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from app.documents import DocumentHandle, document_texts_cached, get_document_store
+
+
+class CountingVectorstore:
+    """get_by_ids over a dict, counting the lookups."""
+
+    def __init__(self, texts: dict):
+        self.texts = texts
+        self.lookups = []
+
+    def get_by_ids(self, ids):
+        self.lookups.extend(ids)
+        return [Document(id=doc_id, page_content=self.texts[doc_id]) for doc_id in ids if doc_id in self.texts]
+
+
+@pytest.fixture
+def vectorstore(monkeypatch):
+    vectorstore = CountingVectorstore({"stored": "stored article text"})
+    monkeypatch.setattr(get_document_store(), "vectorstore", vectorstore)
+    return vectorstore
+
+
+def test_stored_text_is_loaded_only_when_read(vectorstore):
+    handle = DocumentHandle("stored", {"title": "Stored"})
+    assert vectorstore.lookups == []
+    assert handle.text_size() == 0
+
+    assert handle.page_content == "stored article text"
+    assert handle.page_content == "stored article text"
+    # Outside a run nothing is cached: every read goes back to the store
+    assert vectorstore.lookups == ["stored", "stored"]
+
+
+def test_text_is_loaded_once_per_run(vectorstore):
+    handle = DocumentHandle("stored")
+    with document_texts_cached():
+        for _ in range(3):
+            assert handle.page_content == "stored article text"
+    assert vectorstore.lookups == ["stored"]
+
+
+def test_missing_document_raises(vectorstore):
+    with pytest.raises(KeyError):
+        DocumentHandle("missing").page_content
+
+
+def test_pending_text_is_served_until_stored(vectorstore):
+    store = get_document_store()
+    handle = store.put("fresh article text", {"title": "Fresh"})
+    assert handle.page_content == "fresh article text"
+    assert handle.text_size() == len("fresh article text")
+    assert vectorstore.lookups == []
+
+    store.stored(handle.id)
+    assert not store.is_pending(handle.id)
+    with pytest.raises(KeyError):
+        handle.page_content
+
+
+def test_pending_text_is_freed_with_its_handle(vectorstore):
+    store = get_document_store()
+    doc_id = store.put("never stored").id
+    gc.collect()
+    assert not store.is_pending(doc_id)
+
+
+def test_released_text_is_loaded_again(vectorstore):
+    handle = get_document_store().wrap(Document(id="stored", page_content="retrieved text"))
+    assert handle.page_content == "retrieved text"
+    assert vectorstore.lookups == []
+
+    handle.release_text()
+    assert handle.page_content == "stored article text"
+    assert vectorstore.lookups == ["stored"]
+
+
+def test_serialized_handles_leave_out_the_text(vectorstore):
+    handle = DocumentHandle("stored", {"title": "Stored"}, text="x" * 10000)
+    dumped = handle.model_dump()
+    assert dumped == {"id": "stored", "metadata": {"title": "Stored"}}
+    assert len(json.dumps(dumped)) < 100
+
+
+def test_handles_print_like_documents(vectorstore):
+    handle = DocumentHandle("stored", {"title": "Stored"})
+    document = Document(id="stored", page_content="stored article text", metadata={"title": "Stored"})
+    assert repr(handle) == repr(document)
+    assert handle.to_document() == document
@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services import ChromaBackend, NumpyBackend, create_backend
+
+
+DIM = 32
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(backend, vectors):
+    ids = [f"id{i}" for i in range(len(vectors))]
+    backend.add(ids, vectors, [f"text {i}" for i in range(len(vectors))],
+                [{"group": i % 3, "ingested_at": i} for i in range(len(vectors))])
+    return ids
+
+
+def exact_top(vectors, query, k, allowed=None):
+    scores = vectors @ query
+    if allowed is not None:
+        scores = np.where(allowed, scores, -np.inf)
+    return [f"id{row}" for row in np.argsort(-scores)[:k]]
+
+
+def recall(backend, vectors, queries, k, where=None, allowed=None):
+    found = 0
+    for query in queries:
+        hits = {doc.id for doc, _ in backend.search(query, k=k, where=where)}
+        found += len(hits & set(exact_top(vectors, query, k, allowed)))
+    return found / (k * len(queries))
+
+
+@pytest.fixture(params=["numpy", "hnsw"])
+def backend_name(request):
+    if request.param == "hnsw":
+        pytest.importorskip("hnswlib")
+    return request.param
+
+
+def test_recall_against_exact_search(tmp_path, backend_name):
+    vectors = unit_vectors(2000)
+    backend = create_backend(backend_name, str(tmp_path))
+    fill(backend, vectors)
+    queries = unit_vectors(50, seed=1)
+
+    minimum = 1.0 if backend_name == "numpy" else 0.9
+    assert recall(backend, vectors, queries, k=10) >= minimum
+
+    allowed = np.arange(len(vectors)) % 3 == 1
+    assert recall(backend, vectors, queries, k=10, where={"group": 1}, allowed=allowed) >= minimum
+
+
+def test_scores_are_cosine_similarities(tmp_path, backend_name):
+    vectors = unit_vectors(100)
+    backend = create_backend(backend_name, str(tmp_path))
+    fill(backend, vectors)
+
+    results = backend.search(vectors[7], k=3)
+    assert results[0][0].id == "id7"
+    assert results[0][1] == pytest.approx(1.0, abs=1e-4)
+    for doc, score in results:
+        assert score == pytest.approx(float(vectors[int(doc.id[2:])] @ vectors[7]), abs=1e-4)
+
+
+def test_deletes_and_replacements_survive_a_reload(tmp_path, backend_name):
+    vectors = unit_vectors(200)
+    backend = create_backend(backend_name, str(tmp_path))
+    fill(backend, vectors)
+    backend.delete(["id3"])
+    # Re-adding an id replaces its row
+    backend.add(["id5"], vectors[[9]], ["moved"], [{"group": 0}])
+    backend.persist()
+
+    for reopened in (backend, create_backend(backend_name, str(tmp_path))):
+        assert "id3" not in {doc.id for doc, _ in reopened.search(vectors[3], k=5)}
+        assert [doc.page_content for doc in reopened.get_by_ids(["id5", "id3"])] == ["moved"]
+        hits = reopened.search(vectors[9], k=2)
+        assert {doc.id for doc, _ in hits} == {"id5", "id9"}
+        assert len(reopened.get(include=[])["ids"]) == 199
+
+
+def test_torn_writes_are_cut_back_on_load(tmp_path):
+    vectors = unit_vectors(10)
+    backend = NumpyBackend(str(tmp_path))
+    fill(backend, vectors)
+    backend.persist()
+    # A crash after the embeddings but before the records, then a torn record line
+    with open(backend.embeddings_path, "ab") as f:
+        f.write(unit_vectors(2, seed=3).tobytes())
+    with open(backend.records_path, "a") as f:
+        f.write('{"id": "torn", "docu')
+
+    reopened = NumpyBackend(str(tmp_path))
+    assert len(reopened.ids) == 10
+    assert reopened.matrix.shape == (10, DIM)
+    assert reopened.search(vectors[4], k=1)[0][0].id == "id4"
+    reopened.add(["new"], unit_vectors(1, seed=4), ["new"], [{}])
+    assert NumpyBackend(str(tmp_path)).get_by_ids(["new"])[0].page_content == "new"
+
+
+def test_local_backends_match_chroma(tmp_path):
+    chromadb = pytest.importorskip("chromadb")
+    collection = chromadb.PersistentClient(path=str(tmp_path / "chroma")).get_or_create_collection("news")
+    vectors = unit_vectors(300)
+    chroma, numpy_backend = ChromaBackend(collection), NumpyBackend(str(tmp_path / "numpy"))
+    fill(chroma, vectors)
+    fill(numpy_backend, vectors)
+
+    for query in unit_vectors(5, seed=2):
+        expected = chroma.search(query, k=5, where={"ingested_at": {"$gte": 100}})
+        found = numpy_backend.search(query, k=5, where={"ingested_at": {"$gte": 100}})
+        assert [doc.id for doc, _ in found] == [doc.id for doc, _ in expected]
+        assert [score for _, score in found] == pytest.approx([score for _, score in expected], abs=1e-4)
+
+
+def test_read_only_backend_skips_a_torn_write_without_repairing_it(tmp_path):
+    vectors = unit_vectors(10)
+    writer = NumpyBackend(str(tmp_path))
+    fill(writer, vectors)
+    with open(writer.records_path, "a") as f:
+        f.write('{"id": "torn", "docu')
+    size = os.path.getsize(writer.records_path)
+
+    reader = create_backend("numpy", str(tmp_path), read_only=True)
+    assert len(reader.get(include=[])["ids"]) == 10
+    assert reader.search(vectors[4], k=1)[0][0].id == "id4"
+    assert os.path.getsize(writer.records_path) == size
+    with pytest.raises(RuntimeError):
+        reader.add(["new"], unit_vectors(1, seed=4), ["new"], [{}])
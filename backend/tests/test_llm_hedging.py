@@ -0,0 +1,138 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from app.fake_llm_server import FakeLLMServer
+from app.llm_gateway import LLMGateway, MIN_LATENCY_SAMPLES
+from app.metrics import metrics
+
+
+LATENCY_MS = 10
+SLOW_MS = 1500
+HEDGE_DELAY_MS = 200
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeLLMServer(port=0, latency_ms=LATENCY_MS, slow_ms=SLOW_MS, slow_rate=0.0).start()
+    monkeypatch.setenv("GROQ_API_BASE", server.base_url)
+    yield server
+    server.stop()
+
+
+def make_model(hedge_max_rate: float = 1.0):
+    gateway = LLMGateway(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, hedge=True,
+                         hedge_percentile=95, hedge_min_delay_ms=HEDGE_DELAY_MS,
+                         hedge_max_rate=hedge_max_rate, processes=1)
+    return gateway.chat_model(model="primary")
+
+
+def warm_up(model, calls: int = MIN_LATENCY_SAMPLES):
+    """Enough fast calls for the gateway to trust its latency percentile."""
+    for _ in range(calls):
+        model.invoke("warm up")
+    assert metrics.get("llm.hedges") == 0
+    # Budgets and assertions only count the calls under test
+    with metrics._lock:
+        metrics._values.clear()
+
+
+def slow_next_request(server):
+    """Make the next request slow and, once it is being served, the ones after it fast again."""
+    seen = server.requests
+    server.slow_rate = 1.0
+
+    def restore():
+        while server.requests == seen:
+            time.sleep(0.001)
+        # Well before the hedge delay, after the slow request drew its latency
+        time.sleep(HEDGE_DELAY_MS / 4000)
+        server.slow_rate = 0.0
+
+    threading.Thread(target=restore, daemon=True).start()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_hedge_fires_after_delay_and_wins_on_slow_call(server, mode):
+    model = make_model()
+    warm_up(model)
+    requests = server.requests
+
+    slow_next_request(server)
+    started = time.perf_counter()
+    message = model.invoke("slow") if mode == "sync" else asyncio.run(model.ainvoke("slow"))
+    elapsed = time.perf_counter() - started
+
+    assert message.content == server.reply
+    # The hedge went out after the delay and answered long before the slow primary
+    assert HEDGE_DELAY_MS / 1000 <= elapsed < SLOW_MS / 1000
+    assert server.requests == requests + 2
+    assert metrics.get("llm.hedges") == 1
+    assert metrics.get("llm.hedge_wins") == 1
+
+
+def test_fast_calls_are_not_hedged(server):
+    model = make_model()
+    warm_up(model)
+    requests = server.requests
+
+    for _ in range(5):
+        model.invoke("fast")
+
+    assert server.requests == requests + 5
+    assert metrics.get("llm.hedges") == 0
+    assert metrics.get("llm.hedge_eligible") == 5
+
+
+def test_hedges_stay_within_budget(server):
+    max_rate = 0.25
+    model = make_model(hedge_max_rate=max_rate)
+    # So few slow calls that the latency percentile, and the hedge delay, stay low
+    warm_up(model, calls=200)
+    server.slow_ms = 300
+    server.slow_rate = 1.0
+
+    for _ in range(8):
+        model.invoke("slow")
+
+    eligible = metrics.get("llm.hedge_eligible")
+    assert eligible == 8
+    assert 0 < metrics.get("llm.hedges") <= max_rate * eligible
+    assert metrics.get("llm.hedges_capped") == eligible - metrics.get("llm.hedges")
+
+
+@pytest.mark.parametrize("while_waiting_for, started", [
+    ("admission", []),
+    ("hedge delay", ["primary"]),
+    ("hedge", ["hedge", "primary"]),
+])
+def test_cancelled_caller_cancels_its_requests(while_waiting_for, started):
+    gateway = LLMGateway(requests_per_minute=10 ** 6, tokens_per_minute=10 ** 9, hedge=True,
+                         hedge_max_rate=1.0, processes=1)
+    gateway._hedge_delay = lambda model: 0.05
+    if while_waiting_for == "admission":
+        gateway.limiter.pause(0.3)
+    running = set()
+
+    async def request(name):
+        running.add(name)
+        try:
+            await asyncio.sleep(10)
+        finally:
+            running.discard(name)
+
+    async def run():
+        call = asyncio.ensure_future(gateway.ahedged_call(
+            lambda: request("primary"), lambda: request("hedge"), 10, "interactive", "primary"))
+        await asyncio.sleep({"admission": 0.02, "hedge delay": 0.02, "hedge": 0.2}[while_waiting_for])
+        assert sorted(running) == started
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        # Past the pause: a primary still waiting for admission would start now
+        await asyncio.sleep(0.4 if while_waiting_for == "admission" else 0.01)
+        assert running == set()
+
+    asyncio.run(run())
@@ -0,0 +1,297 @@
+import os
+import json
+import time
+import datetime
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.partitions import PartitionedVectorStore, partition_bounds, time_bounds
+
+
+DAY = 86400
+OPERATORS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def matches(metadata: dict, where: dict) -> bool:
+    """The subset of Chroma's where clauses the partitioned store passes through."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not all(OPERATORS[op](metadata.get(key, 0), value) for op, value in condition.items()):
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """In-memory collection with Chroma's get() shape."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.records = {}
+        self.gets = []
+
+    def get(self, where=None, limit=None, offset=0, include=None):
+        include = include if include is not None else ["documents", "metadatas"]
+        self.gets.append({"limit": limit, "offset": offset, "include": include})
+        rows = [(record_id, record) for record_id, record in self.records.items() if matches(record["metadata"], where)]
+        rows = rows[offset or 0:][:limit]
+        page = {"ids": [record_id for record_id, _ in rows]}
+        if "documents" in include:
+            page["documents"] = [record["document"] for _, record in rows]
+        if "metadatas" in include:
+            page["metadatas"] = [record["metadata"] for _, record in rows]
+        return page
+
+    def get_by_ids(self, ids):
+        return [Document(id=record_id, page_content=self.records[record_id]["document"],
+                         metadata=self.records[record_id]["metadata"])
+                for record_id in ids if record_id in self.records]
+
+    def delete(self, ids):
+        for record_id in ids:
+            self.records.pop(record_id, None)
+
+
+class Collections:
+    """create_store/upsert/search functions over fake collections, counting opens."""
+
+    def __init__(self):
+        self.collections = {}
+        self.opened = []
+
+    def create(self, name: str):
+        self.opened.append(name)
+        return self.collections.setdefault(name, FakeCollection(name))
+
+    def upsert(self, store, ids, embeddings, metadatas, documents):
+        for record_id, embedding, metadata, document in zip(ids, embeddings, metadatas, documents):
+            store.records[record_id] = {"embedding": np.asarray(embedding), "metadata": metadata, "document": document}
+
+    def search(self, store, vector, k, where):
+        scored = [
+            (Document(id=record_id, page_content=record["document"], metadata=record["metadata"]),
+             float(np.dot(record["embedding"], vector)))
+            for record_id, record in store.records.items() if matches(record["metadata"], where)
+        ]
+        return sorted(scored, key=lambda pair: pair[1], reverse=True)[:k]
+
+    def ids(self, name: str):
+        return set(self.collections[name].records) if name in self.collections else set()
+
+
+@pytest.fixture
+def collections():
+    return Collections()
+
+
+@pytest.fixture
+def make_store(tmp_path, collections):
+    manifest_path = tmp_path / "partitions_news.json"
+    # Partitioned a year ago: the base collection only covers what came before
+    manifest_path.write_text(json.dumps({"period": "month", "partitions": {"news": [0, time.time() - 365 * DAY]}}))
+
+    def make(max_loaded: int = 6, period: str = "month"):
+        return PartitionedVectorStore(
+            DeterministicFakeEmbedding(size=8),
+            collections.create,
+            upsert=collections.upsert,
+            search=collections.search,
+            manifest_path=str(manifest_path),
+            ids_path=str(tmp_path / "partition_ids_news.jsonl"),
+            base_name="news",
+            period=period,
+            max_loaded=max_loaded,
+        )
+    return make
+
+
+def month_name(timestamp: float) -> str:
+    return f"news_{partition_bounds(timestamp, 'month')[0]}"
+
+
+def test_partition_bounds():
+    june = datetime.datetime(2025, 6, 18, 12, tzinfo=datetime.timezone.utc).timestamp()
+    suffix, start, end = partition_bounds(june, "month")
+    assert suffix == "2025_06"
+    assert start == datetime.datetime(2025, 6, 1, tzinfo=datetime.timezone.utc).timestamp()
+    assert end == datetime.datetime(2025, 7, 1, tzinfo=datetime.timezone.utc).timestamp()
+
+    december = datetime.datetime(2024, 12, 31, 23, 59, tzinfo=datetime.timezone.utc).timestamp()
+    assert partition_bounds(december, "month")[2] == datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc).timestamp()
+
+    # ISO weeks start on Monday
+    suffix, start, end = partition_bounds(june, "week")
+    assert suffix == "2025w25"
+    assert start == datetime.datetime(2025, 6, 16, tzinfo=datetime.timezone.utc).timestamp()
+    assert end - start == 7 * DAY
+
+    with pytest.raises(ValueError):
+        partition_bounds(june, "year")
+
+
+@pytest.mark.parametrize("where, expected", [
+    (None, (None, None)),
+    ({"link": "x"}, (None, None)),
+    ({"ingested_at": {"$gte": 5}}, (5, None)),
+    ({"ingested_at": {"$gt": 5, "$lt": 9}}, (5, 9)),
+    ({"$and": [{"ingested_at": {"$gte": 5}}, {"ingested_at": {"$gte": 7}}, {"link": "x"}]}, (7, None)),
+    ({"$and": [{"ingested_at": {"$lte": 9}}], "ingested_at": {"$lt": 4}}, (None, 4)),
+    ({"ingested_at": 5}, (None, None)),
+])
+def test_time_bounds(where, expected):
+    assert time_bounds(where) == expected
+
+
+def test_writes_are_routed_by_ingestion_time(make_store, collections):
+    store = make_store()
+    now = time.time()
+    collections.create("news").records["legacy"] = {"embedding": np.zeros(8), "metadata": {}, "document": "legacy"}
+    store.add_texts(["new", "old"], metadatas=[{"ingested_at": now}, {"ingested_at": now - 80 * DAY}], ids=["new", "old"])
+
+    assert collections.ids(month_name(now)) == {"new"}
+    assert collections.ids(month_name(now - 80 * DAY)) == {"old"}
+    assert store.id_partitions["old"] == month_name(now - 80 * DAY)
+    # Unlogged ids are read from the base collection
+    assert [doc.id for doc in store.get_by_ids(["legacy", "missing", "new"])] == ["legacy", "new"]
+
+
+def test_select_returns_overlapping_partitions_newest_first(make_store):
+    store = make_store()
+    now = time.time()
+    store.add_texts(["a", "b", "c"], metadatas=[{"ingested_at": now - days * DAY} for days in (0, 40, 80)])
+
+    newest, middle, oldest = (month_name(now - days * DAY) for days in (0, 40, 80))
+    assert store.select()[:3] == [newest, middle, oldest]
+    assert store.select(since=now - DAY) == [newest]
+    assert store.select(since=now - 45 * DAY) == [newest, middle]
+    assert store.select(since=now - 85 * DAY, until=now - 75 * DAY) == [oldest]
+    # The pre-partitioning collection covers everything before
+    assert store.select()[-1] == "news"
+
+
+def test_reingested_id_moves_and_delete_removes_it(make_store, collections):
+    store = make_store()
+    now = time.time()
+    store.add_texts(["first"], metadatas=[{"ingested_at": now - 80 * DAY}], ids=["x"])
+    store.add_texts(["again"], metadatas=[{"ingested_at": now}], ids=["x"])
+
+    assert collections.ids(month_name(now - 80 * DAY)) == set()
+    assert collections.ids(month_name(now)) == {"x"}
+    assert store.get_by_ids(["x"])[0].page_content == "again"
+
+    store.delete(["x"])
+    assert collections.ids(month_name(now)) == set()
+    assert "x" not in store.id_partitions
+
+
+def test_id_log_is_replayed_and_rebuilt(make_store, collections):
+    store = make_store()
+    now = time.time()
+    store.add_texts(["a", "b"], metadatas=[{"ingested_at": now}, {"ingested_at": now - 40 * DAY}], ids=["a", "b"])
+    store.delete(["a"])
+
+    assert make_store().id_partitions == {"b": month_name(now - 40 * DAY)}
+
+    os.remove(store.ids_path)
+    assert make_store().id_partitions == {"b": month_name(now - 40 * DAY)}
+
+
+def test_scoped_search_only_opens_overlapping_partitions(make_store, collections):
+    store = make_store()
+    now = time.time()
+    store.add_texts(["recent story", "older story"],
+                    metadatas=[{"ingested_at": now}, {"ingested_at": now - 80 * DAY}], ids=["recent", "older"])
+
+    store = make_store()
+    collections.opened.clear()
+    results = store.similarity_search("story", k=5, filter={"ingested_at": {"$gte": now - 7 * DAY}})
+    assert [doc.id for doc in results] == ["recent"]
+    assert collections.opened == [month_name(now)]
+    assert list(store._loaded) == [month_name(now)]
+
+    # Unscoped reads see everything without keeping the old partitions loaded
+    results = store.similarity_search("story", k=5)
+    assert {doc.id for doc in results} == {"recent", "older"}
+    assert list(store._loaded) == [month_name(now)]
+
+
+def test_loaded_partitions_are_bounded(make_store):
+    store = make_store(max_loaded=2)
+    now = time.time()
+    store.add_texts(["a", "b", "c"], metadatas=[{"ingested_at": now - days * DAY} for days in (0, 40, 80)])
+    assert len(store._loaded) == 2
+
+
+def test_get_pages_across_partitions(make_store):
+    store = make_store()
+    now = time.time()
+    ages = [0, 1, 40, 41, 80]
+    store.add_texts([f"doc {age}" for age in ages], metadatas=[{"ingested_at": now - age * DAY} for age in ages],
+                    ids=[f"d{age}" for age in ages])
+
+    pages = [store.get(limit=2, offset=offset, include=[])["ids"] for offset in range(0, 6, 2)]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(record_id for page in pages for record_id in page) == sorted(f"d{age}" for age in ages)
+
+    recent = store.get(where={"ingested_at": {"$gte": now - 2 * DAY}}, include=["metadatas"])
+    assert sorted(recent["ids"]) == ["d0", "d1"]
+    assert len(recent["metadatas"]) == 2
+
+
+def test_sequential_pages_resume_without_counting_partitions(make_store, collections):
+    store = make_store()
+    now = time.time()
+    ages = [0, 1, 40, 41, 80, 81]
+    store.add_texts([f"doc {age}" for age in ages], metadatas=[{"ingested_at": now - age * DAY} for age in ages],
+                    ids=[f"d{age}" for age in ages])
+
+    paged, offset = [], 0
+    while True:
+        page = store.get(limit=2, offset=offset)["ids"]
+        if not page:
+            break
+        paged.extend(page)
+        offset += len(page)
+    assert sorted(paged) == sorted(f"d{age}" for age in ages)
+    counts = [call for collection in collections.collections.values() for call in collection.gets
+              if call["limit"] is None]
+    assert counts == []
+
+    # An offset no page ended at still counts its way there
+    assert store.get(limit=1, offset=3)["ids"] == [paged[3]]
+
+
+def test_unscoped_reads_reuse_cached_partitions(make_store, collections):
+    store = make_store()
+    now = time.time()
+    store.add_texts(["recent", "older"], metadatas=[{"ingested_at": now}, {"ingested_at": now - 80 * DAY}],
+                    ids=["recent", "older"])
+
+    store = make_store()
+    collections.opened.clear()
+    for _ in range(3):
+        assert [doc.id for doc in store.get_by_ids(["older"])] == ["older"]
+        store.similarity_search("story", k=5)
+    assert collections.opened.count(month_name(now - 80 * DAY)) == 1
+    assert list(store._loaded) == []
+
+    # A write takes the cached partition over instead of opening it again
+    store.add_texts(["older, updated"], metadatas=[{"ingested_at": now - 80 * DAY}], ids=["older"])
+    assert collections.opened.count(month_name(now - 80 * DAY)) == 1
+    assert list(store._loaded) == [month_name(now - 80 * DAY)]
+    assert month_name(now - 80 * DAY) not in store._cached
+
+
+def test_manifest_period_must_match(make_store):
+    make_store(period="month")
+    with pytest.raises(ValueError):
+        make_store(period="week")
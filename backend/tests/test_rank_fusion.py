@@ -0,0 +1,47 @@
+from langchain_core.documents import Document
+
+from app.services import reciprocal_rank_fusion
+
+
+def doc(doc_id: str, score: float = None) -> Document:
+    metadata = {"link": f"https://example.com/{doc_id}"}
+    if score is not None:
+        metadata["score"] = score
+    return Document(id=doc_id, page_content=f"text of {doc_id}", metadata=metadata)
+
+
+def ids(documents):
+    return [document.id for document in documents]
+
+
+def test_documents_found_by_several_queries_rank_first():
+    fused = reciprocal_rank_fusion([
+        [doc("a"), doc("b"), doc("c")],
+        [doc("c"), doc("d")],
+        [doc("e"), doc("c")],
+    ])
+    assert ids(fused) == ["c", "a", "e", "b", "d"]
+    assert fused[0].metadata["rrf_score"] == round(1 / 63 + 1 / 61 + 1 / 62, 6)
+
+
+def test_single_list_keeps_its_order():
+    assert ids(reciprocal_rank_fusion([[doc("x"), doc("y"), doc("z")]])) == ["x", "y", "z"]
+
+
+def test_merged_document_keeps_its_best_score():
+    fused = reciprocal_rank_fusion([[doc("a", 0.4)], [doc("b", 0.9), doc("a", 0.7)]])
+    scores = {document.id: document.metadata["score"] for document in fused}
+    assert scores == {"a": 0.7, "b": 0.9}
+
+
+def test_documents_without_ids_are_merged_by_link():
+    first = Document(page_content="one", metadata={"link": "https://example.com/story"})
+    second = Document(page_content="one, again", metadata={"link": "https://example.com/story"})
+    fused = reciprocal_rank_fusion([[first], [second]])
+    assert len(fused) == 1
+
+
+def test_k_flattens_the_rank_weights():
+    lists = [[doc("a"), doc("b")], [doc("b"), doc("c")]]
+    assert reciprocal_rank_fusion(lists, k=1)[0].metadata["rrf_score"] == round(1 / 3 + 1 / 2, 6)
+    assert reciprocal_rank_fusion([]) == []
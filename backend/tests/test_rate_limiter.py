@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.llm_gateway import GatewayChatModel, LLMGateway, TokenBucketLimiter
+from app.metrics import estimate_tokens
+
+
+CAPACITY = 100_000
+
+
+class FrozenLimiter(TokenBucketLimiter):
+    """No refill, so the bucket only moves by what the calls charge."""
+
+    def _refill(self):
+        pass
+
+
+class StreamingModel:
+    """Streams fixed chunks, optionally failing after some of them."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def _chunks(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise RuntimeError("connection reset")
+            yield chunk
+        if self.fail_after is not None and self.fail_after >= len(self.chunks):
+            raise RuntimeError("connection reset")
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self._chunks()
+
+    async def astream(self, input, config=None, **kwargs):
+        for chunk in self._chunks():
+            yield chunk
+
+
+def make_model(llm):
+    gateway = LLMGateway(requests_per_minute=1000, tokens_per_minute=CAPACITY, processes=1)
+    gateway.limiter = FrozenLimiter(1000, CAPACITY)
+    return GatewayChatModel(gateway, llm), gateway.limiter
+
+
+PROMPT = "question " * 100
+
+
+def test_refunds_never_exceed_capacity():
+    limiter = FrozenLimiter(10, 1000)
+    limiter.acquire(100)
+    limiter.adjust(-100)
+    limiter.adjust(-500)
+    assert limiter.tokens == 1000
+
+
+def test_stream_is_charged_its_reported_usage():
+    chunks = [AIMessageChunk(content="an "), AIMessageChunk(content="answer"),
+              AIMessageChunk(content="", usage_metadata={"input_tokens": 300, "output_tokens": 20, "total_tokens": 320})]
+    model, limiter = make_model(StreamingModel(chunks))
+    assert "".join(chunk.content for chunk in model.stream(PROMPT)) == "an answer"
+    assert limiter.tokens == CAPACITY - 320
+
+
+def test_stream_without_usage_is_charged_an_estimate():
+    model, limiter = make_model(StreamingModel([AIMessageChunk(content="word " * 40)]))
+    list(model.stream(PROMPT))
+    assert limiter.tokens == CAPACITY - estimate_tokens(PROMPT) - estimate_tokens("word " * 40)
+
+
+def test_abandoned_stream_is_charged_what_it_generated():
+    model, limiter = make_model(StreamingModel([AIMessageChunk(content="first"), AIMessageChunk(content="second")]))
+    stream = model.stream(PROMPT)
+    next(stream)
+    stream.close()
+    assert limiter.tokens == CAPACITY - estimate_tokens(PROMPT) - estimate_tokens("first")
+
+
+@pytest.mark.parametrize("fail_after, charged", [(0, 0), (1, estimate_tokens(PROMPT) + estimate_tokens("first"))])
+def test_failed_async_stream_is_refunded_or_charged_its_output(fail_after, charged):
+    model, limiter = make_model(StreamingModel([AIMessageChunk(content="first")], fail_after=fail_after))
+
+    async def consume():
+        async for _ in model.astream(PROMPT):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(consume())
+    assert limiter.tokens == CAPACITY - charged
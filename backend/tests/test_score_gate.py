@@ -0,0 +1,68 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.workflows.answer import workflows
+from app.workflows.answer.nodes import score_gate
+
+
+THRESHOLDS = {"default": (0.85, 0.6), "lt": (0.9, 0.7)}
+
+
+def doc(score=None, language="en") -> Document:
+    metadata = {"language": language}
+    if score is not None:
+        metadata["score"] = score
+    return Document(page_content="text", metadata=metadata)
+
+
+@pytest.mark.parametrize("score, language, expected", [
+    (0.9, "en", "accept"),
+    (0.85, "en", "accept"),
+    (0.7, "en", None),
+    (0.6, "en", "reject"),
+    # Per-language thresholds replace the default ones
+    (0.87, "lt", None),
+    (0.65, "lt", "reject"),
+    (None, "en", None),
+])
+def test_decisive_scores_skip_the_grader(score, language, expected):
+    assert score_gate(doc(score, language), THRESHOLDS) == expected
+
+
+def test_gate_is_off_without_thresholds():
+    assert score_gate(doc(0.99), {}) is None
+    assert score_gate(doc(0.99), None) is None
+    # Only a reject threshold: high scores still go to the grader
+    assert score_gate(doc(0.99), {"default": (None, 0.5)}) is None
+    assert score_gate(doc(0.4), {"default": (None, 0.5)}) == "reject"
+
+
+def configure(monkeypatch, accept=None, reject=None, overrides=None):
+    monkeypatch.setattr(workflows, "GRADE_ACCEPT_SCORE", accept)
+    monkeypatch.setattr(workflows, "GRADE_REJECT_SCORE", reject)
+    monkeypatch.setattr(workflows, "GRADE_SCORE_THRESHOLDS", overrides)
+
+
+def test_thresholds_are_read_from_the_environment(monkeypatch):
+    configure(monkeypatch)
+    assert workflows.load_score_thresholds() == {}
+
+    configure(monkeypatch, accept="0.86", reject="0.72", overrides='{"lt": [0.88, null]}')
+    assert workflows.load_score_thresholds() == {"default": (0.86, 0.72), "lt": (0.88, None)}
+
+
+@pytest.mark.parametrize("settings", [
+    {"accept": "high"},
+    {"accept": "1.5"},
+    {"accept": "0.7", "reject": "0.8"},
+    {"overrides": "{not json"},
+    {"overrides": "[0.9, 0.7]"},
+    {"overrides": '{"lt": 0.9}'},
+    {"overrides": '{"lt": [0.9, 0.7, 0.5]}'},
+    {"overrides": '{"lt": ["x", 0.7]}'},
+    {"overrides": '{"lt": [0.7, 0.7]}'},
+])
+def test_invalid_thresholds_are_refused(monkeypatch, settings):
+    configure(monkeypatch, **settings)
+    with pytest.raises(ValueError, match="GRADE_"):
+        workflows.load_score_thresholds()
@@ -0,0 +1,79 @@
+import time
+
+from langchain_core.documents import Document
+
+from app.documents import DocumentHandle
+from app.sessions import Session, SessionStore
+
+
+def article(link: str, text: str = "article text") -> Document:
+    return Document(page_content=text, metadata={"link": link})
+
+
+def test_turns_and_documents_are_bounded_and_deduplicated():
+    session = Session("s", max_turns=2, max_documents=3)
+    for i in range(4):
+        session.add_turn(f"question {i}", f"answer {i}")
+    assert session.history() == "Q: question 2\nA: answer 2\nQ: question 3\nA: answer 3"
+
+    session.add_documents([article("a"), article("b")])
+    session.add_documents([article("c"), article("a")])
+    session.add_documents([article("d")])
+    # Newest first, one copy per link
+    assert [doc.metadata["link"] for doc in session.documents] == ["d", "c", "a"]
+
+
+def test_stored_handles_are_kept_without_text():
+    session = Session("s")
+    session.add_documents([DocumentHandle("stored", {"link": "a"}, text="x" * 1000)])
+    assert session.documents[0]._text is None
+    assert session.size() < 100
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get("a")
+    store.get_or_create("c")
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["sessions"] == 2
+
+
+def test_byte_budget_evicts_and_accounts_updates():
+    store = SessionStore(max_bytes=1000)
+    first = store.get_or_create("first")
+    store.update(first, "q", "a", [article("a", "x" * 600)])
+    assert 600 < store.stats()["bytes"] < 1000
+
+    second = store.get_or_create("second")
+    store.update(second, "q", "a", [article("b", "y" * 600)])
+    assert store.get("first") is None
+    assert store.stats()["sessions"] == 1
+    assert store.stats()["bytes"] == second.size()
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(ttl_seconds=60)
+    session = store.get_or_create("a")
+    session.last_access = time.time() - 61
+    assert store.get("a") is None
+    assert store.stats() == {"sessions": 0, "bytes": 0}
+
+
+def test_evicted_sessions_spill_to_disk_and_come_back(tmp_path):
+    store = SessionStore(max_sessions=1, spill_directory=str(tmp_path))
+    first = store.get_or_create("first")
+    store.update(first, "what happened?", "something", [article("a")])
+    store.get_or_create("second")
+    assert len(list(tmp_path.iterdir())) == 1
+
+    restored = store.get("first")
+    assert restored.history() == "Q: what happened?\nA: something"
+    assert [doc.metadata["link"] for doc in restored.documents] == ["a"]
+
+    assert store.delete("second")
+    assert store.delete("first")
+    assert not store.delete("first")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.metrics import metrics
+from app.singleflight import SingleFlight, normalize_question, normalize_url
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        flight = SingleFlight("answer")
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        assert results == ["answer"] * 5
+        assert len(runs) == 1
+        assert metrics.get("singleflight.answer.coalesced") == 4
+        assert flight.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_shared_run_to_the_others():
+    async def scenario():
+        flight = SingleFlight("answer")
+        release = asyncio.Event()
+        finished = []
+
+        async def work():
+            await release.wait()
+            finished.append(1)
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert first.cancelled()
+        assert flight.inflight == 1
+
+        release.set()
+        assert await second == "answer"
+        assert finished == [1]
+        assert flight.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_waiter_and_the_next_call_runs_again():
+    async def scenario():
+        flight = SingleFlight("ingest")
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(flight.do("url", failing), flight.do("url", failing), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+        async def working():
+            return "stored"
+
+        assert await flight.do("url", working) == "stored"
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM/News/Story/", "https://example.com/News/Story"),
+    ("https://example.com:443/a", "https://example.com/a"),
+    ("http://example.com:8080/a", "http://example.com:8080/a"),
+    ("https://example.com/a?b=2&a=1", "https://example.com/a?a=1&b=2"),
+    ("https://example.com/a?utm_source=x&id=7&fbclid=y#comments", "https://example.com/a?id=7"),
+    ("  https://example.com  ", "https://example.com/"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_normalize_question():
+    assert normalize_question("  What happened   in Paris?? ") == normalize_question("what happened in paris")
@@ -0,0 +1,124 @@
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from app.workflows.stories import nodes
+from app.workflows.stories.nodes import claims_by_chunk, grade_summary_v_article, split_article, summarize_article
+
+
+CHUNK_TOKENS = 75
+TOPICS = ["Robots", "Trains", "Harbours"]
+
+
+def paragraph(topic: str, index: int) -> str:
+    return f"{topic} paragraph {index}: " + f"{topic.lower()} moved cargo across the region. " * 3
+
+
+# Three topics, each filling about one chunk
+ARTICLE = "\n".join(paragraph(topic, index) for topic in TOPICS for index in range(2))
+
+
+class Calls:
+    """Fake summarizer, topics identifier, chunk summarizer and checker chains, recording their inputs."""
+
+    def __init__(self, verdicts=None):
+        self.mapped = []
+        self.reduced = []
+        self.checked = []
+        self.verdicts = verdicts or {}
+
+    def chunk_summarizer(self, llm):
+        def summarize(inputs):
+            self.mapped.append(inputs["article"])
+            topic = inputs["article"].split()[0]
+            return f"{topic} moved cargo."
+        return RunnableLambda(summarize)
+
+    def summarizer(self, llm):
+        def reduce(inputs):
+            self.reduced.append(inputs["article"])
+            return " ".join(line for line in inputs["article"].split("\n\n"))
+        return RunnableLambda(reduce)
+
+    def topics_identifier(self, llm):
+        return RunnableLambda(lambda inputs: "logistics")
+
+    def checker(self, llm):
+        def check(inputs):
+            self.checked.append(inputs)
+            return self.verdicts.get(inputs["article"].split()[0], "no")
+        return RunnableLambda(check)
+
+
+def state_for(text: str, **state) -> dict:
+    return {"selected_document": [Document(page_content=text)], **state}
+
+
+def summarize(calls, state):
+    return summarize_article(state, None, calls.summarizer, calls.topics_identifier,
+                             map_reduce_tokens=100, chunk_tokens=CHUNK_TOKENS)
+
+
+def test_split_article_keeps_paragraphs_and_cuts_long_ones():
+    chunks = split_article(ARTICLE, CHUNK_TOKENS)
+    assert [chunk.split()[0] for chunk in chunks] == TOPICS
+    assert all(len(chunk) <= CHUNK_TOKENS * 4 for chunk in chunks)
+    assert "\n".join(chunks) == ARTICLE
+
+    long_paragraph = "Word " * 500
+    assert all(len(chunk) <= 400 for chunk in split_article(long_paragraph, 100))
+
+
+def test_short_articles_are_summarized_whole(monkeypatch):
+    calls = Calls()
+    monkeypatch.setattr(nodes, "create_chunk_summarizer", calls.chunk_summarizer)
+    result = summarize(calls, state_for("A short article about robots."))
+    assert calls.mapped == []
+    assert calls.reduced == ["A short article about robots."]
+    assert result["chunk_summaries"] is None
+
+
+def test_long_articles_are_summarized_from_chunk_summaries(monkeypatch):
+    calls = Calls()
+    monkeypatch.setattr(nodes, "create_chunk_summarizer", calls.chunk_summarizer)
+    result = summarize(calls, state_for(ARTICLE))
+    assert len(calls.mapped) == 3
+    assert result["chunk_summaries"] == [f"{topic} moved cargo." for topic in TOPICS]
+    assert calls.reduced == ["\n\n".join(result["chunk_summaries"])]
+    assert "map_summarize_3_chunks" in result["steps"]
+
+
+def test_claims_are_matched_to_the_chunk_they_come_from():
+    chunks = split_article(ARTICLE, CHUNK_TOKENS)
+    claims = claims_by_chunk("Trains moved cargo. Harbours moved cargo across the region.", chunks)
+    assert claims == {1: ["Trains moved cargo."], 2: ["Harbours moved cargo across the region."]}
+
+
+def test_map_reduced_summary_is_checked_against_the_article():
+    calls = Calls()
+    summary = "Robots moved cargo. Trains moved cargo."
+    result = grade_summary_v_article(
+        state_for(ARTICLE, summary=summary, chunk_summaries=["r", "t", "h"]),
+        None, calls.checker, chunk_tokens=CHUNK_TOKENS,
+    )
+    assert result["summary_verdict"] == "No hallucinations"
+    # One check per chunk with claims, against the article text rather than the chunk summaries
+    chunks = split_article(ARTICLE, CHUNK_TOKENS)
+    assert calls.checked == [{"article": chunks[0], "summary": "Robots moved cargo."},
+                             {"article": chunks[1], "summary": "Trains moved cargo."}]
+
+
+def test_failed_claims_send_only_their_chunks_back_to_the_map_step(monkeypatch):
+    calls = Calls(verdicts={"Trains": "yes"})
+    monkeypatch.setattr(nodes, "create_chunk_summarizer", calls.chunk_summarizer)
+    chunk_summaries = ["Robots moved cargo.", "Trains flew to the moon.", "Harbours moved cargo."]
+    result = grade_summary_v_article(
+        state_for(ARTICLE, summary=" ".join(chunk_summaries), chunk_summaries=chunk_summaries),
+        None, calls.checker, chunk_tokens=CHUNK_TOKENS,
+    )
+    assert result["summary_verdict"] == "Hallucinations"
+    assert result["chunk_summaries"] == ["Robots moved cargo.", None, "Harbours moved cargo."]
+
+    retried = summarize(calls, state_for(ARTICLE, chunk_summaries=result["chunk_summaries"]))
+    assert [chunk.split()[0] for chunk in calls.mapped] == ["Trains"]
+    assert retried["chunk_summaries"][1] == "Trains moved cargo."
+    assert {"reuse_chunk_summaries", "map_summarize_1_chunks"} <= set(retried["steps"])
@@ -0,0 +1,87 @@
+import pytest
+
+from app.topics import TopicIndex, parse_topics
+
+
+class PagedVectorstore:
+    """get(limit, offset) over a list of (id, metadata) pairs."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def get(self, include=None, limit=None, offset=0):
+        page = self.items[offset:offset + limit]
+        return {"ids": [doc_id for doc_id, _ in page], "metadatas": [metadata for _, metadata in page]}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return TopicIndex(str(tmp_path / "topics_news.jsonl"))
+
+
+def test_identifier_output_is_normalized():
+    raw = "Main topics:\n1. **Climate Change**: rising seas\n- Elections, climate change\n* (NATO)"
+    assert parse_topics(raw) == ["Climate Change", "Elections", "NATO"]
+    assert parse_topics(["Trade", " trade ", "x" * 100]) == ["Trade"]
+
+
+def test_topics_are_counted_and_paged(index):
+    index.add("a", "Climate, Elections", {"title": "A", "ingested_at": 1})
+    index.add("b", "climate", {"title": "B", "ingested_at": 2})
+    index.add("c", "Trade, Climate", {"title": "C", "ingested_at": 3})
+
+    listed = index.list_topics()
+    assert listed["total"] == 3
+    assert [(topic["topic"], topic["count"]) for topic in listed["topics"]] == \
+        [("Climate", 3), ("Elections", 1), ("Trade", 1)]
+    assert [topic["key"] for topic in index.list_topics(sort="name", limit=2, offset=1)["topics"]] == \
+        ["elections", "trade"]
+    assert [topic["key"] for topic in index.list_topics(prefix="CL")["topics"]] == ["climate"]
+
+
+def test_articles_are_newest_first(index):
+    for i, doc_id in enumerate(["old", "new", "middle"]):
+        index.add(doc_id, "Climate", {"title": doc_id, "ingested_at": [1, 3, 2][i]})
+
+    page = index.articles("climate", limit=2)
+    assert page["total"] == 3
+    assert [article["id"] for article in page["articles"]] == ["new", "middle"]
+    assert page["articles"][0] == {"id": "new", "title": "new", "ingested_at": 3}
+    assert [article["id"] for article in index.articles("Climate", limit=2, offset=2)["articles"]] == ["old"]
+    assert index.articles("unknown") is None
+
+
+def test_removed_and_readded_documents_update_their_topics(index):
+    index.add("a", "Climate, Elections")
+    index.add("b", "Elections")
+    index.remove("a")
+    assert [(topic["key"], topic["count"]) for topic in index.list_topics()["topics"]] == [("elections", 1)]
+
+    # Re-adding replaces the document's topics rather than adding to them
+    index.add("b", "Trade")
+    assert [topic["key"] for topic in index.list_topics()["topics"]] == ["trade"]
+
+
+def test_other_writers_and_compaction_are_picked_up(tmp_path, index):
+    log = tmp_path / "topics_news.jsonl"
+    index.add("a", "Climate")
+    other = TopicIndex(index.path)
+    other.add("b", "Climate")
+    other.remove("a")
+    assert index.articles("climate")["total"] == 1
+
+    size = len(log.read_text().splitlines())
+    index.compact()
+    assert len(log.read_text().splitlines()) < size
+    assert TopicIndex(index.path).list_topics()["topics"][0] == {"topic": "Climate", "key": "climate", "count": 1}
+    # The other instance reloads the compacted log instead of replaying from its old offset
+    other.add("c", "Climate")
+    assert index.articles("climate")["total"] == 2
+
+
+def test_rebuild_indexes_stored_topics(index):
+    vectorstore = PagedVectorstore([
+        (f"doc{i}", {"topics": "Climate" if i % 2 else "", "ingested_at": i}) for i in range(7)
+    ])
+    assert index.rebuild(vectorstore, batch_size=3) == 3
+    assert [article["id"] for article in index.articles("climate")["articles"]] == ["doc5", "doc3", "doc1"]